@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from blog.admin import format_activity
+from blog.rollups import user_activity
 
 from .forms import *
 from .models import *
@@ -17,7 +19,13 @@ class CustomUserAdmin(UserAdmin):
         'photo',
     ]
     
-    fieldsets = UserAdmin.fieldsets + ((None, {"fields": ("age",'about','photo',)}),)
+    fieldsets = UserAdmin.fieldsets + ((None, {"fields": ("age",'about','photo','activity_breakdown',)}),)
+    readonly_fields = ('activity_breakdown',)
     add_fieldsets = UserAdmin.add_fieldsets + ((None, {"fields": ("age",'about','photo',)}),)
     
+    # از خلاصه روزانه (blog/rollups.py)، نه از جدول Activity
+    def activity_breakdown(self, obj):
+        return format_activity(user_activity(obj.pk)) if obj.pk else '-'
+    activity_breakdown.short_description = 'فعالیت اخیر به تفکیک نوع'
+    
 admin.site.register(CustomUser, CustomUserAdmin)
\ No newline at end of file
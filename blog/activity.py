@@ -0,0 +1,157 @@
+"""
+ثبت دسته‌ای فعالیت‌ها
+
+فعالیت‌ها در بافر تراکنش جاری جمع می‌شوند و پس از commit با یک
+bulk_create نوشته می‌شوند. اگر تراکنش یا savepoint مربوطه rollback شود،
+callback آن توسط Django حذف می‌شود و فعالیت‌ها هرگز ثبت نمی‌شوند.
+
+با ACTIVITY_FLUSH_MODE = 'background' نوشتن به یک thread پس‌زمینه سپرده
+می‌شود تا خارج از چرخه درخواست انجام شود. هر دسته نوشته‌شده در همان تراکنش
+به صندوق فید گیرندگان پخش می‌شود (blog.feed).
+"""
+import atexit
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from config.sqlite import write_transaction
+from .feed import fan_out
+from .models import Activity
+
+ACTIVITY_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def record_activity(using=DEFAULT_DB_ALIAS, **fields):
+    """ثبت یک فعالیت در بافر تراکنش جاری"""
+    record_activities([Activity(**fields)], using=using)
+
+
+def record_activities(activities, using=DEFAULT_DB_ALIAS):
+    """ثبت چند فعالیت در بافر تراکنش جاری"""
+    activities = list(activities)
+    if not activities:
+        return
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        # بدون تراکنش، on_commit بلافاصله اجرا می‌شود؛ بافر معنایی ندارد
+        _flush(activities, using)
+        return
+    _get_buffer(connection, using).extend(activities)
+
+
+def flush_pending_activities():
+    """انتظار برای نوشته شدن فعالیت‌های صف پس‌زمینه (برای تست و خاموش شدن)"""
+    if _writer is not None:
+        _writer.queue.join()
+
+
+class _ActivityBuffer(list):
+    def __init__(self, key, using):
+        super().__init__()
+        self.key = key
+        self.using = using
+
+    def __call__(self):
+        pending = _pending_buffers()
+        if pending.get(self.key) is self:
+            del pending[self.key]
+        _flush(list(self), self.using)
+
+
+def _pending_buffers():
+    if not hasattr(_local, 'buffers'):
+        _local.buffers = {}
+    return _local.buffers
+
+
+def _is_registered(connection, buffer):
+    return any(entry[1] is buffer for entry in connection.run_on_commit)
+
+
+def _get_buffer(connection, using):
+    # هر savepoint بافر جداگانه دارد تا rollback جزئی فقط فعالیت‌های خودش را دور بریزد؛
+    # بلوک‌های atomic بدون savepoint (None) جدا rollback نمی‌شوند و بافر مشترک دارند
+    key = (using, tuple(sid for sid in connection.savepoint_ids if sid is not None))
+    pending = _pending_buffers()
+    buffer = pending.get(key)
+    if buffer is not None and _is_registered(connection, buffer):
+        return buffer
+
+    # بافرهایی که callback آن‌ها با rollback حذف شده دیگر نوشته نمی‌شوند
+    for stale_key in [k for k, b in pending.items() if k[0] == using and not _is_registered(connection, b)]:
+        del pending[stale_key]
+
+    buffer = pending[key] = _ActivityBuffer(key, using)
+    transaction.on_commit(buffer, using=using)
+    return buffer
+
+
+def _flush(activities, using):
+    if getattr(settings, 'ACTIVITY_FLUSH_MODE', 'commit') == 'background':
+        _get_writer().put(activities, using)
+    else:
+        write_activities(activities, using)
+
+
+def write_activities(activities, using=DEFAULT_DB_ALIAS):
+    """نوشتن فعالیت‌ها با یک bulk_create و پخش آن‌ها در صندوق فید گیرندگان"""
+    with write_transaction(using=using):
+        Activity.objects.using(using).bulk_create(activities, batch_size=ACTIVITY_BATCH_SIZE)
+        fan_out(activities, using=using)
+
+
+# ==============================================
+# نوشتن در پس‌زمینه
+# ==============================================
+
+class _ActivityWriter(threading.Thread):
+    """thread پس‌زمینه که فعالیت‌های صف را دسته‌ای در پایگاه داده می‌نویسد"""
+
+    def __init__(self):
+        super().__init__(name='activity-writer', daemon=True)
+        self.queue = queue.Queue()
+
+    def put(self, activities, using):
+        self.queue.put((activities, using))
+
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+            # هر چه در صف جمع شده با هم نوشته می‌شود
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                batches = {}
+                for activities, using in items:
+                    batches.setdefault(using, []).extend(activities)
+                for using, activities in batches.items():
+                    write_activities(activities, using)
+            except Exception:
+                logger.exception('writing %d activity batches failed', len(items))
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+                for using in {using for _, using in items}:
+                    connections[using].close()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _ActivityWriter()
+            _writer.start()
+            atexit.register(flush_pending_activities)
+    return _writer
@@ -1,24 +1,93 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models.expressions import RawSQL
 from .models import *
+from .moderation import APPROVE, DELETE, HIDE, moderate_comments
+from .pagination import ApproximateCountPaginator
+from .rollups import post_activity, recent_post_activity
+from .search import match_subquery, is_available as is_search_available
 
 
 # admin.site.register(Post)
 # admin.site.register(Comment)
 
+class InputFilter(admin.SimpleListFilter):
+    """فیلتر متنی به جای فهرست کردن همه ردیف‌های جدول مرتبط در نوار کناری"""
+    template = 'admin/input_filter.html'
+    # مقدار عددی با id_lookup و در غیر این صورت با text_lookup فیلتر می‌شود
+    id_lookup = None
+    text_lookup = None
+    
+    def lookups(self, request, model_admin):
+        # فیلتر فقط در صورت داشتن حداقل یک گزینه نمایش داده می‌شود
+        return ((None, None),)
+    
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        # سایر پارامترهای فعلی به صورت فیلد مخفی در فرم حفظ می‌شوند
+        all_choice['query_parts'] = [
+            (key, value)
+            for key, values in changelist.get_filters_params().items()
+            if key != self.parameter_name
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        yield all_choice
+    
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        if value.isdigit() and self.id_lookup:
+            return queryset.filter(**{self.id_lookup: int(value)})
+        if self.text_lookup:
+            return queryset.filter(**{self.text_lookup: value})
+        return queryset.none()
+
+class PostInputFilter(InputFilter):
+    title = 'پست (شناسه یا عنوان)'
+    parameter_name = 'post'
+    id_lookup = 'post_id'
+    text_lookup = 'post__title__icontains'
+
+class CommentInputFilter(InputFilter):
+    title = 'نظر (شناسه)'
+    parameter_name = 'comment'
+    id_lookup = 'comment_id'
+
+class AuthorInputFilter(InputFilter):
+    title = 'نویسنده (شناسه یا نام کاربری)'
+    parameter_name = 'author'
+    id_lookup = 'author_id'
+    text_lookup = 'author__username'
+
+class UserInputFilter(InputFilter):
+    title = 'کاربر (شناسه یا نام کاربری)'
+    parameter_name = 'user'
+    id_lookup = 'user_id'
+    text_lookup = 'user__username'
+
 class PostLikeInline(admin.TabularInline):
     model = PostLike
     extra = 0
+    autocomplete_fields = ('user',)
 
 class PostDislikeInline(admin.TabularInline):
     model = PostDislike
     extra = 0
+    autocomplete_fields = ('user',)
     
+def format_activity(totals):
+    """نمایش {نوع: تعداد} خلاصه فعالیت با برچسب فارسی نوع‌ها"""
+    labels = dict(Activity.ACTIVITY_TYPES)
+    return '، '.join(f'{labels.get(kind, kind)}: {count}' for kind, count in sorted(totals.items())) or '-'
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'date', 'is_active', 'get_likes_count', 'get_dislikes_count', 'comments_count')
-    list_filter = ('is_active', 'date', 'author')
+    list_display = ('title', 'author', 'date', 'is_active', 'get_likes_count', 'get_dislikes_count', 'comments_count', 'get_recent_activity')
+    list_filter = ('is_active', 'date', AuthorInputFilter)
+    list_select_related = ('author',)
     search_fields = ('title', 'body', 'author__username')
-    readonly_fields = ('created_at','updated_at')
+    autocomplete_fields = ('author',)
+    readonly_fields = ('created_at','updated_at', 'activity_breakdown')
     inlines = [PostLikeInline, PostDislikeInline]
     fieldsets = (
         ('اطلاعات اصلی', {
@@ -28,65 +97,148 @@ class PostAdmin(admin.ModelAdmin):
             'fields': ('quotes', 'is_active', 'date')
         }),
         ('اطلاعات سیستمی', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'activity_breakdown'),
             'classes': ('collapse',)
         }),
     )
     
+    # آمار فعالیت از خلاصه‌های روزانه (blog/rollups.py)، نه از جدول Activity
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(recent_activity=recent_post_activity())
+    
+    def get_recent_activity(self, obj):
+        return obj.recent_activity
+    get_recent_activity.short_description = 'فعالیت اخیر'
+    get_recent_activity.admin_order_field = 'recent_activity'
+    
+    def activity_breakdown(self, obj):
+        return format_activity(post_activity(obj.pk)) if obj.pk else '-'
+    activity_breakdown.short_description = 'فعالیت اخیر به تفکیک نوع'
+    
+    # شمارنده‌ها ستون‌های خود جدول‌اند و برای هر ردیف کوئری اضافه ندارند
     def get_likes_count(self, obj):
-        return obj.get_likes_count()
+        return obj.like_count
     get_likes_count.short_description = 'تعداد لایک‌ها'
+    get_likes_count.admin_order_field = 'like_count'
     
     def get_dislikes_count(self, obj):
-        return obj.get_dislikes_count()
+        return obj.dislike_count
     get_dislikes_count.short_description = 'تعداد دیسلایک‌ها'
+    get_dislikes_count.admin_order_field = 'dislike_count'
+    
+    def comments_count(self, obj):
+        return obj.comment_count
+    comments_count.short_description = 'تعداد نظرات'
+    comments_count.admin_order_field = 'comment_count'
+    
+    def get_search_results(self, request, queryset, search_term):
+        # در SQLite جستجو از نمایه FTS5 انجام می‌شود، نه icontains روی کل جدول
+        subquery = match_subquery(search_term) if is_search_available() else None
+        if subquery is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=RawSQL(*subquery)), False
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('short_body', 'author', 'post', 'created_at', 'is_active', 'is_reply', 'get_replies_count')
-    list_filter = ('is_active', 'created_at', 'post')
+    list_filter = ('is_active', 'created_at', PostInputFilter, AuthorInputFilter)
+    list_select_related = ('author', 'post')
     search_fields = ('body', 'author__username', 'post__title')
+    autocomplete_fields = ('author', 'post', 'parent')
     readonly_fields = ('created_at',)
+    actions = ['approve_comments', 'hide_comments', 'delete_comments', 'delete_author_comments']
     
     def short_body(self, obj):
         return obj.body[:50] + '...' if len(obj.body) > 50 else obj.body
     short_body.short_description = 'متن نظر'
     
     def is_reply(self, obj):
-        return '✅' if obj.parent else '❌'
+        return '✅' if obj.parent_id else '❌'
     is_reply.short_description = 'پاسخ؟'
     
     def get_replies_count(self, obj):
-        return obj.get_replies_count()
+        return obj.reply_count
     get_replies_count.short_description = 'تعداد پاسخ‌ها'
+    get_replies_count.admin_order_field = 'reply_count'
+    
+    # عملیات دسته‌ای؛ هر عملیات کل زیرشاخه پاسخ‌ها را هم در بر می‌گیرد
+    def moderate(self, request, action, message, **filters):
+        affected = moderate_comments(action, **filters)
+        self.message_user(request, message.format(count=affected), messages.SUCCESS)
+    
+    @admin.action(description='تایید نظرات انتخاب‌شده و پاسخ‌هایشان', permissions=['change'])
+    def approve_comments(self, request, queryset):
+        self.moderate(request, APPROVE, '{count} نظر تایید شد.', ids=queryset.values_list('pk', flat=True))
+    
+    @admin.action(description='مخفی کردن نظرات انتخاب‌شده و پاسخ‌هایشان', permissions=['change'])
+    def hide_comments(self, request, queryset):
+        self.moderate(request, HIDE, '{count} نظر مخفی شد.', ids=queryset.values_list('pk', flat=True))
+    
+    @admin.action(description='حذف نظرات انتخاب‌شده و پاسخ‌هایشان', permissions=['delete'])
+    def delete_comments(self, request, queryset):
+        self.moderate(request, DELETE, '{count} نظر حذف شد.', ids=queryset.values_list('pk', flat=True))
+    
+    @admin.action(description='حذف همه نظرات نویسندگان نظرات انتخاب‌شده', permissions=['delete'])
+    def delete_author_comments(self, request, queryset):
+        author_ids = set(queryset.values_list('author_id', flat=True))
+        self.moderate(request, DELETE, '{count} نظر حذف شد.', author_ids=author_ids)
 
 @admin.register(PostLike)
 class PostLikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'created_at')
-    list_filter = ('created_at', 'post')
+    list_filter = ('created_at', PostInputFilter, UserInputFilter)
+    list_select_related = ('user', 'post')
     search_fields = ('user__username', 'post__title')
+    autocomplete_fields = ('user', 'post')
 
 @admin.register(PostDislike)
 class PostDislikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'post', 'created_at')
-    list_filter = ('created_at', 'post')
+    list_filter = ('created_at', PostInputFilter, UserInputFilter)
+    list_select_related = ('user', 'post')
     search_fields = ('user__username', 'post__title')
+    autocomplete_fields = ('user', 'post')
 
 @admin.register(CommentLike)
 class CommentLikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'comment', 'created_at')
-    list_filter = ('created_at', 'comment')
+    list_filter = ('created_at', CommentInputFilter, UserInputFilter)
+    # عنوان نظر شامل نام نویسنده و عنوان پست است
+    list_select_related = ('user', 'comment__author', 'comment__post')
     search_fields = ('user__username', 'comment__body')
+    autocomplete_fields = ('user', 'comment')
 
 @admin.register(CommentDislike)
 class CommentDislikeAdmin(admin.ModelAdmin):
     list_display = ('user', 'comment', 'created_at')
-    list_filter = ('created_at', 'comment')
+    list_filter = ('created_at', CommentInputFilter, UserInputFilter)
+    list_select_related = ('user', 'comment__author', 'comment__post')
     search_fields = ('user__username', 'comment__body')
+    autocomplete_fields = ('user', 'comment')
 
 @admin.register(Activity)
 class ActivityAdmin(admin.ModelAdmin):
     list_display = ('user', 'get_activity_type_display', 'post', 'comment', 'created_at')
-    list_filter = ('activity_type', 'created_at', 'user')
+    list_filter = ('activity_type', 'created_at', UserInputFilter)
+    list_select_related = ('user', 'post', 'comment__author', 'comment__post')
     search_fields = ('user__username', 'post__title', 'comment__body')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    autocomplete_fields = ('user', 'post', 'comment')
+    readonly_fields = ('created_at',)
+    # جدول فعالیت‌ها بسیار بزرگ است؛ بدون COUNT(*) دقیق صفحه‌بندی می‌شود
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+# خلاصه‌های روزانه؛ آمار فعالیت از این جدول‌ها خوانده می‌شود، نه از Activity
+@admin.register(PostActivityDaily)
+class PostActivityDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'post', 'activity_type', 'count')
+    list_filter = ('activity_type', 'day', PostInputFilter)
+    list_select_related = ('post',)
+    date_hierarchy = 'day'
+
+@admin.register(UserActivityDaily)
+class UserActivityDailyAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'activity_type', 'count')
+    list_filter = ('activity_type', 'day', UserInputFilter)
+    list_select_related = ('user',)
+    date_hierarchy = 'day'
@@ -0,0 +1,95 @@
+"""
+کارت نویسنده (شناسه، نام کاربری، آواتار) برای پاسخ‌های JSON نظرات
+
+کارت‌ها برای مجموعه‌ای از شناسه‌ها با یک کوئری خوانده می‌شوند و در یک کش
+LRU سطح پردازه نگه داشته می‌شوند؛ ذخیره یا حذف CustomUser کارت را در همان
+پردازه باطل می‌کند و پردازه‌های دیگر (workerهای gunicorn) حداکثر پس از
+AUTHOR_CARD_TTL ثانیه کارت را دوباره می‌خوانند.
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.templatetags.static import static
+from accounts.models import CustomUser
+
+DEFAULT_AVATAR = 'assets/img/comment/comment_1.png'
+AUTHOR_CARD_CACHE_SIZE = 2048
+AUTHOR_CARD_TTL = 60
+
+# شناسه کاربر -> (کارت، زمان خواندن)
+_cards = OrderedDict()
+_cards_lock = threading.Lock()
+
+
+def build_author_card(user):
+    """ساخت کارت از یک کاربر بارگذاری‌شده، بدون کوئری"""
+    photo = user.photo
+    # مقدار پیش‌فرض فیلد photo رشته 'null' است، نه یک فایل واقعی
+    has_photo = bool(photo) and photo.name != 'null'
+    return {
+        'id': user.pk,
+        'username': user.username,
+        'avatar': photo.url if has_photo else static(DEFAULT_AVATAR),
+    }
+
+
+def get_author_cards(user_ids):
+    """کارت چند نویسنده؛ شناسه‌هایی که در کش نیستند با یک کوئری خوانده می‌شوند"""
+    cards, missing = _lookup(user_ids)
+    if missing:
+        users = CustomUser.objects.filter(pk__in=missing).only('id', 'username', 'photo')
+        loaded = {user.pk: build_author_card(user) for user in users}
+        _store(loaded)
+        cards.update(loaded)
+    return cards
+
+
+def get_author_card(user_id):
+    return get_author_cards([user_id]).get(user_id)
+
+
+async def aget_author_cards(user_ids):
+    """نسخه async از get_author_cards برای ویوهای ASGI"""
+    cards, missing = _lookup(user_ids)
+    if missing:
+        users = CustomUser.objects.filter(pk__in=missing).only('id', 'username', 'photo')
+        loaded = {user.pk: build_author_card(user) async for user in users}
+        _store(loaded)
+        cards.update(loaded)
+    return cards
+
+
+async def aget_author_card(user_id):
+    return (await aget_author_cards([user_id])).get(user_id)
+
+
+def _lookup(user_ids):
+    """کارت‌های موجود در کش و شناسه‌های پیدا نشده"""
+    cards = {}
+    missing = set()
+    now = time.monotonic()
+    with _cards_lock:
+        for user_id in set(user_ids):
+            entry = _cards.get(user_id)
+            if entry is None or now - entry[1] > AUTHOR_CARD_TTL:
+                missing.add(user_id)
+            else:
+                _cards.move_to_end(user_id)
+                cards[user_id] = entry[0]
+    return cards, missing
+
+
+def _store(cards):
+    loaded_at = time.monotonic()
+    with _cards_lock:
+        for user_id, card in cards.items():
+            # کارت تازه به انتهای LRU می‌رود
+            _cards.pop(user_id, None)
+            _cards[user_id] = (card, loaded_at)
+        while len(_cards) > AUTHOR_CARD_CACHE_SIZE:
+            _cards.popitem(last=False)
+
+
+def invalidate_author_card(user_id):
+    with _cards_lock:
+        _cards.pop(user_id, None)
@@ -0,0 +1,283 @@
+"""
+بنچمارک همه مسیرهای blog/url.py با test client
+
+هر مسیر چند بار گرم و سپس iterations بار اجرا می‌شود؛ برای هر مسیر صدک‌های
+50/95/99 زمان پاسخ، میانگین و بیشینه تعداد کوئری و اوج حافظه تخصیص‌یافته در
+یک درخواست (با tracemalloc، در اجرای جداگانه تا زمان‌ها را کند نکند) گزارش
+می‌شود. نتیجه به صورت JSON ذخیره و با اجرای قبلی مقایسه می‌شود.
+
+مسیرها روی داده موجود (معمولا ساخته‌شده با generate_dataset) اجرا می‌شوند:
+پرنظرترین پست، پرپاسخ‌ترین نظر آن و نویسنده پست به عنوان کاربر واردشده.
+مسیرهای نوشتنی داده را تغییر می‌دهند؛ نظرهای لازم برای ویرایش و حذف در خود
+بنچمارک ساخته می‌شوند.
+
+run_comment_render درخت‌های نظر ساخته‌شده در حافظه را بدون پایگاه داده با
+قالب صفحه پست رندر می‌کند تا رشد زمان رندر با تعداد نظرات دیده شود.
+"""
+import json
+import math
+import platform
+import random
+import resource
+import time
+import tracemalloc
+import django
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import CustomUser
+from .dataset import DATASET_PASSWORD
+from .models import *
+from .querybudget import collect_queries, get_budget
+
+PERCENTILES = (50, 95, 99)
+
+
+def _own_comment(context, reuse=False):
+    """نظر کاربر واردشده روی پست هدف؛ برای حذف هر بار نظر تازه ساخته می‌شود"""
+    if reuse and 'own_comment' in context:
+        return context['own_comment']
+    context['own_comment'] = Comment.objects.create(post=context['post'], author=context['user'], body='benchmark')
+    return context['own_comment']
+
+
+# نام URL -> تابعی که برای هر درخواست (method, args, kwargs کلاینت) می‌سازد
+# ساخت داده پیش‌نیاز داخل این تابع‌ها در زمان‌سنجی حساب نمی‌شود
+ROUTES = {
+    'home': lambda context: ('get', (), {}),
+    'search': lambda context: ('get', (), {'data': {'q': context['query']}}),
+    'feed': lambda context: ('get', (), {}),
+    'post_detail': lambda context: ('get', (context['post'].pk,), {}),
+    'post_new': lambda context: ('get', (), {}),
+    'update': lambda context: ('get', (context['post'].pk,), {}),
+    'delete': lambda context: ('get', (context['post'].pk,), {}),
+    'toggle_post_reaction': lambda context: ('post', (context['post'].pk,), {'data': {'action': 'like'}}),
+    'add_comment': lambda context: (
+        'post', (context['post'].pk,), {'data': {'body': 'benchmark', 'parent_id': context['comment'].pk}},
+    ),
+    'update_comment': lambda context: (
+        'post', (_own_comment(context, reuse=True).pk,),
+        {'data': json.dumps({'body': 'benchmark edit'}), 'content_type': 'application/json'},
+    ),
+    'delete_comment': lambda context: ('post', (_own_comment(context).pk,), {}),
+    'get_replies': lambda context: ('get', (context['comment'].pk,), {'data': {'depth': 3}}),
+    'toggle_like': lambda context: ('post', (context['comment'].pk,), {'data': {'action': 'like'}}),
+    'fragment_cache_stats': lambda context: ('get', (), {}),
+}
+
+# مسیرهایی که با کاربر کارمند اجرا می‌شوند؛ بدون کاربر کارمند کنار گذاشته می‌شوند
+STAFF_ROUTES = ('fragment_cache_stats',)
+
+# مسیرهایی که با این روش قابل اندازه‌گیری نیستند
+SKIPPED = {
+    'post_events': 'پاسخ stream بی‌پایان است',
+}
+
+
+def blog_url_names():
+    from . import url
+    return [pattern.name for pattern in url.urlpatterns]
+
+
+def uncovered_routes():
+    """نام‌های URL وبلاگ که نه بنچمارک دارند و نه عمدا کنار گذاشته شده‌اند"""
+    return [name for name in blog_url_names() if name not in ROUTES and name not in SKIPPED]
+
+
+def benchmark_context():
+    """داده هدف بنچمارک؛ None اگر پایگاه داده پستی با نظر نداشته باشد"""
+    post = Post.objects.filter(comment_count__gt=0).order_by('-comment_count', 'pk').first()
+    if post is None:
+        return None
+    comment = Comment.objects.filter(post=post, depth=0).order_by('-reply_count', 'pk').first()
+    return {
+        'post': post,
+        'comment': comment,
+        'user': post.author,
+        'staff': CustomUser.objects.filter(is_staff=True, is_active=True).order_by('pk').first(),
+        'query': post.title.split()[0],
+    }
+
+
+def make_client(user):
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    client = Client(SERVER_NAME=host)
+    if not client.login(username=user.username, password=DATASET_PASSWORD):
+        # داده‌ای که با generate_dataset ساخته نشده؛ بدون رمز عبور وارد می‌شویم
+        client.force_login(user)
+    return client
+
+
+def percentile(values, percent):
+    """صدک به روش nearest-rank"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def run_route(client, context, name, iterations=50, warmup=5):
+    build = ROUTES[name]
+
+    def request():
+        method, args, kwargs = build(context)
+        url = reverse(name, args=args)
+        with collect_queries() as stats:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            elapsed = time.perf_counter() - started
+        return response, elapsed, stats.count
+
+    for _ in range(warmup):
+        request()
+
+    latencies, queries, statuses = [], [], set()
+    for _ in range(iterations):
+        response, elapsed, count = request()
+        latencies.append(elapsed * 1000)
+        queries.append(count)
+        statuses.add(response.status_code)
+
+    tracemalloc.start()
+    try:
+        request()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {f'p{percent}_ms': round(percentile(latencies, percent), 3) for percent in PERCENTILES}
+    result.update({
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'query_budget': get_budget(name),
+        'peak_kb': round(peak / 1024, 1),
+        'status': sorted(statuses),
+    })
+    return result
+
+
+def run_benchmark(names=None, iterations=50, warmup=5, log=None):
+    context = benchmark_context()
+    if context is None:
+        return None
+    client = make_client(context['user'])
+    staff_client = make_client(context['staff']) if context['staff'] else None
+    routes = {}
+    for name in names or ROUTES:
+        route_client = staff_client if name in STAFF_ROUTES else client
+        if route_client is None:
+            continue
+        routes[name] = run_route(route_client, context, name, iterations, warmup)
+        if log:
+            log(name, routes[name])
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'rows': {model.__name__: model.objects.count() for model in (Post, Comment, PostLike, CommentLike, Activity)},
+            # kilobytes در لینوکس
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        'routes': routes,
+    }
+
+
+def compare(current, baseline, keys=('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'peak_kb')):
+    """
+    تغییر نسبی هر معیار نسبت به baseline به درصد
+    خروجی: {نام مسیر: {معیار: درصد}} فقط برای مسیرهای مشترک
+    """
+    changes = {}
+    for name, result in current['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        changes[name] = {
+            key: round((result[key] - previous[key]) / previous[key] * 100, 1) if previous.get(key) else None
+            for key in keys
+        }
+    return changes
+
+
+# شکل درخت -> تابعی که از روی شماره نظر و rng شماره والد (یا None) را می‌دهد
+COMMENT_TREE_SHAPES = {
+    # همه نظرات اصلی
+    'flat': lambda index, rng: None,
+    # هر نظر پاسخ نظر قبلی؛ عمق درخت برابر تعداد نظرات
+    'chain': lambda index, rng: index - 1 if index else None,
+    # مثل generate_dataset: پاسخ به نظرات اخیر با گفتگوهای عمیق
+    'mixed': lambda index, rng: (
+        index - 1 - min(int(rng.expovariate(0.5)), index - 1) if index and rng.random() < 0.6 else None
+    ),
+}
+COMMENT_RENDER_SIZES = (500, 1000, 2000, 5000)
+
+
+def build_comment_tree(size, shape, seed=0):
+    """درخت نظرات ذخیره‌نشده به شکل خروجی get_comment_tree؛ (post, roots)"""
+    rng = random.Random(seed)
+    author = CustomUser(pk=1, username='benchmark', photo='photo/profile/benchmark.jpg')
+    post = Post(pk=1, title='benchmark', author=author)
+    created_at = timezone.now()
+    parent_of = COMMENT_TREE_SHAPES[shape]
+    comments, roots = [], []
+    for index in range(size):
+        parent_index = parent_of(index, rng)
+        parent = comments[parent_index] if parent_index is not None else None
+        comment = Comment(
+            pk=index + 1, post=post, author=author, body=_comment_body(rng),
+            created_at=created_at, depth=parent.depth + 1 if parent else 0,
+        )
+        comment.children = []
+        if parent:
+            parent.children.append(comment)
+            parent.reply_count += 1
+        else:
+            roots.append(comment)
+        comments.append(comment)
+    return post, roots
+
+
+def _comment_body(rng):
+    return ' '.join(rng.choice(('django', 'cache', 'query', 'template', 'render')) for _ in range(rng.randint(5, 40)))
+
+
+def render_comment_tree(post, roots):
+    """رندر فهرست نظرات همان‌طور که صفحه پست رندر می‌کند"""
+    return render_to_string('comments/comment_tree.html', {
+        'post': post,
+        'comments': flatten_comment_tree(roots),
+    })
+
+
+def run_comment_render(sizes=COMMENT_RENDER_SIZES, shapes=tuple(COMMENT_TREE_SHAPES), repeat=5, log=None):
+    """
+    زمان رندر درخت نظرات برای هر شکل و اندازه
+    کمترین زمان repeat اجرا گزارش می‌شود؛ زمان هر نظر در رشد خطی تقریبا ثابت می‌ماند.
+    """
+    # قالب‌ها پیش از زمان‌سنجی کامپایل و در کش loader نگه داشته می‌شوند
+    render_comment_tree(*build_comment_tree(1, 'flat'))
+    results = {}
+    for shape in shapes:
+        results[shape] = {}
+        for size in sizes:
+            post, roots = build_comment_tree(size, shape)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                html = render_comment_tree(post, roots)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            results[shape][size] = {
+                'ms': round(best * 1000, 2),
+                'us_per_comment': round(best * 1_000_000 / size, 2),
+                'kb': round(len(html.encode()) / 1024, 1),
+            }
+            if log:
+                log(shape, size, results[shape][size])
+    return results
@@ -0,0 +1,95 @@
+"""
+درخواست‌های شرطی (ETag / Last-Modified) برای صفحه پست و صفحه اصلی
+
+اعتبارسنج‌ها از داده‌ای ساخته می‌شوند که ویو در هر حال می‌خواند و پیش از
+رندر قالب یا خواندن نظرات بررسی می‌شوند؛ در صورت تطبیق If-None-Match یا
+If-Modified-Since پاسخ 304 بدون بدنه برمی‌گردد.
+
+- Last-Modified آخرین زمان تغییر است: updated_at پست و last_activity_at که
+  همراه شمارنده‌های نظر و واکنش به‌روز می‌شود (بدون کوئری اضافه).
+- ETag علاوه بر آن شمارنده‌ها و نسل کش نظرات و نویسنده را هم در بر دارد، چون
+  ویرایش نظر و تغییر نویسنده زمانی روی پست به جا نمی‌گذارند. وضعیت ورود
+  بیننده و PAGE_ETAG_VERSION (نسخه استقرار، برای تغییر قالب‌ها) هم در آن است.
+- هر دو صفحه sidebar.html را دارند، پس آخرین پست‌ها (از کش سطح پردازه) هم
+  بخشی از ETag هستند.
+
+پاسخ‌ها private و no-cache هستند: مرورگر نگه می‌دارد ولی هر بار اعتبارسنجی می‌کند.
+"""
+import hashlib
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .context_processors import get_recent_posts
+from .fragment_cache import get_generation
+
+
+def viewer_key(request):
+    user = getattr(request, 'user', None)
+    return f'user:{user.pk}' if user is not None and user.is_authenticated else 'anonymous'
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def _timestamps(post):
+    return [post.updated_at, post.last_activity_at]
+
+
+def sidebar_validators():
+    """ستون‌هایی از آخرین پست‌ها که sidebar نمایش می‌دهد"""
+    return [(post.pk, post.title, post.date, post.photo.name) for post in get_recent_posts()]
+
+
+def _last_modified(timestamps):
+    return max((timestamp for timestamp in timestamps if timestamp is not None), default=None)
+
+
+def post_validators(request, post):
+    """(etag, last_modified) صفحه پست"""
+    timestamps = _timestamps(post)
+    last_modified = _last_modified(timestamps)
+    etag = make_etag(
+        'post', getattr(settings, 'PAGE_ETAG_VERSION', ''), viewer_key(request),
+        post.pk, *timestamps, post.like_count, post.dislike_count, post.comment_count,
+        get_generation('comments', post.pk), get_generation('author', post.author_id),
+        *sidebar_validators(),
+    )
+    return etag, last_modified
+
+
+def post_list_validators(request, page, extra=()):
+    """(etag, last_modified) یک صفحه از فهرست پست‌ها از روی ردیف‌های همان صفحه"""
+    rows = [
+        (post.pk, *_timestamps(post), post.like_count, post.dislike_count, post.comment_count)
+        for post in page
+    ]
+    last_modified = _last_modified(timestamp for post in page for timestamp in _timestamps(post))
+    etag = make_etag(
+        'post_list', getattr(settings, 'PAGE_ETAG_VERSION', ''), viewer_key(request),
+        page.number, page.has_previous(), page.has_next(), *extra, *sidebar_validators(), *rows,
+    )
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """پاسخ 304 (یا 412) در صورت تطبیق اعتبارسنج‌ها، وگرنه None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    patch_cache_control(response, private=True, no_cache=True)
+    # محتوا به بیننده وابسته است
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -1,5 +1,35 @@
+import threading
+import time
+from django.utils.functional import SimpleLazyObject
 from .models import Post
 
+RECENT_POSTS_COUNT = 5
+# محافظ برای تغییراتی که از پردازه‌های دیگر یا بدون سیگنال انجام شده‌اند
+RECENT_POSTS_TTL = 300
+
+_recent_posts = None
+_recent_posts_loaded_at = 0
+_recent_posts_lock = threading.Lock()
+
+
+def get_recent_posts():
+    """آخرین پست‌ها از کش سطح پردازه؛ فقط ستون‌هایی که sidebar نمایش می‌دهد"""
+    global _recent_posts, _recent_posts_loaded_at
+    with _recent_posts_lock:
+        if _recent_posts is None or time.monotonic() - _recent_posts_loaded_at > RECENT_POSTS_TTL:
+            _recent_posts = tuple(
+                Post.objects.only('id', 'title', 'date', 'photo').order_by('-date')[:RECENT_POSTS_COUNT]
+            )
+            _recent_posts_loaded_at = time.monotonic()
+        return _recent_posts
+
+
+def invalidate_recent_posts():
+    global _recent_posts
+    with _recent_posts_lock:
+        _recent_posts = None
+
+
 def recent_posts(request):
-    recent_posts = Post.objects.order_by('-date')[:5]
-    return {'recent_posts':recent_posts}
\ No newline at end of file
+    # تا زمانی که قالب sidebar.html از آن استفاده نکند کوئری اجرا نمی‌شود
+    return {'recent_posts': SimpleLazyObject(get_recent_posts)}
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import *
+
+
+# منبع هر شمارنده: (مدل شمارش‌شونده، فیلد ارجاع به رکورد، فیلترهای اضافه)
+COUNTER_SOURCES = {
+    Post: {
+        'like_count': (PostLike, 'post', {}),
+        'dislike_count': (PostDislike, 'post', {}),
+        'comment_count': (Comment, 'post', {'is_active': True}),
+    },
+    Comment: {
+        'like_count': (CommentLike, 'comment', {}),
+        'dislike_count': (CommentDislike, 'comment', {}),
+        'reply_count': (Comment, 'parent', {'is_active': True}),
+    },
+}
+
+
+# مدل -> فیلد زمان آخرین فعالیت که با هر تغییر شمارنده همان ردیف به‌روز می‌شود
+ACTIVITY_TIMESTAMPS = {
+    Post: 'last_activity_at',
+}
+
+
+def bump_counter(model, pk, field, delta):
+    """تغییر اتمیک یک شمارنده در پایگاه داده بدون خواندن مقدار فعلی"""
+    if not delta or pk is None:
+        return
+    expression = F(field) + delta
+    if delta < 0:
+        expression = Greatest(expression, Value(0))
+    model.objects.filter(pk=pk).update(**{field: expression}, **activity_timestamp(model))
+
+
+def activity_timestamp(model):
+    """مقدار به‌روزرسانی فیلد زمان آخرین فعالیت مدل (در صورت وجود)"""
+    field = ACTIVITY_TIMESTAMPS.get(model)
+    return {field: timezone.now()} if field else {}
+
+
+def actual_count(model, field):
+    """زیرکوئری شمارش واقعی یک شمارنده برای استفاده در annotate یا update"""
+    source, fk, filters = COUNTER_SOURCES[model][field]
+    counts = (
+        source.objects
+        .filter(**{fk: OuterRef('pk')}, **filters)
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
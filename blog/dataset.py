@@ -0,0 +1,222 @@
+"""
+ساخت داده آزمایشی با شکل بار واقعی برای بنچمارک
+
+کاربران، پست‌ها، درخت‌های عمیق نظر، واکنش‌ها و فعالیت‌ها با درج دسته‌ای و
+بدون سیگنال نوشته می‌شوند؛ بنابراین هر چیزی که سیگنال‌ها می‌سازند اینجا
+مستقیم محاسبه می‌شود: شناسه‌ها از پیش رزرو می‌شوند تا path و depth نظرات
+قبل از درج معلوم باشند، شمارنده‌های ذخیره‌شده در حافظه شمرده می‌شوند،
+فعالیت‌ها به صندوق فید گیرندگان پخش می‌شوند و در پایان نمایه جستجو از نو
+ساخته می‌شود.
+
+با seed یکسان و پایگاه داده خالی خروجی یکسان است. داده دسته‌به‌دسته (هر
+POST_CHUNK پست با همه نظرات و واکنش‌هایش) در یک تراکنش نوشته می‌شود تا حافظه
+مصرفی به اندازه کل داده وابسته نباشد.
+"""
+import datetime
+import random
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router
+from django.db.models import Max
+from django.utils import timezone
+from accounts.models import CustomUser
+from config.sqlite import write_transaction
+from .feed import fan_out
+from .models import *
+from .search import rebuild_index
+
+# رمز عبور همه کاربران ساخته‌شده؛ بنچمارک با آن وارد می‌شود
+DATASET_PASSWORD = 'benchmark'
+BULK_BATCH_SIZE = 2000
+POST_CHUNK = 50
+
+# احتمال این‌که نظر جدید پاسخ به نظر دیگری باشد، و سهم دیسلایک از واکنش‌ها
+REPLY_RATIO = 0.6
+DISLIKE_RATIO = 0.15
+
+WORDS = (
+    'جنگو پایتون پایگاه داده کش کوئری ایندکس درخت نظر پاسخ واکنش فید فعالیت '
+    'سرور درخواست پاسخگویی تاخیر حافظه تراکنش قفل نوشتن خواندن replica '
+    'django python sqlite cache index query latency benchmark async stream'
+).split()
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _paragraphs(rng, count):
+    return '\n\n'.join(_sentence(rng, rng.randint(30, 80)) for _ in range(count))
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class _Ids:
+    """شناسه‌های رزروشده هر مدل؛ جایگزین شناسه‌ای که پایگاه داده پس از درج می‌دهد"""
+
+    def __init__(self, *models):
+        self._next = {model: _next_pk(model) for model in models}
+
+    def __call__(self, model):
+        pk = self._next[model]
+        self._next[model] += 1
+        return pk
+
+
+def _bulk_create(model, objects):
+    """
+    درج دسته‌ای با حفظ زمان‌های ساخته‌شده
+    bulk_create برای auto_now_add و auto_now زمان فعلی را می‌گذارد؛ درج raw (مثل
+    loaddata) pre_save را صدا نمی‌زند و مقدار خود شیء را می‌نویسد. شناسه‌ها از پیش
+    رزرو شده‌اند، پس چیزی از پایگاه داده برگردانده نمی‌شود.
+    """
+    if not objects:
+        return
+    using = router.db_for_write(model)
+    fields = model._meta.concrete_fields
+    batch_size = min(BULK_BATCH_SIZE, connections[using].ops.bulk_batch_size(fields, objects))
+    for offset in range(0, len(objects), batch_size):
+        model._base_manager._insert(objects[offset:offset + batch_size], fields=fields, using=using, raw=True)
+
+
+def generate_dataset(users=1000, posts=2000, comments_per_post=20, max_depth=8,
+                     likes_per_post=100, likes_per_comment=3, days=365, seed=0,
+                     log=None):
+    """
+    ساخت داده آزمایشی و برگرداندن تعداد رکوردهای ساخته‌شده به تفکیک مدل
+    تعداد نظر و واکنش هر پست حول میانگین داده‌شده پخش می‌شود (چند پست پربازدید،
+    بسیاری کم‌بازدید).
+    """
+    rng = random.Random(seed)
+    ids = _Ids(CustomUser, Post, Comment, PostLike, PostDislike, CommentLike, Activity)
+    now = timezone.now()
+    start = now - datetime.timedelta(days=days)
+    totals = dict.fromkeys(('users', 'posts', 'comments', 'post_reactions', 'comment_reactions', 'activities'), 0)
+
+    user_ids = _create_users(rng, ids, users)
+    totals['users'] = len(user_ids)
+    if log:
+        log(f'{len(user_ids)} users')
+
+    for chunk_start in range(0, posts, POST_CHUNK):
+        chunk = _build_chunk(
+            rng, ids, user_ids, min(POST_CHUNK, posts - chunk_start), start, now,
+            comments_per_post, max_depth, likes_per_post, likes_per_comment,
+        )
+        with write_transaction():
+            for model, objects in chunk.items():
+                _bulk_create(model, objects)
+            fan_out(chunk[Activity])
+        totals['posts'] += len(chunk[Post])
+        totals['comments'] += len(chunk[Comment])
+        totals['post_reactions'] += len(chunk[PostLike]) + len(chunk[PostDislike])
+        totals['comment_reactions'] += len(chunk[CommentLike])
+        totals['activities'] += len(chunk[Activity])
+        if log:
+            log(f"{totals['posts']}/{posts} posts, {totals['comments']} comments, "
+                f"{totals['post_reactions'] + totals['comment_reactions']} reactions")
+
+    rebuild_index()
+    return totals
+
+
+def _create_users(rng, ids, count):
+    # هش رمز عبور کند است؛ یک بار برای همه کاربران
+    password = make_password(DATASET_PASSWORD)
+    users = []
+    for index in range(count):
+        pk = ids(CustomUser)
+        users.append(CustomUser(
+            pk=pk, username=f'user{pk}', password=password, email=f'user{pk}@example.com',
+            age=rng.randint(16, 70), about=_sentence(rng, 8),
+            # اولین کاربر کارمند است تا مسیرهای مدیریتی هم بنچمارک شوند
+            is_staff=index == 0,
+        ))
+    CustomUser.objects.bulk_create(users, batch_size=BULK_BATCH_SIZE)
+    return [user.pk for user in users]
+
+
+def _skewed(rng, mean):
+    """عدد صحیح تصادفی با توزیع نمایی حول mean"""
+    return int(rng.expovariate(1 / mean)) if mean > 0 else 0
+
+
+def _moment(rng, after, now):
+    return after + (now - after) * rng.random()
+
+
+def _build_chunk(rng, ids, user_ids, count, start, now, comments_per_post, max_depth,
+                 likes_per_post, likes_per_comment):
+    # ترتیب کلیدها ترتیب درج است (والدها پیش از فرزندان)
+    chunk = {model: [] for model in (Post, Comment, PostLike, PostDislike, CommentLike, Activity)}
+    activities = chunk[Activity]
+
+    for _ in range(count):
+        created_at = _moment(rng, start, now)
+        post = Post(
+            pk=ids(Post), title=_sentence(rng, rng.randint(3, 9)), excerpt=_sentence(rng, 25),
+            body=_paragraphs(rng, rng.randint(3, 8)), author_id=rng.choice(user_ids),
+            date=timezone.localdate(created_at), photo='posts/benchmark.jpg',
+            created_at=created_at, updated_at=created_at,
+        )
+        chunk[Post].append(post)
+
+        comments = []
+        for _ in range(_skewed(rng, comments_per_post)):
+            parent = None
+            if comments and rng.random() < REPLY_RATIO:
+                # گرایش به نظرات اخیر، تا زنجیره‌های عمیق گفتگو ساخته شود
+                parent = comments[-1 - min(int(rng.expovariate(0.5)), len(comments) - 1)]
+                if parent.depth >= max_depth:
+                    parent = None
+            pk = ids(Comment)
+            comment = Comment(
+                pk=pk, post_id=post.pk, author_id=rng.choice(user_ids), body=_sentence(rng, rng.randint(5, 40)),
+                created_at=_moment(rng, (parent or post).created_at, now),
+                parent_id=parent.pk if parent else None,
+                path=comment_path(parent.path if parent else '', pk),
+                depth=parent.depth + 1 if parent else 0,
+            )
+            if parent:
+                parent.reply_count += 1
+            comments.append(comment)
+            activities.append(Activity(
+                user_id=comment.author_id, activity_type='reply' if parent else 'comment',
+                post_id=post.pk, comment_id=pk, created_at=comment.created_at,
+            ))
+        post.comment_count = len(comments)
+        post.last_activity_at = max((comment.created_at for comment in comments), default=None)
+        chunk[Comment].extend(comments)
+
+        reactors = rng.sample(user_ids, min(_skewed(rng, likes_per_post), len(user_ids)))
+        for user_id in reactors:
+            model, activity_type = (PostDislike, 'post_dislike') if rng.random() < DISLIKE_RATIO else (PostLike, 'post_like')
+            reacted_at = _moment(rng, post.created_at, now)
+            chunk[model].append(model(pk=ids(model), post_id=post.pk, user_id=user_id, created_at=reacted_at))
+            activities.append(Activity(
+                user_id=user_id, activity_type=activity_type, post_id=post.pk, created_at=reacted_at,
+            ))
+            if model is PostLike:
+                post.like_count += 1
+            else:
+                post.dislike_count += 1
+            post.last_activity_at = max(post.last_activity_at or reacted_at, reacted_at)
+
+        for comment in comments:
+            for user_id in rng.sample(user_ids, min(_skewed(rng, likes_per_comment), len(user_ids))):
+                reacted_at = _moment(rng, comment.created_at, now)
+                chunk[CommentLike].append(CommentLike(
+                    pk=ids(CommentLike), comment_id=comment.pk, user_id=user_id, created_at=reacted_at,
+                ))
+                activities.append(Activity(
+                    user_id=user_id, activity_type='comment_like',
+                    post_id=post.pk, comment_id=comment.pk, created_at=reacted_at,
+                ))
+                comment.like_count += 1
+
+    # شناسه فعالیت‌ها به ترتیب زمان، مثل درج واقعی (فید بر اساس -id مرتب است)
+    activities.sort(key=lambda activity: activity.created_at)
+    for activity in activities:
+        activity.pk = ids(Activity)
+    return chunk
@@ -0,0 +1,320 @@
+"""
+پخش زنده رویدادهای نظرات و واکنش‌ها برای صفحه هر پست (Server-Sent Events)
+
+ویوها رویدادها را با publish() به hub همین پردازه می‌دهند و hub آن‌ها را به
+صف مشترک‌های هر کانال می‌رساند. رساندن رویداد بین پردازه‌ها کار backend است:
+
+- LocalBackend: فقط همین پردازه (پیش‌فرض، برای runserver و یک worker)
+- SQLiteBackend: یک فایل SQLite مشترک به جای broker، تا چند worker روی یک
+  ماشین رویدادهای هم را ببینند
+
+صف هر مشترک اندازه ثابت دارد؛ اگر کلاینت کند باشد قدیمی‌ترین رویدادها دور
+ریخته می‌شوند و یک رویداد resync ارسال می‌شود. در نبود رویداد، هر چند ثانیه
+یک ping فرستاده می‌شود تا اتصال‌های مرده شناسایی شوند.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'blog.events.LocalBackend'
+RETRY_MILLISECONDS = 3000
+
+logger = logging.getLogger(__name__)
+
+
+def post_channel(post_id):
+    return f'post:{post_id}'
+
+
+def publish(post_id, event, data):
+    """ارسال یک رویداد به مشترک‌های صفحه پست؛ خطای پخش هرگز به ویو نمی‌رسد"""
+    try:
+        get_hub().publish(post_channel(post_id), event, data)
+    except Exception:
+        logger.exception('publishing %s for post %s failed', event, post_id)
+
+
+def format_event(event, data, event_id=None):
+    """قالب‌بندی یک رویداد طبق پروتکل text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription(ABC):
+    """صف اندازه‌ثابت یک کلاینت؛ در صورت پر بودن قدیمی‌ترین رویداد حذف می‌شود"""
+
+    def __init__(self, channel, size):
+        self.channel = channel
+        self.messages = deque(maxlen=size)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def deliver(self, message):
+        # ممکن است از هر thread صدا زده شود
+        with self._lock:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+            self.messages.append(message)
+        self._notify()
+
+    def drain(self):
+        with self._lock:
+            messages = list(self.messages)
+            self.messages.clear()
+            dropped, self.dropped = self.dropped, 0
+        return messages, dropped
+
+    @abstractmethod
+    def _notify(self):
+        """بیدار کردن مصرف‌کننده منتظر پس از رسیدن پیام"""
+
+
+class AsyncSubscription(Subscription):
+    """مشترکی که در حلقه رویداد ASGI منتظر می‌ماند"""
+
+    def __init__(self, channel, size):
+        super().__init__(channel, size)
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # حلقه بسته شده و اتصال دیگر وجود ندارد
+            pass
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+        return self.drain()
+
+
+class ThreadSubscription(Subscription):
+    """مشترکی که در thread درخواست WSGI منتظر می‌ماند"""
+
+    def __init__(self, channel, size):
+        super().__init__(channel, size)
+        self._ready = threading.Event()
+
+    def _notify(self):
+        self._ready.set()
+
+    def wait(self, timeout):
+        self._ready.wait(timeout)
+        self._ready.clear()
+        return self.drain()
+
+
+class EventHub:
+    """نگهداری مشترک‌های هر کانال در این پردازه"""
+
+    def __init__(self, backend=DEFAULT_BACKEND, queue_size=100, **backend_options):
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+        self.queue_size = queue_size
+        self.backend = import_string(backend)(self, **backend_options)
+
+    def publish(self, channel, event, data):
+        self.backend.publish(channel, {'event': event, 'data': data})
+
+    def dispatch(self, channel, message):
+        """رساندن رویدادی که backend تحویل داده به مشترک‌های محلی"""
+        with self._lock:
+            subscriptions = list(self._channels.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def subscribe(self, channel, asynchronous=True):
+        subscription_class = AsyncSubscription if asynchronous else ThreadSubscription
+        subscription = subscription_class(channel, self.queue_size)
+        with self._lock:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._channels.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._channels[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._channels.get(channel, ()))
+            return sum(len(subscriptions) for subscriptions in self._channels.values())
+
+
+class LocalBackend:
+    """تحویل مستقیم رویدادها به hub همین پردازه"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._ids = itertools.count(1)
+
+    def publish(self, channel, message):
+        message['id'] = next(self._ids)
+        self.hub.dispatch(channel, message)
+
+
+class SQLiteBackend:
+    """
+    broker جایگزین روی یک فایل SQLite مشترک بین workerها
+
+    هر پردازه یک thread دارد که رویدادهای منتشرشده را در جدول می‌نویسد و
+    ردیف‌های جدید (از همه پردازه‌ها) را می‌خواند و به hub محلی می‌دهد.
+    شناسه ردیف همان شناسه رویداد SSE است.
+    """
+
+    def __init__(self, hub, path=None, poll_interval=0.25, retention=60):
+        self.hub = hub
+        self.path = str(path or settings.BASE_DIR / 'events.sqlite3')
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._outbox = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._start()
+
+    def publish(self, channel, message):
+        self._outbox.put((channel, json.dumps(message, cls=DjangoJSONEncoder)))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+
+    def close(self):
+        """توقف thread پس از ارسال رویدادهای در صف"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS blog_events ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'channel TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)'
+        )
+        return connection
+
+    def _run(self):
+        connection = self._connect()
+        # فقط رویدادهای بعد از شروع این پردازه پخش می‌شوند
+        last_id = connection.execute('SELECT COALESCE(MAX(id), 0) FROM blog_events').fetchone()[0]
+        last_prune = time.monotonic()
+        while not self._stopped.is_set() or not self._outbox.empty():
+            try:
+                try:
+                    pending = [self._outbox.get(timeout=self.poll_interval)]
+                except queue.Empty:
+                    pending = []
+                while True:
+                    try:
+                        pending.append(self._outbox.get_nowait())
+                    except queue.Empty:
+                        break
+                if pending:
+                    now = time.time()
+                    with connection:
+                        connection.executemany(
+                            'INSERT INTO blog_events (channel, payload, created) VALUES (?, ?, ?)',
+                            [(channel, payload, now) for channel, payload in pending],
+                        )
+
+                rows = connection.execute(
+                    'SELECT id, channel, payload FROM blog_events WHERE id > ? ORDER BY id', (last_id,)
+                ).fetchall()
+                for row_id, channel, payload in rows:
+                    last_id = row_id
+                    message = json.loads(payload)
+                    message['id'] = row_id
+                    self.hub.dispatch(channel, message)
+
+                if time.monotonic() - last_prune > self.retention:
+                    connection.execute('DELETE FROM blog_events WHERE created < ?', (time.time() - self.retention,))
+                    last_prune = time.monotonic()
+            except Exception:
+                logger.exception('event broker loop failed')
+                time.sleep(self.poll_interval)
+        connection.close()
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = EventHub(
+                backend=getattr(settings, 'EVENTS_BACKEND', DEFAULT_BACKEND),
+                queue_size=getattr(settings, 'EVENTS_QUEUE_SIZE', 100),
+                **getattr(settings, 'EVENTS_BACKEND_OPTIONS', {}),
+            )
+    return _hub
+
+
+def _heartbeat():
+    return getattr(settings, 'EVENTS_HEARTBEAT', 15)
+
+
+async def astream(channel):
+    """جریان async برای ASGI؛ با قطع اتصال، Django این generator را لغو می‌کند"""
+    hub = get_hub()
+    subscription = hub.subscribe(channel, asynchronous=True)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            messages, dropped = await subscription.wait(_heartbeat())
+            for chunk in _chunks(messages, dropped):
+                yield chunk
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def stream(channel):
+    """جریان همگام برای WSGI (مثلا runserver)؛ هر اتصال یک thread را نگه می‌دارد"""
+    hub = get_hub()
+    subscription = hub.subscribe(channel, asynchronous=False)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            messages, dropped = subscription.wait(_heartbeat())
+            yield from _chunks(messages, dropped)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def _chunks(messages, dropped):
+    if dropped:
+        # کلاینت عقب افتاده؛ باید وضعیت صفحه را از نو بخواند
+        yield format_event('resync', {'dropped': dropped})
+    if not messages and not dropped:
+        yield ': ping\n\n'
+    for message in messages:
+        yield format_event(message['event'], message['data'], message.get('id'))
@@ -0,0 +1,102 @@
+"""
+فید فعالیت هر کاربر (fan-out هنگام نوشتن)
+
+هر دسته فعالیت پس از نوشته شدن به صندوق گیرندگانش کپی می‌شود: نویسنده پست
+برای لایک، دیسلایک و نظر، نویسنده نظر برای واکنش به آن، و در پاسخ‌ها نویسنده
+نظر والد هم. خواندن فید یک اسکن بازه روی ایندکس (recipient, -id) است.
+
+صندوق هر کاربر به FEED_MAX_ENTRIES ردیف آخر محدود است ولی کوتاه کردن آن در
+مسیر نوشتن انجام نمی‌شود؛ دستور trim_feeds به صورت دوره‌ای صندوق‌های بیش از سقف
+را کوتاه می‌کند و تا آن زمان صندوق ممکن است کمی بیش از سقف ردیف داشته باشد.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+from .models import *
+from .pagination import KeysetPaginator
+
+FEED_BATCH_SIZE = 500
+
+# نوع فعالیت -> گیرندگان
+FEED_RECIPIENTS = {
+    'post_like': ('post_author',),
+    'post_dislike': ('post_author',),
+    'comment': ('post_author',),
+    'reply': ('post_author', 'parent_author'),
+    'comment_like': ('comment_author',),
+    'comment_dislike': ('comment_author',),
+}
+
+
+def feed_limit():
+    return getattr(settings, 'FEED_MAX_ENTRIES', 500)
+
+
+def fan_out(activities, using=DEFAULT_DB_ALIAS):
+    """کپی فعالیت‌های نوشته‌شده به صندوق گیرندگان؛ کاربر صندوق فعالیت خودش را نمی‌گیرد"""
+    activities = [activity for activity in activities if activity.pk is not None]
+    if not activities:
+        return
+
+    post_ids = {activity.post_id for activity in activities if activity.post_id}
+    comment_ids = {activity.comment_id for activity in activities if activity.comment_id}
+    post_authors = dict(Post.objects.using(using).filter(pk__in=post_ids).values_list('pk', 'author_id'))
+    comment_authors = {
+        pk: {'comment_author': author_id, 'parent_author': parent_author_id}
+        for pk, author_id, parent_author_id in (
+            Comment.objects.using(using)
+            .filter(pk__in=comment_ids)
+            .values_list('pk', 'author_id', 'parent__author_id')
+        )
+    }
+
+    entries = []
+    for activity in activities:
+        authors = {'post_author': post_authors.get(activity.post_id), **comment_authors.get(activity.comment_id, {})}
+        recipients = {authors.get(role) for role in FEED_RECIPIENTS.get(activity.activity_type, ())}
+        recipients -= {None, activity.user_id}
+        entries.extend(FeedEntry(recipient_id=recipient, activity_id=activity.pk) for recipient in recipients)
+
+    FeedEntry.objects.using(using).bulk_create(entries, batch_size=FEED_BATCH_SIZE)
+
+
+def overfull_recipients(using=DEFAULT_DB_ALIAS, limit=None):
+    """شناسه کاربرانی که صندوقشان بیش از limit ردیف دارد"""
+    limit = feed_limit() if limit is None else limit
+    return list(
+        FeedEntry.objects.using(using)
+        .order_by()
+        .values('recipient_id')
+        .annotate(total=Count('id'))
+        .filter(total__gt=limit)
+        .values_list('recipient_id', flat=True)
+    )
+
+
+def trim_feeds(recipient_ids=None, using=DEFAULT_DB_ALIAS, limit=None):
+    """
+    حذف ردیف‌های قدیمی‌تر از سقف صندوق هر گیرنده
+    بدون recipient_ids همه صندوق‌های بیش از سقف بررسی می‌شوند. خروجی تعداد صندوق‌های کوتاه‌شده است.
+    """
+    limit = feed_limit() if limit is None else limit
+    if recipient_ids is None:
+        recipient_ids = overfull_recipients(using=using, limit=limit)
+    trimmed = 0
+    for recipient_id in recipient_ids:
+        entries = FeedEntry.objects.using(using).filter(recipient_id=recipient_id)
+        # اولین ردیف بیرون از سقف؛ فقط ایندکس خوانده می‌شود
+        boundary = list(entries.order_by('-id').values_list('id', flat=True)[limit:limit + 1])
+        if boundary:
+            # FeedEntry سیگنال و وابسته ندارد؛ delete() یک DELETE مستقیم است
+            entries.filter(id__lte=boundary[0]).delete()
+            trimmed += 1
+    return trimmed
+
+
+def get_feed_paginator(user, per_page=20):
+    queryset = (
+        FeedEntry.objects
+        .filter(recipient=user)
+        .select_related('activity__user', 'activity__post', 'activity__comment')
+    )
+    return KeysetPaginator(queryset, per_page, ordering=['-id'])
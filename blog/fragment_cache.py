@@ -0,0 +1,87 @@
+"""
+کش قطعه‌های قالب با کلیدهای نسخه‌دار
+
+کلید هر قطعه از نام آن و مقادیر vary_on (مانند post.updated_at یا شماره نسل
+نظرات پست) ساخته می‌شود؛ با تغییر نسخه کلید جدید ساخته می‌شود و قطعه قدیمی
+هرگز خوانده نمی‌شود، پس نیازی به حذف صریح از کش نیست.
+
+قطعه در صورت miss داخل primary_reads() رندر می‌شود: داده‌ای که با کلید نسل
+فعلی کش می‌شود نباید از replica عقب‌مانده خوانده شده باشد.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from config.replicas import primary_reads
+
+STATS_KEYS = {'hits': 'fragment_cache:hits', 'misses': 'fragment_cache:misses'}
+
+
+def _generation_key(scope, pk):
+    return f'fragment_cache:gen:{scope}:{pk}'
+
+
+def get_generation(scope, pk):
+    """شماره نسل فعلی یک محدوده (مثلا نظرات یک پست)"""
+    key = _generation_key(scope, pk)
+    generation = cache.get(key)
+    if generation is None:
+        # مقدار اولیه از زمان ساخته می‌شود تا پس از حذف کلید از کش با نسل‌های قبلی برخورد نکند
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(scope, pk):
+    """افزایش نسل پس از commit تراکنش جاری"""
+    transaction.on_commit(lambda: _bump(scope, pk))
+
+
+def _bump(scope, pk):
+    key = _generation_key(scope, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
+
+
+def make_fragment_key(fragment_name, vary_on):
+    digest = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    return f'fragment_cache:{fragment_name}:{digest}'
+
+
+def get_or_render(fragment_name, vary_on, render):
+    """خواندن قطعه از کش یا رندر و ذخیره آن"""
+    key = make_fragment_key(fragment_name, vary_on)
+    content = cache.get(key)
+    if content is not None:
+        _count('hits')
+        return content
+    _count('misses')
+    with primary_reads():
+        content = render()
+    cache.set(key, content, getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+    return content
+
+
+def _count(stat):
+    key = STATS_KEYS[stat]
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def fragment_cache_stats():
+    """تعداد hit و miss کش قطعه‌ها"""
+    values = cache.get_many(STATS_KEYS.values())
+    stats = {stat: values.get(key, 0) for stat, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 4) if total else 0.0
+    return stats
+
+
+def reset_fragment_cache_stats():
+    cache.delete_many(STATS_KEYS.values())
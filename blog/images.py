@@ -0,0 +1,149 @@
+"""
+نسخه‌های کوچک‌شده تصویر پست‌ها (WebP و JPEG progressive، بدون EXIF)
+
+تولید در یک process pool و خارج از چرخه درخواست انجام می‌شود. تابع
+generate_derivatives فقط با مسیر فایل کار می‌کند تا در پردازه‌های فرزند
+نیازی به راه‌اندازی Django نباشد.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+DERIVATIVE_FORMATS = (
+    # (پسوند، نوع MIME)
+    ('webp', 'image/webp'),
+    ('jpg', 'image/jpeg'),
+)
+
+
+def derivative_widths():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (160, 320, 640, 1024, 1600)))
+
+
+def derivative_name(name, width, ext):
+    """مسیر نسبی نسخه کوچک‌شده در MEDIA_ROOT"""
+    stem = os.path.splitext(name)[0]
+    return f'{DERIVATIVE_DIR}/{stem}_{width}w.{ext}'
+
+
+def _ready_key(name):
+    digest = hashlib.md5(f'{name}:{derivative_widths()}'.encode()).hexdigest()
+    return f'image_derivatives:{digest}'
+
+
+def derivatives_ready(name):
+    """
+    آیا همه نسخه‌های یک تصویر ساخته شده‌اند؟ (آخرین فایل نوشته‌شده بررسی می‌شود)
+    نتیجه storage کش می‌شود تا هر رندر یک exists() نداشته باشد: مثبت بدون انقضا و
+    منفی برای IMAGE_DERIVATIVE_MISSING_TIMEOUT ثانیه. پردازه‌ای که نسخه‌ها را
+    می‌سازد با mark_derivatives_ready کش را بلافاصله به‌روز می‌کند.
+    """
+    if not name:
+        return False
+    key = _ready_key(name)
+    ready = cache.get(key)
+    if ready is None:
+        widths = derivative_widths()
+        ready = default_storage.exists(derivative_name(name, widths[-1], DERIVATIVE_FORMATS[-1][0]))
+        cache.set(key, ready, None if ready else getattr(settings, 'IMAGE_DERIVATIVE_MISSING_TIMEOUT', 60))
+    return ready
+
+
+def mark_derivatives_ready(name):
+    cache.set(_ready_key(name), True, None)
+
+
+def generate_derivatives(source_path, targets):
+    """
+    ساخت نسخه‌ها در پردازه فرزند
+    targets لیستی از (عرض، پسوند، مسیر مقصد) است؛ تصویر هرگز بزرگ‌نمایی نمی‌شود
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        icc_profile = original.info.get('icc_profile')
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        resized = {}
+        for width, ext, destination in targets:
+            if width not in resized:
+                target_width = min(width, image.width)
+                height = max(1, round(image.height * target_width / image.width))
+                resized[width] = image.resize((target_width, height), Image.LANCZOS)
+            output = resized[width]
+
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            temporary = f'{destination}.tmp'
+            # EXIF عمدا ذخیره نمی‌شود
+            if ext == 'webp':
+                output.save(temporary, 'WEBP', quality=80, method=4, icc_profile=icc_profile)
+            else:
+                if output.mode != 'RGB':
+                    output = output.convert('RGB')
+                output.save(temporary, 'JPEG', quality=82, optimize=True, progressive=True,
+                            icc_profile=icc_profile)
+            os.replace(temporary, destination)
+    return len(targets)
+
+
+def derivative_targets(name):
+    """لیست مقصدها برای generate_derivatives؛ فقط برای storage مبتنی بر فایل"""
+    targets = []
+    for width in derivative_widths():
+        for ext, _ in DERIVATIVE_FORMATS:
+            targets.append((width, ext, default_storage.path(derivative_name(name, width, ext))))
+    return targets
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=None):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers or getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def schedule_derivatives(name, on_done=None):
+    """ارسال تصویر به process pool؛ درخواست منتظر نتیجه نمی‌ماند"""
+    try:
+        source_path = default_storage.path(name)
+    except NotImplementedError:
+        return None
+    if not os.path.exists(source_path):
+        return None
+    future = get_executor().submit(generate_derivatives, source_path, derivative_targets(name))
+
+    def callback(done_future):
+        # در thread داخلی executor اجرا می‌شود؛ خطا جای دیگری دیده نمی‌شود
+        try:
+            done_future.result()
+        except Exception:
+            logger.exception('generating derivatives for %s failed', name)
+            return
+        mark_derivatives_ready(name)
+        if on_done is not None:
+            try:
+                on_done()
+            except Exception:
+                logger.exception('derivatives callback for %s failed', name)
+
+    future.add_done_callback(callback)
+    return future
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from blog.benchmark import COMMENT_RENDER_SIZES, COMMENT_TREE_SHAPES, run_comment_render
+
+
+class Command(BaseCommand):
+    help = 'اندازه‌گیری زمان رندر درخت نظرات صفحه پست برای اندازه‌ها و شکل‌های مختلف درخت'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, action='append', help='تعداد نظرات (قابل تکرار)')
+        parser.add_argument('--shape', action='append', choices=sorted(COMMENT_TREE_SHAPES), help='شکل درخت (قابل تکرار)')
+        parser.add_argument('--repeat', type=int, default=5, help='تعداد اجرای هر حالت؛ کمترین زمان گزارش می‌شود')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"shape":8}{"comments":>10}{"ms":>10}{"us/comment":>12}{"KB":>10}')
+        run_comment_render(
+            sizes=options['size'] or COMMENT_RENDER_SIZES,
+            shapes=options['shape'] or tuple(COMMENT_TREE_SHAPES),
+            repeat=options['repeat'],
+            log=self.report,
+        )
+
+    def report(self, shape, size, result):
+        self.stdout.write(
+            f"{shape:8}{size:10}{result['ms']:10.2f}{result['us_per_comment']:12.2f}{result['kb']:10.1f}"
+        )
@@ -0,0 +1,123 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from config.sqlite import SQLITE_PRAGMAS
+
+# حالت پیش‌فرض Django قبل از config/sqlite.py در برابر تنظیمات فعلی
+MODES = {
+    'default': {'pragmas': {}, 'begin': 'BEGIN', 'persistent': False},
+    'tuned': {'pragmas': SQLITE_PRAGMAS, 'begin': 'BEGIN IMMEDIATE', 'persistent': True},
+}
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, like_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE TABLE reaction (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL, user_id INTEGER NOT NULL)',
+    'CREATE INDEX reaction_post ON reaction (post_id)',
+)
+
+
+class Command(BaseCommand):
+    help = 'مقایسه توان عملیاتی نوشتن/خواندن هم‌زمان SQLite با تنظیمات پیش‌فرض و تنظیمات config/sqlite.py'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='تعداد thread نویسنده')
+        parser.add_argument('--readers', type=int, default=4, help='تعداد thread خواننده')
+        parser.add_argument('--seconds', type=float, default=5, help='مدت اجرای هر حالت')
+        parser.add_argument('--posts', type=int, default=100, help='تعداد پست‌های جدول آزمایشی')
+
+    def handle(self, *args, **options):
+        for name, mode in MODES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / 'bench.sqlite3'
+                self.prepare(path, mode, options['posts'])
+                result = self.run_mode(path, mode, options)
+            self.stdout.write(self.style.SUCCESS(
+                f"{name:8} writes/s={result['writes'] / options['seconds']:8.1f} "
+                f"reads/s={result['reads'] / options['seconds']:8.1f} "
+                f"locked={result['locked']:5d} "
+                f"write p50={result['p50']:6.2f}ms p95={result['p95']:6.2f}ms"
+            ))
+
+    def connect(self, path, mode):
+        # timeout پیش‌فرض Django برای sqlite3 پنج ثانیه است
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        for pragma, value in mode['pragmas'].items():
+            connection.execute(f'PRAGMA {pragma}={value}')
+        return connection
+
+    def prepare(self, path, mode, posts):
+        connection = self.connect(path, mode)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany('INSERT INTO post (title) VALUES (?)', [(f'post {i}',) for i in range(posts)])
+        connection.close()
+
+    def run_mode(self, path, mode, options):
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        result = {'writes': 0, 'reads': 0, 'locked': 0, 'latencies': []}
+
+        def writer(user_id):
+            connection = self.connect(path, mode) if mode['persistent'] else None
+            writes = locked = 0
+            latencies = []
+            post_id = user_id
+            while time.monotonic() < deadline:
+                post_id = post_id % options['posts'] + 1
+                started = time.perf_counter()
+                db = connection or self.connect(path, mode)
+                try:
+                    # الگوی موتور واکنش: خواندن وضعیت، درج واکنش، افزایش شمارنده
+                    db.execute(mode['begin'])
+                    db.execute('SELECT like_count FROM post WHERE id = ?', (post_id,)).fetchone()
+                    db.execute('INSERT INTO reaction (post_id, user_id) VALUES (?, ?)', (post_id, user_id))
+                    db.execute('UPDATE post SET like_count = like_count + 1 WHERE id = ?', (post_id,))
+                    db.execute('COMMIT')
+                    writes += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+                finally:
+                    if connection is None:
+                        db.close()
+            with lock:
+                result['writes'] += writes
+                result['locked'] += locked
+                result['latencies'].extend(latencies)
+
+        def reader():
+            connection = self.connect(path, mode) if mode['persistent'] else None
+            reads = 0
+            while time.monotonic() < deadline:
+                db = connection or self.connect(path, mode)
+                try:
+                    db.execute(
+                        'SELECT p.id, p.title, p.like_count, COUNT(r.id) FROM post p '
+                        'LEFT JOIN reaction r ON r.post_id = p.id GROUP BY p.id ORDER BY p.id DESC LIMIT 10'
+                    ).fetchall()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    pass
+                finally:
+                    if connection is None:
+                        db.close()
+            with lock:
+                result['reads'] += reads
+
+        threads = [threading.Thread(target=writer, args=(i + 1,)) for i in range(options['writers'])]
+        threads += [threading.Thread(target=reader) for _ in range(options['readers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        latencies = sorted(result['latencies']) or [0]
+        result['p50'] = statistics.median(latencies)
+        result['p95'] = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        return result
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from blog.benchmark import PERCENTILES, ROUTES, SKIPPED, compare, run_benchmark, uncovered_routes
+
+
+class Command(BaseCommand):
+    help = 'اندازه‌گیری زمان پاسخ (p50/p95/p99)، تعداد کوئری و حافظه هر مسیر وبلاگ و مقایسه با اجرای قبلی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='تعداد درخواست اندازه‌گیری‌شده هر مسیر')
+        parser.add_argument('--warmup', type=int, default=5, help='تعداد درخواست گرم‌کردن هر مسیر')
+        parser.add_argument('--route', action='append', choices=sorted(ROUTES), help='فقط این مسیرها (قابل تکرار)')
+        parser.add_argument('--output', help='ذخیره نتیجه در فایل JSON')
+        parser.add_argument('--compare', help='فایل JSON اجرای قبلی برای مقایسه')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = json.loads(Path(options['compare']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f'cannot read baseline: {e}')
+
+        for name in uncovered_routes():
+            self.stdout.write(self.style.WARNING(f'{name}: no benchmark defined'))
+        for name, reason in SKIPPED.items():
+            self.stdout.write(f'{name}: skipped ({reason})')
+
+        columns = ''.join(f'{f"p{percent}":>9}' for percent in PERCENTILES)
+        self.stdout.write(f'{"route":22}{columns}{"queries":>9}{"budget":>8}{"peak KB":>10}  status')
+        result = run_benchmark(
+            names=options['route'], iterations=options['iterations'], warmup=options['warmup'], log=self.report,
+        )
+        if result is None:
+            raise CommandError('no post with comments found; run generate_dataset first')
+        self.stdout.write(f"max RSS {result['meta']['max_rss_kb'] / 1024:.1f} MB")
+
+        if baseline is not None:
+            self.stdout.write('change vs baseline (%):')
+            for name, changes in compare(result, baseline).items():
+                self.stdout.write(f'{name:22}' + ' '.join(
+                    f'{key}={value:+.1f}' for key, value in changes.items() if value is not None
+                ))
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"saved {options['output']}"))
+
+    def report(self, name, result):
+        budget = result['query_budget']
+        line = (
+            f'{name:22}'
+            + ''.join(f"{result[f'p{percent}_ms']:9.2f}" for percent in PERCENTILES)
+            + f"{result['queries_mean']:9.1f}{budget if budget is not None else '-':>8}"
+            + f"{result['peak_kb']:10.1f}  {','.join(map(str, result['status']))}"
+        )
+        over = budget is not None and result['queries_max'] > budget
+        self.stdout.write(self.style.WARNING(line) if over else line)
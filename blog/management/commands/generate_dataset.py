@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.dataset import DATASET_PASSWORD, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'ساخت داده آزمایشی بزرگ (کاربر، پست، درخت نظر، واکنش و فعالیت) برای بنچمارک'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='تعداد کاربران')
+        parser.add_argument('--posts', type=int, default=2000, help='تعداد پست‌ها')
+        parser.add_argument('--comments-per-post', type=float, default=20, help='میانگین نظر هر پست')
+        parser.add_argument('--max-depth', type=int, default=8, help='بیشترین عمق درخت نظرات')
+        parser.add_argument('--likes-per-post', type=float, default=100, help='میانگین واکنش هر پست')
+        parser.add_argument('--likes-per-comment', type=float, default=3, help='میانگین لایک هر نظر')
+        parser.add_argument('--days', type=int, default=365, help='بازه زمانی پخش داده تا امروز')
+        parser.add_argument('--seed', type=int, default=0, help='seed مولد تصادفی')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        totals = generate_dataset(
+            users=options['users'], posts=options['posts'],
+            comments_per_post=options['comments_per_post'], max_depth=options['max_depth'],
+            likes_per_post=options['likes_per_post'], likes_per_comment=options['likes_per_comment'],
+            days=options['days'], seed=options['seed'],
+            log=lambda message: self.stdout.write(message) if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count} {name}' for name, count in totals.items())
+            + f' in {time.monotonic() - started:.1f}s (password: {DATASET_PASSWORD})'
+        ))
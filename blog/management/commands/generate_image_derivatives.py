@@ -0,0 +1,45 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from blog.images import derivative_targets, derivatives_ready, generate_derivatives, mark_derivatives_ready
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'ساخت نسخه‌های کوچک‌شده تصویر پست‌های موجود به صورت موازی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='تعداد پردازه‌ها')
+        parser.add_argument('--force', action='store_true', help='ساخت دوباره نسخه‌های موجود')
+
+    def handle(self, *args, **options):
+        names = (
+            Post.objects
+            .exclude(photo='')
+            .order_by()
+            .values_list('photo', flat=True)
+            .distinct()
+        )
+        pending = [name for name in names.iterator() if options['force'] or not derivatives_ready(name)]
+        self.stdout.write(f'{len(pending)} images to process')
+
+        done = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+        ) as executor:
+            futures = {
+                executor.submit(generate_derivatives, default_storage.path(name), derivative_targets(name)): name
+                for name in pending
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    mark_derivatives_ready(futures[future])
+                    done += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{futures[future]}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(f'{done} images processed, {failed} failed'))
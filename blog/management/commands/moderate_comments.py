@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import CustomUser
+from blog.moderation import ACTIONS, MODERATION_BATCH_SIZE, moderate_comments
+
+
+class Command(BaseCommand):
+    help = 'تایید، مخفی یا حذف دسته‌ای نظرات (همراه با کل پاسخ‌هایشان) بر اساس شناسه، نویسنده یا پست'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=ACTIONS, help='عملیات مدیریتی')
+        parser.add_argument('--id', dest='ids', type=int, action='append', help='شناسه نظر (قابل تکرار)')
+        parser.add_argument('--author', dest='authors', action='append', help='نام کاربری یا شناسه نویسنده (قابل تکرار)')
+        parser.add_argument('--post', dest='posts', type=int, action='append', help='شناسه پست (قابل تکرار)')
+        parser.add_argument('--batch-size', type=int, default=MODERATION_BATCH_SIZE, help='تعداد نظر در هر دسته')
+
+    def handle(self, *args, **options):
+        if not (options['ids'] or options['authors'] or options['posts']):
+            raise CommandError('at least one of --id, --author or --post is required')
+
+        author_ids = None
+        if options['authors']:
+            author_ids = [self.resolve_author(value) for value in options['authors']]
+
+        affected = moderate_comments(
+            options['action'],
+            ids=options['ids'],
+            author_ids=author_ids,
+            post_ids=options['posts'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"{options['action']}: {affected} comments"))
+
+    def resolve_author(self, value):
+        lookup = {'pk': int(value)} if value.isdigit() else {'username': value}
+        try:
+            return CustomUser.objects.values_list('pk', flat=True).get(**lookup)
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'author not found: {value}')
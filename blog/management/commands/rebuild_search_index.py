@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from blog.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره نمایه جستجوی متن کامل پست‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='تعداد پست در هر دسته')
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError('Full-text search index is only available on SQLite.')
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} posts indexed'))
@@ -0,0 +1,42 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from blog.rollups import (
+    ARCHIVE_BATCH_SIZE, archive_activities, open_archive, retention_cutoff, rollup_activities,
+)
+
+
+class Command(BaseCommand):
+    help = 'خلاصه‌سازی روزانه فعالیت‌ها و بایگانی/حذف ردیف‌های خام قدیمی‌تر از بازه نگهداری'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help='تعداد روزهایی که ردیف‌های خام نگه داشته می‌شوند (پیش‌فرض ACTIVITY_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='تعداد ردیف در هر تراکنش حذف')
+        parser.add_argument('--archive-dir', default=None, help='پوشه فایل‌های بایگانی (پیش‌فرض ACTIVITY_ARCHIVE_DIR)')
+        parser.add_argument('--no-archive', action='store_true', help='حذف ردیف‌های قدیمی بدون نوشتن بایگانی')
+        parser.add_argument('--rollup-only', action='store_true', help='فقط خلاصه‌سازی، بدون حذف')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['retention_days'])
+
+        # خلاصه‌سازی همیشه پیش از حذف انجام می‌شود تا هیچ ردیفی بی‌خلاصه حذف نشود
+        days = rollup_activities(cutoff)
+        self.stdout.write(self.style.SUCCESS(f'rolled up {days} days'))
+        if options['rollup_only']:
+            return
+
+        if options['no_archive']:
+            removed = archive_activities(cutoff, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'deleted {removed} activities older than {cutoff:%Y-%m-%d}'))
+            return
+
+        directory = Path(options['archive_dir'] or getattr(settings, 'ACTIVITY_ARCHIVE_DIR', settings.BASE_DIR / 'archive'))
+        with open_archive(directory) as archive:
+            removed = archive_activities(cutoff, archive=archive, batch_size=options['batch_size'])
+            name = archive.name
+        if not removed:
+            Path(name).unlink()
+        self.stdout.write(self.style.SUCCESS(
+            f'archived {removed} activities older than {cutoff:%Y-%m-%d}' + (f' to {name}' if removed else '')
+        ))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from config.sqlite import write_transaction
+from blog.counters import COUNTER_SOURCES, actual_count
+
+
+class Command(BaseCommand):
+    help = 'بررسی شمارنده‌های ذخیره‌شده پست‌ها و نظرات و اصلاح اختلاف‌ها به صورت دسته‌ای'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='تعداد رکورد در هر دسته')
+        parser.add_argument('--dry-run', action='store_true', help='فقط گزارش اختلاف‌ها، بدون اصلاح')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        for model, counters in COUNTER_SOURCES.items():
+            fields = list(counters)
+            annotations = {f'actual_{field}': actual_count(model, field) for field in fields}
+            checked = drifted = 0
+            last_pk = 0
+
+            while True:
+                rows = list(
+                    model.objects
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .annotate(**annotations)
+                    .values('pk', *fields, *annotations)[:batch_size]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1]['pk']
+                checked += len(rows)
+
+                drifted_pks = [
+                    row['pk'] for row in rows
+                    if any(row[field] != row[f'actual_{field}'] for field in fields)
+                ]
+                drifted += len(drifted_pks)
+                if drifted_pks and not dry_run:
+                    # مقدار از خود پایگاه داده محاسبه می‌شود تا با تغییرات هم‌زمان تداخل نکند
+                    with write_transaction():
+                        model.objects.filter(pk__in=drifted_pks).update(
+                            **{field: actual_count(model, field) for field in fields}
+                        )
+
+            verb = 'found' if dry_run else 'repaired'
+            self.stdout.write(
+                self.style.SUCCESS(f'{model.__name__}: {checked} checked, {drifted} {verb}')
+            )
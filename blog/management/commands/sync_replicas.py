@@ -0,0 +1,28 @@
+import sqlite3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'کپی پایگاه داده default روی فایل‌های SQLite جایگزین replica (برای آزمایش محلی)'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replicas only supports SQLite databases')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('no replicas configured (set BLOG_REPLICAS)')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                # backup صفحه‌ها را درون همان فایل می‌نویسد، پس اتصال‌های باز replica هم داده جدید را می‌بینند
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'{alias}: synced'))
+        finally:
+            source.close()
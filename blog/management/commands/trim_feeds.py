@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from blog.feed import feed_limit, trim_feeds
+
+
+class Command(BaseCommand):
+    help = 'کوتاه کردن صندوق فید کاربرانی که بیش از FEED_MAX_ENTRIES ردیف دارند (اجرای دوره‌ای)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='سقف ردیف‌های هر صندوق (پیش‌فرض FEED_MAX_ENTRIES)')
+
+    def handle(self, *args, **options):
+        limit = feed_limit() if options['limit'] is None else options['limit']
+        trimmed = trim_feeds(limit=limit)
+        self.stdout.write(self.style.SUCCESS(f'trimmed {trimmed} feeds to {limit} entries'))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+COMMENT_PATH_STEP = 10
+
+
+def populate_comment_paths(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    nodes = {}
+    pending = list(Comment.objects.order_by('pk').values_list('pk', 'parent_id'))
+    while pending:
+        remaining = []
+        for pk, parent_id in pending:
+            if parent_id is None:
+                nodes[pk] = (f'{pk:0{COMMENT_PATH_STEP}d}', 0)
+            elif parent_id in nodes:
+                parent_path, parent_depth = nodes[parent_id]
+                nodes[pk] = (f'{parent_path}{pk:0{COMMENT_PATH_STEP}d}', parent_depth + 1)
+            else:
+                remaining.append((pk, parent_id))
+        if len(remaining) == len(pending):
+            break
+        pending = remaining
+
+    comments = [Comment(pk=pk, path=path, depth=depth) for pk, (path, depth) in nodes.items()]
+    Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(populate_comment_paths, migrations.RunPython.noop),
+    ]
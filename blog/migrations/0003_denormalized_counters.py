@@ -0,0 +1,78 @@
+# Generated by Django 5.1 on 2026-10-18 08:22
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count(model, fk, **filters):
+    counts = (
+        model.objects
+        .filter(**{fk: OuterRef('pk')}, **filters)
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    PostLike = apps.get_model('blog', 'PostLike')
+    PostDislike = apps.get_model('blog', 'PostDislike')
+    CommentLike = apps.get_model('blog', 'CommentLike')
+    CommentDislike = apps.get_model('blog', 'CommentDislike')
+
+    Post.objects.update(
+        like_count=_count(PostLike, 'post'),
+        dislike_count=_count(PostDislike, 'post'),
+        comment_count=_count(Comment, 'post', is_active=True),
+    )
+    Comment.objects.update(
+        like_count=_count(CommentLike, 'comment'),
+        dislike_count=_count(CommentDislike, 'comment'),
+        reply_count=_count(Comment, 'parent', is_active=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_comment_path_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
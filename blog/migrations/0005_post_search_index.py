@@ -0,0 +1,54 @@
+# Generated by Django 5.1 on 2026-10-18 09:10
+
+import re
+from django.db import migrations
+
+FTS_TABLE = 'blog_post_fts'
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '\u200c': '',
+    '\u0640': '',
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+_ARABIC_DIACRITICS = re.compile('[\u064B-\u065F\u0670]')
+
+
+def _normalize(text):
+    return _ARABIC_DIACRITICS.sub('', (text or '').translate(_CHAR_MAP))
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('blog', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            f'USING fts5(title, body, author, tokenize = "unicode61 remove_diacritics 2")'
+        )
+        rows = Post.objects.values_list('pk', 'title', 'body', 'author__username').iterator()
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, body, author) VALUES (%s, %s, %s, %s)',
+            [(pk, _normalize(title), _normalize(body), _normalize(author)) for pk, title, body, author in rows],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_feedentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('post_like', 'لایک پست'), ('post_dislike', 'دیسلایک پست'), ('comment_like', 'لایک کامنت'), ('comment_dislike', 'دیسلایک کامنت'), ('comment', 'نظر جدید'), ('reply', 'پاسخ جدید')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('post_like', 'لایک پست'), ('post_dislike', 'دیسلایک پست'), ('comment_like', 'لایک کامنت'), ('comment_dislike', 'دیسلایک کامنت'), ('comment', 'نظر جدید'), ('reply', 'پاسخ جدید')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['created_at'], name='blog_activity_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='postactivitydaily',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='blog.post'),
+        ),
+        migrations.AddField(
+            model_name='useractivitydaily',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='postactivitydaily',
+            constraint=models.UniqueConstraint(fields=('post', 'day', 'activity_type'), name='blog_post_activity_daily_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='useractivitydaily',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'activity_type'), name='blog_user_activity_daily_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:11
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def populate_last_activity(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    latest = {}
+    for model_name in ('Comment', 'PostLike', 'PostDislike'):
+        rows = apps.get_model('blog', model_name).objects.order_by().values('post').annotate(last=Max('created_at'))
+        for row in rows:
+            if row['post'] not in latest or row['last'] > latest[row['post']]:
+                latest[row['post']] = row['last']
+    posts = [Post(pk=pk, last_activity_at=last) for pk, last in latest.items()]
+    Post.objects.bulk_update(posts, ['last_activity_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_last_activity, migrations.RunPython.noop),
+    ]
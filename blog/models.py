@@ -3,6 +3,24 @@ from datetime import date
 from django.urls import reverse
 from accounts.models import CustomUser
 
+# طول ثابت هر گام در مسیر درختی نظرات (شناسه با صفر پر می‌شود)
+COMMENT_PATH_STEP = 10
+
+
+def comment_path(parent_path, pk):
+    """مسیر درختی نظر: مسیر والد به‌علاوه شناسه پرشده با صفر"""
+    return f'{parent_path}{pk:0{COMMENT_PATH_STEP}d}'
+
+
+def subtree_lookups(path, include_self=True):
+    """
+    شرط بازه‌ای path برای زیرشاخه یک نظر
+    برخلاف path__startswith (LIKE ... ESCAPE) از ایندکس path استفاده می‌کند؛
+    ':' در ترتیب کاراکترها بلافاصله بعد از ارقام است.
+    """
+    return {'path__gte' if include_self else 'path__gt': path, 'path__lt': path + ':'}
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     excerpt = models.TextField()
@@ -16,9 +34,19 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     likes = models.ManyToManyField(CustomUser, related_name='post_likes', blank=True, through='PostLike')
     dislikes = models.ManyToManyField(CustomUser, related_name='post_dislikes', blank=True, through='PostDislike')
+    # شمارنده‌های ذخیره‌شده؛ توسط سیگنال‌ها با F() به‌روز می‌شوند
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    dislike_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # زمان آخرین تغییر نظرات یا واکنش‌ها؛ همراه شمارنده‌ها به‌روز می‌شود (Last-Modified)
+    last_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
-        ordering = ['-date', '-created_at']
+        # id به عنوان ستون تعیین‌کننده برای صفحه‌بندی keyset
+        ordering = ['-date', '-created_at', 'id']
+        indexes = [
+            models.Index(fields=['-date', '-created_at', 'id'], name='blog_post_keyset_idx'),
+        ]
         
     def __str__(self):
         return self.title
@@ -28,17 +56,17 @@ class Post(models.Model):
     
     @property
     def comments_count(self):
-        return self.comments.filter(is_active=True).count()
+        return self.comment_count
     
     def get_likes_count(self):
-        return self.likes.count()
+        return self.like_count
     
     def get_dislikes_count(self):
-        return self.dislikes.count()
+        return self.dislike_count
     
     def get_total_comments(self):
         """تعداد کل نظرات (شامل پاسخ‌ها)"""
-        return self.comments.filter(is_active=True).count()
+        return self.comment_count
     
     def user_liked(self, user):
         """آیا کاربر این پست را لایک کرده است؟"""
@@ -80,8 +108,14 @@ class Comment(models.Model):
     # updated_at = models.DateTimeField(auto_now=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     is_active = models.BooleanField(default=True)
+    path = models.CharField(max_length=1000, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     likes = models.ManyToManyField(CustomUser, related_name='comment_likes', blank=True, through='CommentLike')
     dislikes = models.ManyToManyField(CustomUser, related_name='comment_dislikes', blank=True, through='CommentDislike')
+    # شمارنده‌های ذخیره‌شده؛ توسط سیگنال‌ها با F() به‌روز می‌شوند
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    dislike_count = models.PositiveIntegerField(default=0, editable=False)
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['created_at']
@@ -89,6 +123,23 @@ class Comment(models.Model):
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت فعال بودن هنگام بارگذاری، برای تشخیص تغییر آن در سیگنال‌ها
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
+
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if is_new:
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+        super().save(*args, **kwargs)
+        if is_new and not self.path:
+            # مسیر به شناسه وابسته است، پس بعد از درج ساخته می‌شود
+            self.path = comment_path(self.parent.path if self.parent_id else '', self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
     def get_absolute_url(self):
         return reverse('post_detail', kwargs={'pk': self.post.pk}) + f'#comment-{self.id}'
 
@@ -102,15 +153,15 @@ class Comment(models.Model):
     
     def get_replies_count(self):
         """تعداد پاسخ‌ها"""
-        return self.replies.filter(is_active=True).count()
+        return self.reply_count
     
     def get_likes_count(self):
         """تعداد لایک‌ها"""
-        return self.likes.count()
+        return self.like_count
     
     def get_dislikes_count(self):
         """تعداد دیسلایک‌ها"""
-        return self.dislikes.count()
+        return self.dislike_count
     
     def user_liked(self, user):
         """آیا کاربر این کامنت را لایک کرده است؟"""
@@ -122,12 +173,7 @@ class Comment(models.Model):
     
     def get_comment_level(self):
         """سطح تو در تویی کامنت (0 = کامنت اصلی)"""
-        level = 0
-        current = self
-        while current.parent:
-            level += 1
-            current = current.parent
-        return level
+        return self.depth
     
 class CommentLike(models.Model):
     """مدل واسط برای لایک کامنت"""
@@ -172,6 +218,116 @@ class Activity(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # خلاصه‌سازی روزانه و بایگانی بر اساس بازه زمانی
+            models.Index(fields=['created_at'], name='blog_activity_created_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} - {self.get_activity_type_display()}"
\ No newline at end of file
+        return f"{self.user.username} - {self.get_activity_type_display()}"
+
+
+class FeedEntry(models.Model):
+    """
+    ردیف صندوق فعالیت یک کاربر؛ هر فعالیت هنگام ثبت به صندوق گیرندگانش
+    (نویسنده پست یا نظر مربوط) کپی می‌شود تا خواندن فید یک اسکن ایندکس باشد
+    """
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='feed_entries', db_index=False)
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='feed_entries')
+    
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['recipient', '-id'], name='blog_feed_recipient_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipient_id} <- {self.activity_id}"
+
+
+class PostActivityDaily(models.Model):
+    """تعداد روزانه فعالیت‌های هر نوع روی یک پست (خلاصه Activity برای آمار)"""
+    day = models.DateField()
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_activity')
+    activity_type = models.CharField(max_length=20, choices=Activity.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day', 'activity_type'], name='blog_post_activity_daily_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.post_id} {self.activity_type}: {self.count}"
+
+
+class UserActivityDaily(models.Model):
+    """تعداد روزانه فعالیت‌های هر نوع یک کاربر (خلاصه Activity برای آمار)"""
+    day = models.DateField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_activity')
+    activity_type = models.CharField(max_length=20, choices=Activity.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'activity_type'], name='blog_user_activity_daily_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.user_id} {self.activity_type}: {self.count}"
+
+
+def get_comment_tree(post, max_depth=None):
+    """
+    دریافت کل درخت نظرات فعال یک پست با یک کوئری
+    خروجی لیست نظرات اصلی است و پاسخ‌های هر نظر در children قرار می‌گیرد
+    با max_depth نظرات عمیق‌تر خوانده نمی‌شوند و بعدا از API پاسخ‌ها بارگذاری می‌شوند
+    """
+    comments = (
+        Comment.objects
+        .filter(post=post, is_active=True)
+        .select_related('author')
+        .order_by('path')
+    )
+    if max_depth is not None:
+        comments = comments.filter(depth__lte=max_depth)
+    roots = []
+    nodes = {}
+    # مرتب‌سازی بر اساس path تضمین می‌کند والد قبل از فرزندانش بیاید
+    for comment in comments:
+        comment.children = []
+        comment.post = post
+        if comment.parent_id is None:
+            roots.append(comment)
+        else:
+            parent = nodes.get(comment.parent_id)
+            if parent is None:
+                # والد غیرفعال است؛ کل زیرشاخه نمایش داده نمی‌شود
+                continue
+            comment.parent = parent
+            parent.children.append(comment)
+        nodes[comment.pk] = comment
+    return roots
+
+
+def flatten_comment_tree(roots):
+    """
+    تبدیل درخت get_comment_tree به لیست تخت به ترتیب نمایش (پیمایش عمقی بدون بازگشت)
+    هر نظر tree_level (عمق در همین درخت) و closing_levels می‌گیرد: بعد از نظری که
+    فرزند بارگذاری‌شده ندارد، تعداد اجدادی که فهرست پاسخ‌هایشان همان‌جا بسته می‌شود.
+    قالب با یک حلقه و بدون include بازگشتی رندر می‌شود و عمق گفتگو محدودیتی ندارد.
+    """
+    flat = []
+    stack = [(comment, 0) for comment in reversed(roots)]
+    while stack:
+        comment, level = stack.pop()
+        comment.tree_level = level
+        flat.append(comment)
+        stack.extend((child, level + 1) for child in reversed(comment.children))
+    for comment, following in zip(flat, flat[1:] + [None]):
+        # نظری که فرزند دارد منفی می‌شود (نظر بعدی فرزند خودش است) و چیزی بسته نمی‌شود
+        closing = comment.tree_level - (following.tree_level if following is not None else 0)
+        comment.closing_levels = range(max(closing, 0))
+    return flat
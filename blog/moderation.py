@@ -0,0 +1,123 @@
+"""
+مدیریت دسته‌ای نظرات (تایید، مخفی کردن، حذف)
+
+نظرات هدف بر اساس شناسه، نویسنده یا پست انتخاب می‌شوند و هر عملیات کل
+زیرشاخه پاسخ‌های آن‌ها را (با بازه path) در بر می‌گیرد. تغییرات در دسته‌های
+محدود و هر دسته در یک تراکنش انجام می‌شود. تایید و مخفی کردن UPDATE مجموعه‌ای
+است و سیگنال ندارد، پس شمارنده‌ها و نسل کش در همین‌جا از نو محاسبه می‌شوند؛
+حذف با delete() انجام می‌شود و وابسته‌ها (واکنش‌ها، فعالیت‌ها و فید) و
+شمارنده‌ها مانند هر حذف دیگری توسط collector و سیگنال‌ها به‌روز می‌شوند.
+پس از commit هر دسته یک رویداد comments.moderated برای صفحه هر پست درگیر
+منتشر می‌شود (blog/events.py).
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Q
+from config.sqlite import write_transaction
+from . import events
+from .counters import activity_timestamp, actual_count
+from .fragment_cache import bump_generation
+from .models import *
+
+APPROVE = 'approve'
+HIDE = 'hide'
+DELETE = 'delete'
+ACTIONS = (APPROVE, HIDE, DELETE)
+
+MODERATION_BATCH_SIZE = 500
+# تعداد ریشه‌هایی که شرط بازه path آن‌ها در یک کوئری OR می‌شود
+ROOTS_PER_QUERY = 200
+
+
+def moderate_comments(action, ids=None, author_ids=None, post_ids=None, batch_size=MODERATION_BATCH_SIZE):
+    """
+    اعمال یک عملیات مدیریتی روی نظرات انتخاب‌شده و همه پاسخ‌هایشان
+    فیلترها (شناسه نظر، نویسنده، پست) با هم AND می‌شوند؛ خروجی تعداد نظرات تغییر یافته است.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'invalid moderation action: {action}')
+    if ids is None and author_ids is None and post_ids is None:
+        raise ValueError('at least one of ids, author_ids or post_ids is required')
+
+    targets = Comment.objects.all()
+    if ids is not None:
+        targets = targets.filter(pk__in=list(ids))
+    if author_ids is not None:
+        targets = targets.filter(author_id__in=list(author_ids))
+    if post_ids is not None:
+        targets = targets.filter(post_id__in=list(post_ids))
+
+    roots = subtree_roots(targets.order_by('path').values_list('path', flat=True).iterator())
+    affected = 0
+    for start in range(0, len(roots), ROOTS_PER_QUERY):
+        prefixes = roots[start:start + ROOTS_PER_QUERY]
+        scope = Comment.objects.filter(reduce(or_, (Q(**subtree_lookups(prefix)) for prefix in prefixes)))
+        affected += _apply_in_batches(action, scope, batch_size)
+    return affected
+
+
+def subtree_roots(paths):
+    """حذف مسیرهایی که زیرشاخه مسیر دیگری در همین مجموعه‌اند (ورودی مرتب بر اساس path)"""
+    roots = []
+    for path in paths:
+        if roots and path.startswith(roots[-1]):
+            continue
+        roots.append(path)
+    return roots
+
+
+def _apply_in_batches(action, scope, batch_size):
+    if action == APPROVE:
+        scope = scope.filter(is_active=False)
+    elif action == HIDE:
+        scope = scope.filter(is_active=True)
+
+    affected = 0
+    while True:
+        with write_transaction():
+            # ترتیب نزولی path فرزندان را پیش از والدها می‌آورد تا حذف یک دسته
+            # هرگز نظری بدون والد باقی نگذارد
+            rows = list(scope.order_by('-path').values_list('pk', 'post_id', 'parent_id')[:batch_size])
+            if not rows:
+                break
+            pks = [pk for pk, _, _ in rows]
+            if action == DELETE:
+                Comment.objects.filter(pk__in=pks).delete()
+            else:
+                Comment.objects.filter(pk__in=pks).update(is_active=action == APPROVE)
+                _repair_counters(
+                    post_ids={post_id for _, post_id, _ in rows},
+                    parent_ids={parent_id for _, _, parent_id in rows if parent_id is not None},
+                )
+            _publish(action, rows)
+        affected += len(rows)
+        if len(rows) < batch_size:
+            # دسته ناقص یعنی چیزی باقی نمانده است
+            break
+    return affected
+
+
+def _repair_counters(post_ids, parent_ids):
+    """محاسبه دوباره شمارنده‌های نظر از خود پایگاه داده برای ردیف‌های درگیر"""
+    Post.objects.filter(pk__in=post_ids).update(
+        comment_count=actual_count(Post, 'comment_count'), **activity_timestamp(Post),
+    )
+    if parent_ids:
+        Comment.objects.filter(pk__in=parent_ids).update(reply_count=actual_count(Comment, 'reply_count'))
+    for post_id in post_ids:
+        bump_generation('comments', post_id)
+
+
+def _publish(action, rows):
+    """یک رویداد برای نظرات هر پست در این دسته، پس از commit"""
+    ids_by_post = defaultdict(list)
+    for pk, post_id, _ in rows:
+        ids_by_post[post_id].append(pk)
+
+    def send():
+        for post_id, ids in ids_by_post.items():
+            events.publish(post_id, 'comments.moderated', {'action': action, 'ids': ids})
+
+    transaction.on_commit(send)
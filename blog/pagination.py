@@ -0,0 +1,212 @@
+"""
+صفحه‌بندی keyset (cursor)
+
+به جای OFFSET و COUNT(*)، هر صفحه با شرط «بعد از آخرین ردیف صفحه قبل» روی
+ستون‌های مرتب‌سازی خوانده می‌شود؛ هزینه هر صفحه مستقل از عمق آن است.
+cursor یک رشته مبهم (base64) شامل مقادیر ستون‌های مرتب‌سازی، جهت و شماره صفحه است.
+"""
+import base64
+import binascii
+import datetime
+import json
+import math
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder میکروثانیه را حذف می‌کند که برای مقایسه keyset دقیق نیست
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, cls=CursorEncoder, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(data)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, ordering=None, count_ttl=None, count_cache_key=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        ordering = ordering or queryset.query.order_by or queryset.model._meta.ordering
+        self.ordering = list(ordering)
+        # (نام فیلد، نزولی؟)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+        # تعداد تقریبی فقط در صورت تعیین TTL محاسبه و کش می‌شود
+        self.count_ttl = count_ttl
+        self.count_cache_key = count_cache_key or f'keyset_count:{queryset.model._meta.label_lower}'
+
+    @property
+    def count(self):
+        """تعداد تقریبی ردیف‌ها (کش‌شده با TTL) یا None"""
+        if self.count_ttl is None:
+            return None
+        return cache.get_or_set(self.count_cache_key, self.queryset.count, self.count_ttl)
+
+    @property
+    def num_pages(self):
+        count = self.count
+        if count is None:
+            return None
+        return max(1, math.ceil(count / self.per_page))
+
+    def get_page(self, cursor=None):
+        """دریافت صفحه؛ cursor نامعتبر مانند Paginator.get_page صفحه اول را برمی‌گرداند"""
+        if cursor:
+            try:
+                return self.page(cursor)
+            except InvalidCursor:
+                pass
+        return self._first_page()
+
+    def page(self, cursor):
+        payload = decode_cursor(cursor)
+        if not (
+            isinstance(payload, dict)
+            and isinstance(payload.get('v'), list)
+            and payload.get('d') in ('next', 'prev')
+            and type(payload.get('n')) is int and payload['n'] >= 1
+        ):
+            raise InvalidCursor(cursor)
+        values = self._to_python(payload['v'])
+        number = payload['n']
+        if payload['d'] == 'next':
+            rows = list(self._after(values, forward=True)[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], number, self,
+                              has_next=len(rows) > self.per_page, has_previous=True)
+        rows = list(self._after(values, forward=False)[:self.per_page + 1])
+        rows.reverse()
+        return KeysetPage(rows[-self.per_page:], number, self,
+                          has_next=True, has_previous=len(rows) > self.per_page)
+
+    def _first_page(self):
+        rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page], 1, self,
+                          has_next=len(rows) > self.per_page, has_previous=False)
+
+    def _after(self, values, forward):
+        """ردیف‌های بعد (یا قبل) از مقادیر داده‌شده به ترتیب پیمایش"""
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            # ستون‌های قبلی برابر و ستون فعلی بعد از مقدار cursor
+            step = Q(**{prev: value for (prev, _), value in zip(self.fields[:i], values)})
+            condition |= step & Q(**{f'{name}__{lookup}': values[i]})
+        ordering = self.ordering if forward else [self._reverse(name) for name in self.ordering]
+        return self.queryset.filter(condition).order_by(*ordering)
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _to_python(self, raw_values):
+        opts = self.queryset.model._meta
+        if len(raw_values) != len(self.fields):
+            raise InvalidCursor(raw_values)
+        try:
+            values = [
+                opts.pk.to_python(value) if name == 'pk' else opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, raw_values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor(raw_values)
+        # None در شرط keyset معنایی ندارد (ستون‌های مرتب‌سازی null نیستند)
+        if any(value is None for value in values):
+            raise InvalidCursor(raw_values)
+        return values
+
+    def cursor_for(self, obj, direction, number):
+        values = [getattr(obj, name) for name, _ in self.fields]
+        return encode_cursor({'v': values, 'd': direction, 'n': number})
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, number, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._has_next = has_next and bool(object_list)
+        self._has_previous = has_previous and number > 1
+
+    def __repr__(self):
+        return f'<Keyset page {self.number}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'next', self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], 'prev', self.number - 1)
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator بدون COUNT(*) کامل، برای جدول‌های بسیار بزرگ در ادمین
+
+    ردیف‌ها فقط تا سقف count_limit شمرده می‌شوند. بیش از آن، بدون فیلتر از
+    بزرگترین شناسه (یک جستجوی ایندکس) تخمین زده می‌شود و با فیلتر همان سقف
+    گزارش می‌شود.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        # COUNT روی یک زیرکوئری LIMIT‌دار؛ هزینه آن به سقف محدود است
+        counted = queryset.order_by()[:self.count_limit + 1].count()
+        if counted <= self.count_limit:
+            return counted
+        if not queryset.query.where:
+            largest_pk = queryset.model._default_manager.aggregate(largest=Max('pk'))['largest']
+            return max(largest_pk or 0, counted)
+        return self.count_limit
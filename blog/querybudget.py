@@ -0,0 +1,166 @@
+"""
+شمارش کوئری‌های SQL هر درخواست و بودجه کوئری برای هر نام URL
+
+یک execute_wrapper روی هر اتصال پایگاه داده نصب می‌شود و کوئری‌ها را در
+جمع‌کننده درخواست جاری (contextvar) ثبت می‌کند؛ بنابراین کوئری‌های ویوهای
+async که در thread دیگری اجرا می‌شوند هم شمرده می‌شوند. بیرون از درخواست
+هزینه آن فقط خواندن یک contextvar است.
+
+QueryBudgetMiddleware تعداد، زمان کل و کوئری‌های تکراری (بر اساس اثر انگشت
+SQL) را در DEBUG به صورت هدر پاسخ برمی‌گرداند و اگر بودجه QUERY_BUDGETS برای
+نام URL رد شود هشدار ثبت می‌کند. در تست‌ها assert_query_budget همین بودجه‌ها
+را اجباری می‌کند.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# جمع‌کننده‌های فعال؛ بلوک‌های تو در تو (تست دور درخواست) هر دو شمارش می‌کنند
+_collectors = ContextVar('query_collectors', default=())
+
+# دستورهای کنترل تراکنش در فهرست کوئری‌ها می‌آیند ولی شمرده نمی‌شوند: COMMIT از
+# execute_wrapper عبور نمی‌کند و در تست‌ها SAVEPOINT/RELEASE جای BEGIN/COMMIT را
+# می‌گیرند، پس شمردن آن‌ها تعداد تست و production را متفاوت می‌کرد
+_TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE')
+
+# فهرست پارامترهای IN با طول‌های متفاوت یک اثر انگشت دارند
+_IN_LIST = re.compile(r'\((?:%s|\?)(?:\s*,\s*(?:%s|\?))*\)')
+
+
+def fingerprint(sql):
+    normalized = _IN_LIST.sub('(...)', sql)
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = []
+        self.fingerprints = Counter()
+        self.duration = 0.0
+        self.count = 0
+
+    def record(self, sql, duration):
+        self.queries.append(sql)
+        if not sql.lstrip().upper().startswith(_TRANSACTION_CONTROL):
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+        self.duration += duration
+
+    def duplicates(self):
+        """اثر انگشت‌هایی که بیش از یک بار اجرا شده‌اند، پرتکرارترین اول"""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count > 1]
+
+    def duplicate_count(self):
+        return sum(count - 1 for _, count in self.duplicates())
+
+
+def _record(execute, sql, params, many, context):
+    collectors = _collectors.get()
+    if not collectors:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for stats in collectors:
+            stats.record(sql, duration)
+
+
+def _install(sender, connection, **kwargs):
+    # با هر اتصال دوباره هم فراخوانی می‌شود؛ فقط یک بار نصب شود
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+connection_created.connect(_install, dispatch_uid='blog.querybudget')
+
+
+@contextmanager
+def collect_queries():
+    """جمع‌آوری کوئری‌های همه اتصال‌ها در این بلوک (از جمله threadهای sync_to_async)"""
+    from django.db import connections
+    # اتصال‌هایی که پیش از بارگذاری این ماژول باز شده‌اند
+    for connection in connections.all(initialized_only=True):
+        _install(None, connection)
+    stats = QueryStats()
+    token = _collectors.set((*_collectors.get(), stats))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+def get_budget(url_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(url_name)
+
+
+@sync_and_async_middleware
+def QueryBudgetMiddleware(get_response):
+    def finish(request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        budget = get_budget(url_name)
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                'query budget exceeded for %s: %d queries (budget %d), duplicates %s',
+                url_name, stats.count, budget, stats.duplicates()[:5],
+            )
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time-Ms'] = f'{stats.duration * 1000:.1f}'
+            response['X-Query-Duplicates'] = str(stats.duplicate_count())
+            if stats.duplicates():
+                response['X-Query-Duplicate-Fingerprints'] = ','.join(
+                    f'{key}x{count}' for key, count in stats.duplicates()[:5]
+                )
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with collect_queries() as stats:
+                response = await get_response(request)
+            return finish(request, response, stats)
+    else:
+        def middleware(request):
+            with collect_queries() as stats:
+                response = get_response(request)
+            return finish(request, response, stats)
+    return middleware
+
+
+def assert_query_budget(client, url_name, *args, method='get', data=None, budget=None, **kwargs):
+    """
+    درخواست به URL با نام url_name و شکست (AssertionError) در صورت عبور از بودجه
+    بودجه از QUERY_BUDGETS خوانده می‌شود مگر صریحا داده شود. خروجی پاسخ است.
+
+        assert_query_budget(self.client, 'post_detail', post.pk)
+        assert_query_budget(self.client, 'get_replies', comment.pk, data={'depth': 3})
+    """
+    from django.urls import reverse
+    budget = get_budget(url_name) if budget is None else budget
+    if budget is None:
+        raise AssertionError(f'no query budget declared for {url_name!r} in QUERY_BUDGETS')
+
+    with collect_queries() as stats:
+        response = getattr(client, method)(reverse(url_name, args=args, kwargs=kwargs), data)
+    if stats.count > budget:
+        duplicates = ', '.join(f'{key}x{count}' for key, count in stats.duplicates()) or 'none'
+        queries = '\n'.join(f'  {i}. {sql}' for i, sql in enumerate(stats.queries, 1))
+        raise AssertionError(
+            f'{url_name}: {stats.count} queries exceed budget of {budget} '
+            f'(duplicate fingerprints: {duplicates})\n{queries}'
+        )
+    return response
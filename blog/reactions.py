@@ -0,0 +1,109 @@
+"""
+موتور واکنش (لایک/دیسلایک) برای پست‌ها و نظرات
+
+هر تغییر در یک تراکنش با چند دستور ثابت انجام می‌شود و وضعیت قبلی کاربر جداگانه
+خوانده نمی‌شود:
+- واکنش مخالف حذف می‌شود (تعداد ردیف حذف‌شده یعنی واکنش قبلی همان بوده است)
+- واکنش جدید با INSERT ... ON CONFLICT DO NOTHING درج می‌شود؛ اگر ردیف از قبل
+  بوده (کلیک دوباره یا دو کلیک هم‌زمان) همان واکنش حذف می‌شود (toggle)
+- شمارنده‌های هدف با یک UPDATE ... RETURNING تغییر می‌کنند و خوانده می‌شوند
+
+محدودیت یکتای (هدف، کاربر) جای قفل را می‌گیرد، پس کلیک‌های هم‌زمان IntegrityError
+نمی‌دهند. دستورها مستقیم روی جدول‌های واسط اجرا می‌شوند و سیگنال‌های مدل ارسال
+نمی‌شوند؛ شمارنده‌ها و فعالیت همین‌جا به‌روز و ثبت می‌شوند.
+"""
+from django.db import connection
+from django.utils import timezone
+from config.sqlite import write_transaction
+from .activity import record_activity
+from .counters import ACTIVITY_TIMESTAMPS
+from .models import *
+
+LIKE = 'like'
+DISLIKE = 'dislike'
+CLEAR = 'clear'
+ACTIONS = (LIKE, DISLIKE, CLEAR)
+
+# مدل هدف -> (نام فیلد در مدل واسط، مدل لایک، مدل دیسلایک)
+REACTION_MODELS = {
+    Post: ('post', PostLike, PostDislike),
+    Comment: ('comment', CommentLike, CommentDislike),
+}
+
+# واکنش -> شمارنده آن در مدل هدف
+REACTION_COUNTERS = {
+    LIKE: 'like_count',
+    DISLIKE: 'dislike_count',
+}
+
+
+def set_reaction(target, user, action):
+    """
+    اعمال واکنش کاربر روی پست یا نظر
+    تکرار همان واکنش آن را پاک می‌کند (toggle). خروجی شمارنده‌های جدید و وضعیت کاربر است.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'invalid reaction: {action}')
+    model = type(target)
+    field, like_model, dislike_model = REACTION_MODELS[model]
+    models = {LIKE: like_model, DISLIKE: dislike_model}
+    column = models[LIKE]._meta.get_field(field).column
+
+    with write_transaction(), connection.cursor() as cursor:
+        def delete(reaction):
+            cursor.execute(
+                f'DELETE FROM {models[reaction]._meta.db_table} WHERE {column} = %s AND user_id = %s',
+                [target.pk, user.pk],
+            )
+            return cursor.rowcount
+
+        deltas = {}
+        for reaction in models:
+            if reaction != action:
+                deltas[reaction] = -delete(reaction)
+
+        current = None
+        if action != CLEAR:
+            cursor.execute(
+                f'INSERT INTO {models[action]._meta.db_table} ({column}, user_id, created_at) '
+                f'VALUES (%s, %s, %s) ON CONFLICT ({column}, user_id) DO NOTHING',
+                [target.pk, user.pk, connection.ops.adapt_datetimefield_value(timezone.now())],
+            )
+            if cursor.rowcount:
+                current = action
+                deltas[action] = 1
+            else:
+                deltas[action] = -delete(action)
+
+        counts = _update_counters(cursor, target, deltas)
+        if current is not None:
+            # در بافر همین تراکنش؛ پس از commit نوشته می‌شود
+            record_activity(
+                user_id=user.pk,
+                activity_type=f'{field}_{current}',
+                post_id=target.pk if model is Post else target.post_id,
+                comment_id=target.pk if model is Comment else None,
+            )
+
+    return {
+        'likes_count': counts[0],
+        'dislikes_count': counts[1],
+        'user_action': current,
+    }
+
+
+def _update_counters(cursor, target, deltas):
+    """تغییر شمارنده‌های هدف و خواندن مقدار جدید (like_count, dislike_count) با یک دستور"""
+    model = type(target)
+    assignments = [f'{REACTION_COUNTERS[reaction]} = MAX({REACTION_COUNTERS[reaction]} + %s, 0)' for reaction in deltas]
+    params = list(deltas.values())
+    timestamp = ACTIVITY_TIMESTAMPS.get(model)
+    if timestamp and any(deltas.values()):
+        assignments.append(f'{timestamp} = %s')
+        params.append(connection.ops.adapt_datetimefield_value(timezone.now()))
+    cursor.execute(
+        f'UPDATE {model._meta.db_table} SET {", ".join(assignments)} WHERE id = %s '
+        f'RETURNING like_count, dislike_count',
+        [*params, target.pk],
+    )
+    return cursor.fetchone()
@@ -0,0 +1,165 @@
+"""
+خلاصه‌سازی روزانه، نگهداری و بایگانی فعالیت‌ها
+
+فعالیت‌های خام هر روز بسته‌شده به تعداد روزانه برای هر پست و هر کاربر
+(به تفکیک نوع) تبدیل می‌شوند و آمار (activity_totals و ستون‌های admin) از این
+جدول‌ها خوانده می‌شود، نه از Activity. ردیف‌های خام قدیمی‌تر از بازه نگهداری
+در دسته‌های کوچک به فایل JSONL فشرده (gzip) نوشته و حذف می‌شوند تا جدول
+Activity کوچک بماند.
+
+روزهای داخل بازه نگهداری هر بار از نو محاسبه می‌شوند (خام آن‌ها کامل است)؛
+روزهای قدیمی‌تر فقط اگر هنوز خلاصه‌ای ندارند، چون ممکن است بخشی از آن‌ها
+بایگانی شده باشد.
+"""
+import datetime
+import gzip
+import json
+from django.conf import settings
+from django.db.models import Count, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from config.sqlite import write_transaction
+from .models import *
+from .pagination import CursorEncoder
+
+ROLLUP_BATCH_SIZE = 1000
+ARCHIVE_BATCH_SIZE = 1000
+
+# مدل خلاصه -> فیلد بُعد
+ROLLUP_MODELS = {
+    PostActivityDaily: 'post',
+    UserActivityDaily: 'user',
+}
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'activity_type', 'post_id', 'comment_id', 'created_at')
+
+
+def retention_cutoff(days=None):
+    """ابتدای اولین روزی که ردیف‌های خام آن نگه داشته می‌شوند"""
+    days = getattr(settings, 'ACTIVITY_RETENTION_DAYS', 90) if days is None else days
+    today = timezone.localdate()
+    return _day_start(today - datetime.timedelta(days=days))
+
+
+def rollup_activities(cutoff):
+    """خلاصه‌سازی همه روزهای بسته‌شده؛ خروجی تعداد روزهای محاسبه‌شده"""
+    today = timezone.localdate()
+    first = Activity.objects.aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return 0
+
+    rolled = set(PostActivityDaily.objects.values_list('day', flat=True).distinct())
+    rolled |= set(UserActivityDaily.objects.values_list('day', flat=True).distinct())
+    cutoff_day = timezone.localdate(cutoff)
+
+    days = 0
+    day = timezone.localdate(first)
+    while day < today:
+        if day >= cutoff_day or day not in rolled:
+            rollup_day(day)
+            days += 1
+        day += datetime.timedelta(days=1)
+    return days
+
+
+def rollup_day(day):
+    """محاسبه دوباره خلاصه‌های یک روز از ردیف‌های خام، در یک تراکنش"""
+    raw = Activity.objects.filter(created_at__gte=_day_start(day), created_at__lt=_day_start(day + datetime.timedelta(days=1)))
+    with write_transaction():
+        for model, dimension in ROLLUP_MODELS.items():
+            counts = (
+                raw.filter(**{f'{dimension}__isnull': False})
+                .order_by()
+                .values(f'{dimension}_id', 'activity_type')
+                .annotate(total=Count('id'))
+            )
+            model.objects.filter(day=day).delete()
+            model.objects.bulk_create(
+                [
+                    model(day=day, activity_type=row['activity_type'], count=row['total'],
+                          **{f'{dimension}_id': row[f'{dimension}_id']})
+                    for row in counts
+                ],
+                batch_size=ROLLUP_BATCH_SIZE,
+            )
+
+
+def archive_activities(cutoff, archive=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    حذف ردیف‌های خام قدیمی‌تر از cutoff در دسته‌های کوچک
+    اگر archive (فایل باز gzip متنی) داده شود هر دسته پیش از حذف در آن نوشته می‌شود.
+    خروجی تعداد ردیف‌های حذف‌شده است.
+    """
+    removed = 0
+    while True:
+        # شناسه‌ها تقریبا به ترتیب زمان‌اند، پس قدیمی‌ترها ابتدای جدول هستند
+        rows = list(
+            Activity.objects
+            .filter(created_at__lt=cutoff)
+            .order_by('pk')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            break
+        if archive is not None:
+            for row in rows:
+                # CursorEncoder میکروثانیه‌های created_at را حفظ می‌کند
+                archive.write(json.dumps(row, cls=CursorEncoder) + '\n')
+            archive.flush()
+
+        pks = [row['id'] for row in rows]
+        with write_transaction():
+            # ردیف‌های فید وابسته با یک DELETE سریع collector حذف می‌شوند
+            Activity.objects.filter(pk__in=pks).delete()
+        removed += len(rows)
+    return removed
+
+
+def analytics_since(days=None):
+    """اولین روز بازه آمار؛ امروز هنوز خلاصه نشده و در آمار نیست"""
+    days = getattr(settings, 'ACTIVITY_ANALYTICS_DAYS', 30) if days is None else days
+    return timezone.localdate() - datetime.timedelta(days=days)
+
+
+def activity_totals(model, days=None, **filters):
+    """مجموع فعالیت‌های هر نوع در روزهای اخیر از جدول خلاصه model؛ {نوع: تعداد}"""
+    return dict(
+        model.objects
+        .filter(day__gte=analytics_since(days), **filters)
+        .order_by()
+        .values('activity_type')
+        .annotate(total=Sum('count'))
+        .values_list('activity_type', 'total')
+    )
+
+
+def post_activity(post_id, days=None):
+    return activity_totals(PostActivityDaily, days, post_id=post_id)
+
+
+def user_activity(user_id, days=None):
+    return activity_totals(UserActivityDaily, days, user_id=user_id)
+
+
+def recent_post_activity(days=None):
+    """عبارت مجموع فعالیت‌های اخیر هر پست برای annotate روی کوئری پست‌ها"""
+    totals = (
+        PostActivityDaily.objects
+        .filter(post=OuterRef('pk'), day__gte=analytics_since(days))
+        .order_by()
+        .values('post')
+        .annotate(total=Sum('count'))
+        .values('total')
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def open_archive(directory):
+    """فایل بایگانی جدید (JSONL فشرده) با نام زمان اجرا"""
+    directory.mkdir(parents=True, exist_ok=True)
+    name = timezone.now().strftime('activity-%Y%m%d-%H%M%S.jsonl.gz')
+    return gzip.open(directory / name, 'wt', encoding='utf-8')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
@@ -0,0 +1,245 @@
+"""
+جستجوی متن کامل پست‌ها با جدول مجازی FTS5 در SQLite
+
+متن پیش از نمایه‌سازی و در زمان جستجو به یک شکل نرمال می‌شود (حروف عربی،
+اعداد فارسی، اعراب و نیم‌فاصله) تا نگارش‌های مختلف فارسی با هم تطبیق پیدا کنند.
+جدول در همان پایگاه داده پست‌هاست، پس به‌روزرسانی نمایه با تراکنش ذخیره پست
+commit یا rollback می‌شود.
+
+نرمال‌سازی هر حرف را جداگانه جایگزین یا حذف می‌کند؛ پس محل کلمات منطبق در متن
+نرمال‌شده (خروجی highlight در FTS5) روی متن اصلی پست نگاشت می‌شود و عنوان و
+خلاصه نتایج با همان نگارش نویسنده نمایش داده می‌شوند.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from config.sqlite import write_transaction
+from .models import Post
+
+FTS_TABLE = 'blog_post_fts'
+# وزن ستون‌ها در bm25: عنوان، متن، نویسنده
+BM25_WEIGHTS = (10.0, 1.0, 2.0)
+SNIPPET_TOKENS = 24
+
+_HIGHLIGHT_START = '\x02'
+_HIGHLIGHT_END = '\x03'
+
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '\u200c': '',  # نیم‌فاصله
+    '\u0640': '',  # کشیده
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+_ARABIC_DIACRITICS = re.compile('[\u064B-\u065F\u0670]')
+
+
+def normalize_text(text):
+    """یکسان‌سازی نگارش فارسی برای نمایه و جستجو"""
+    return _ARABIC_DIACRITICS.sub('', (text or '').translate(_CHAR_MAP))
+
+
+def normalized_offsets(text):
+    """
+    نگاشت محل هر حرف متن نرمال‌شده به محل آن در text
+    عضو اضافه آخر طول text است تا انتهای بازه‌ها هم نگاشت شود.
+    """
+    offsets = []
+    for index, char in enumerate(text or ''):
+        offsets.extend([index] * len(normalize_text(char)))
+    offsets.append(len(text or ''))
+    return offsets
+
+
+def build_match_query(text):
+    """تبدیل عبارت کاربر به عبارت MATCH امن؛ همه کلمات با تطبیق پیشوندی"""
+    tokens = re.findall(r'\w+', normalize_text(text))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def reindex_author(user):
+    """به‌روزرسانی ستون نویسنده در نمایه همه پست‌های یک کاربر"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {FTS_TABLE} SET author = %s WHERE rowid = %s',
+            [(normalize_text(user.username), pk) for pk in Post.objects.filter(author=user).values_list('pk', flat=True)],
+        )
+
+
+def index_post(post):
+    """افزودن یا به‌روزرسانی یک پست در نمایه"""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, body, author) VALUES (%s, %s, %s, %s)',
+            [post.pk, normalize_text(post.title), normalize_text(post.body), normalize_text(post.author.username)],
+        )
+
+
+def remove_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index(batch_size=1000):
+    """
+    ساخت دوباره کل نمایه به صورت دسته‌ای؛ تعداد پست‌های نمایه‌شده را برمی‌گرداند
+    حذف و درج دوباره در یک تراکنش است: جستجوها تا commit نمایه قبلی را می‌بینند و
+    خطا در میانه کار نمایه نیمه‌کاره باقی نمی‌گذارد.
+    """
+    total = 0
+    last_pk = 0
+    with write_transaction(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        while True:
+            rows = list(
+                Post.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'title', 'body', 'author__username')[:batch_size]
+            )
+            if not rows:
+                break
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body, author) VALUES (%s, %s, %s, %s)',
+                [(pk, normalize_text(title), normalize_text(body), normalize_text(author))
+                 for pk, title, body, author in rows],
+            )
+            last_pk = rows[-1][0]
+            total += len(rows)
+    return total
+
+
+def match_subquery(text):
+    """
+    زیرکوئری شناسه پست‌های منطبق برای استفاده در pk__in
+    خروجی (sql, params) یا None برای عبارت خالی است
+    """
+    match = build_match_query(text)
+    if match is None:
+        return None
+    return f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+
+
+def _marked_spans(highlighted):
+    """بازه‌های (شروع، پایان) علامت‌خورده در خروجی highlight، بر حسب محل در متن نرمال‌شده"""
+    spans = []
+    position = 0
+    start = None
+    for char in highlighted:
+        if char == _HIGHLIGHT_START:
+            start = position
+        elif char == _HIGHLIGHT_END:
+            spans.append((start, position))
+        else:
+            position += 1
+    return spans
+
+
+def _original_spans(text, highlighted):
+    offsets = normalized_offsets(text)
+    # نمایه‌ای که هنوز با متن فعلی هماهنگ نشده بازه بیرون از متن نمی‌سازد
+    return [(offsets[start], offsets[end]) for start, end in _marked_spans(highlighted) if end < len(offsets)]
+
+
+def _highlight(text, spans, start=0, end=None):
+    """HTML بخش text[start:end] با <mark> دور بازه‌های منطبق"""
+    end = len(text) if end is None else end
+    parts = []
+    position = start
+    for span_start, span_end in spans:
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        if span_start >= span_end:
+            continue
+        parts.append(escape(text[position:span_start]))
+        parts.append(f'<mark>{escape(text[span_start:span_end])}</mark>')
+        position = span_end
+    parts.append(escape(text[position:end]))
+    return mark_safe(''.join(parts))
+
+
+def _snippet(text, spans, tokens=SNIPPET_TOKENS):
+    """حدود tokens کلمه از text اطراف اولین بازه منطبق، با … در محل برش"""
+    words = [match.span() for match in re.finditer(r'\S+', text)]
+    if not words:
+        return mark_safe('')
+    first = spans[0][0] if spans else 0
+    index = next((i for i, (_, word_end) in enumerate(words) if word_end > first), len(words) - 1)
+    begin = max(0, min(index - tokens // 4, len(words) - tokens))
+    finish = min(len(words), begin + tokens)
+    html = _highlight(text, spans, words[begin][0], words[finish - 1][1])
+    return mark_safe(('…' if begin > 0 else '') + html + ('…' if finish < len(words) else ''))
+
+
+def search_posts(text, limit=20, offset=0):
+    """
+    جستجوی پست‌های فعال به ترتیب امتیاز bm25
+    هر پست خروجی ویژگی‌های search_title و search_snippet (HTML با <mark>) دارد
+    """
+    if not is_available():
+        return _search_posts_fallback(text, limit, offset)
+
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        # highlight روی متن نرمال‌شده فقط محل کلمات منطبق را می‌دهد؛ نمایش از متن اصلی است
+        cursor.execute(
+            f"""
+            SELECT f.rowid, p.body,
+                   highlight({FTS_TABLE}, 0, %s, %s),
+                   highlight({FTS_TABLE}, 1, %s, %s)
+            FROM {FTS_TABLE} AS f
+            JOIN {Post._meta.db_table} AS p ON p.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s AND p.is_active
+            ORDER BY bm25({FTS_TABLE}, {weights})
+            LIMIT %s OFFSET %s
+            """,
+            [_HIGHLIGHT_START, _HIGHLIGHT_END, _HIGHLIGHT_START, _HIGHLIGHT_END, match, limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    posts = Post.objects.select_related('author').defer('body').in_bulk([row[0] for row in rows])
+    results = []
+    for pk, body, title_marks, body_marks in rows:
+        post = posts.get(pk)
+        if post is None:
+            continue
+        post.search_title = _highlight(post.title, _original_spans(post.title, title_marks))
+        post.search_snippet = _snippet(body, _original_spans(body, body_marks))
+        results.append(post)
+    return results
+
+
+def _search_posts_fallback(text, limit, offset):
+    """جستجوی ساده برای پایگاه‌های داده غیر از SQLite"""
+    text = (text or '').strip()
+    if not text:
+        return []
+    posts = list(
+        Post.objects
+        .filter(is_active=True)
+        .filter(Q(title__icontains=text) | Q(body__icontains=text))
+        .select_related('author')[offset:offset + limit]
+    )
+    for post in posts:
+        post.search_title = post.title
+        post.search_snippet = post.excerpt
+    return posts
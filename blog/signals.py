@@ -1,56 +1,317 @@
-from django.db.models.signals import post_save, m2m_changed
+from weakref import WeakKeyDictionary
+from django.db import connection, transaction
+from django.db.models import Model, QuerySet
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
+from django.utils import timezone
 from .models import *
+from .activity import record_activity, record_activities
+from .authors import invalidate_author_card
+from .context_processors import invalidate_recent_posts
+from .counters import activity_timestamp, actual_count, bump_counter
+from .fragment_cache import bump_generation
+from .images import derivatives_ready, schedule_derivatives
+from .search import index_post, reindex_author, remove_post
 
 @receiver(post_save, sender=Comment)
 def create_comment_activity(sender, instance, created, **kwargs):
     if created:
-        activity_type = 'reply' if instance.parent else 'comment'
-        Activity.objects.create(
-            user=instance.author,
+        activity_type = 'reply' if instance.parent_id else 'comment'
+        record_activity(
+            user_id=instance.author_id,
             activity_type=activity_type,
-            post=instance.post,
-            comment=instance
+            post_id=instance.post_id,
+            comment_id=instance.pk
+        )
+
+def _post_reaction_activities(activity_type, instance, reverse, pk_set):
+    if reverse:
+        # instance کاربر است و pk_set شناسه پست‌ها
+        return [Activity(user_id=instance.pk, activity_type=activity_type, post_id=pk) for pk in pk_set]
+    return [Activity(user_id=pk, activity_type=activity_type, post_id=instance.pk) for pk in pk_set]
+
+def _comment_reaction_activities(activity_type, instance, reverse, pk_set):
+    if reverse:
+        comments = Comment.objects.filter(pk__in=pk_set).values_list('pk', 'post_id')
+        return [
+            Activity(user_id=instance.pk, activity_type=activity_type, post_id=post_id, comment_id=pk)
+            for pk, post_id in comments
+        ]
+    return [
+        Activity(user_id=pk, activity_type=activity_type, post_id=instance.post_id, comment_id=instance.pk)
+        for pk in pk_set
+    ]
+
+# مدل واسط -> نوع فعالیت، برای واکنش‌هایی که مستقیم روی مدل واسط ساخته می‌شوند
+REACTION_ACTIVITY_TYPES = {
+    PostLike: 'post_like',
+    PostDislike: 'post_dislike',
+    CommentLike: 'comment_like',
+    CommentDislike: 'comment_dislike',
+}
+
+def _reaction_comment_post_id(sender, instance):
+    if sender.comment.is_cached(instance):
+        return instance.comment.post_id
+    return Comment.objects.filter(pk=instance.comment_id).values_list('post_id', flat=True).first()
+
+@receiver(post_save, sender=PostLike)
+@receiver(post_save, sender=PostDislike)
+def create_post_reaction_activity(sender, instance, created, **kwargs):
+    if created:
+        record_activity(
+            user_id=instance.user_id,
+            activity_type=REACTION_ACTIVITY_TYPES[sender],
+            post_id=instance.post_id
+        )
+
+@receiver(post_save, sender=CommentLike)
+@receiver(post_save, sender=CommentDislike)
+def create_comment_reaction_activity(sender, instance, created, **kwargs):
+    if created:
+        record_activity(
+            user_id=instance.user_id,
+            activity_type=REACTION_ACTIVITY_TYPES[sender],
+            post_id=_reaction_comment_post_id(sender, instance),
+            comment_id=instance.comment_id
         )
 
 @receiver(m2m_changed, sender=Post.likes.through)
-def create_post_like_activity(sender, instance, action, pk_set, **kwargs):
+def create_post_like_activity(sender, instance, action, reverse, pk_set, **kwargs):
     if action == 'post_add':
-        for user_id in pk_set:
-            Activity.objects.create(
-                user_id=user_id,
-                activity_type='post_like',
-                post=instance
-            )
+        record_activities(_post_reaction_activities('post_like', instance, reverse, pk_set))
 
 @receiver(m2m_changed, sender=Post.dislikes.through)
-def create_post_dislike_activity(sender, instance, action, pk_set, **kwargs):
+def create_post_dislike_activity(sender, instance, action, reverse, pk_set, **kwargs):
     if action == 'post_add':
-        for user_id in pk_set:
-            Activity.objects.create(
-                user_id=user_id,
-                activity_type='post_dislike',
-                post=instance
-            )
+        record_activities(_post_reaction_activities('post_dislike', instance, reverse, pk_set))
 
 @receiver(m2m_changed, sender=Comment.likes.through)
-def create_comment_like_activity(sender, instance, action, pk_set, **kwargs):
+def create_comment_like_activity(sender, instance, action, reverse, pk_set, **kwargs):
     if action == 'post_add':
-        for user_id in pk_set:
-            Activity.objects.create(
-                user_id=user_id,
-                activity_type='comment_like',
-                post=instance.post,
-                comment=instance
-            )
+        record_activities(_comment_reaction_activities('comment_like', instance, reverse, pk_set))
 
 @receiver(m2m_changed, sender=Comment.dislikes.through)
-def create_comment_dislike_activity(sender, instance, action, pk_set, **kwargs):
+def create_comment_dislike_activity(sender, instance, action, reverse, pk_set, **kwargs):
     if action == 'post_add':
-        for user_id in pk_set:
-            Activity.objects.create(
-                user_id=user_id,
-                activity_type='comment_dislike',
-                post=instance.post,
-                comment=instance
-            )
\ No newline at end of file
+        record_activities(_comment_reaction_activities('comment_dislike', instance, reverse, pk_set))
+
+# ==============================================
+# شمارنده‌های لایک، دیسلایک و نظر
+# ==============================================
+
+# مدل واسط -> (مدل هدف، فیلد کلید خارجی، نام شمارنده)
+REACTION_COUNTERS = {
+    PostLike: (Post, 'post_id', 'like_count'),
+    PostDislike: (Post, 'post_id', 'dislike_count'),
+    CommentLike: (Comment, 'comment_id', 'like_count'),
+    CommentDislike: (Comment, 'comment_id', 'dislike_count'),
+}
+
+@receiver(post_save, sender=PostLike)
+@receiver(post_save, sender=PostDislike)
+@receiver(post_save, sender=CommentLike)
+@receiver(post_save, sender=CommentDislike)
+def increment_reaction_counter(sender, instance, created, **kwargs):
+    if created:
+        model, fk, field = REACTION_COUNTERS[sender]
+        bump_counter(model, getattr(instance, fk), field, 1)
+
+def _origin_model(origin):
+    """مدل شیء یا QuerySet که delete() روی آن صدا زده شده است"""
+    if isinstance(origin, Model):
+        return type(origin)
+    if isinstance(origin, QuerySet):
+        return origin.model
+    return None
+
+def _reaction_target_deleted(origin):
+    # واکنش‌هایی که همراه حذف پست یا نظر حذف می‌شوند به همان پست‌ها و نظرات
+    # حذف‌شده تعلق دارند؛ به‌روزرسانی شمارنده و نسل آن‌ها کار بیهوده است
+    return _origin_model(origin) in (Post, Comment)
+
+@receiver(post_delete, sender=PostLike)
+@receiver(post_delete, sender=PostDislike)
+@receiver(post_delete, sender=CommentLike)
+@receiver(post_delete, sender=CommentDislike)
+def decrement_reaction_counter(sender, instance, origin=None, **kwargs):
+    if _reaction_target_deleted(origin):
+        return
+    model, fk, field = REACTION_COUNTERS[sender]
+    bump_counter(model, getattr(instance, fk), field, -1)
+
+@receiver(m2m_changed, sender=Post.likes.through)
+@receiver(m2m_changed, sender=Post.dislikes.through)
+@receiver(m2m_changed, sender=Comment.likes.through)
+@receiver(m2m_changed, sender=Comment.dislikes.through)
+def increment_reaction_counter_on_add(sender, instance, action, reverse, pk_set, **kwargs):
+    # add() از bulk_create استفاده می‌کند و post_save ارسال نمی‌شود؛
+    # حذف‌ها از مسیر post_delete شمرده می‌شوند
+    if action != 'post_add' or not pk_set:
+        return
+    model, fk, field = REACTION_COUNTERS[sender]
+    if reverse:
+        for pk in pk_set:
+            bump_counter(model, pk, field, 1)
+    else:
+        bump_counter(model, instance.pk, field, len(pk_set))
+
+def _bump_comment_counters(comment, delta):
+    bump_counter(Post, comment.post_id, 'comment_count', delta)
+    if comment.parent_id:
+        bump_counter(Comment, comment.parent_id, 'reply_count', delta)
+
+@receiver(post_save, sender=Comment)
+def update_comment_counters(sender, instance, created, **kwargs):
+    was_active = None if created else getattr(instance, '_loaded_is_active', None)
+    if created and instance.is_active:
+        _bump_comment_counters(instance, 1)
+    elif was_active is not None and was_active != instance.is_active:
+        _bump_comment_counters(instance, 1 if instance.is_active else -1)
+    instance._loaded_is_active = instance.is_active
+
+class _CommentDeletion:
+    """نظرات یک فراخوانی delete() و پست‌هایی که یک بار برایشان کار انجام شده"""
+
+    def __init__(self):
+        self.pks = set()
+        self.recounted_posts = set()
+        self.bumped_posts = set()
+
+# شیء یا QuerySet مبدا delete() -> _CommentDeletion
+_comment_deletions = WeakKeyDictionary()
+
+def _comment_deletion(origin):
+    if origin is None:
+        return None
+    try:
+        return _comment_deletions.get(origin)
+    except TypeError:
+        return None
+
+@receiver(pre_delete, sender=Comment)
+def track_comment_deletion(sender, instance, origin=None, **kwargs):
+    # collector پیش از هر DELETE برای همه ردیف‌ها pre_delete می‌فرستد؛ پس در
+    # post_delete معلوم است کدام والدها هم حذف می‌شوند
+    if origin is None:
+        return
+    try:
+        deletion = _comment_deletions.setdefault(origin, _CommentDeletion())
+    except TypeError:
+        return
+    deletion.pks.add(instance.pk)
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counters(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Post:
+        # پست هم حذف می‌شود
+        return
+    deletion = _comment_deletion(origin)
+    if deletion is None:
+        if instance.is_active:
+            _bump_comment_counters(instance, -1)
+        return
+    # همه ردیف‌های این فراخوانی پیش از اولین post_delete حذف شده‌اند؛ شمارنده
+    # پست یک بار شمرده می‌شود و reply_count فقط برای والدهای باقی‌مانده کم می‌شود
+    if instance.post_id not in deletion.recounted_posts:
+        deletion.recounted_posts.add(instance.post_id)
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=actual_count(Post, 'comment_count'), **activity_timestamp(Post),
+        )
+    if instance.is_active and instance.parent_id and instance.parent_id not in deletion.pks:
+        bump_counter(Comment, instance.parent_id, 'reply_count', -1)
+
+
+# ==============================================
+# نسخه کش قطعه‌های قالب
+# ==============================================
+
+# فقط تغییراتی که در قطعه‌ها دیده می‌شوند (ساخت، ویرایش، فعال/غیرفعال شدن و
+# حذف نظر) نسل را عوض می‌کنند؛ شمارنده واکنش نظرات در قطعه‌ها نمایش داده نمی‌شود
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_generation(sender, instance, origin=None, **kwargs):
+    if _origin_model(origin) is Post:
+        return
+    deletion = _comment_deletion(origin)
+    if deletion is not None:
+        if instance.post_id in deletion.bumped_posts:
+            return
+        deletion.bumped_posts.add(instance.post_id)
+    bump_generation('comments', instance.post_id)
+
+# فیلدهای کاربر که در قطعه‌های کش‌شده نمایش داده می‌شوند
+AUTHOR_DISPLAY_FIELDS = frozenset({'username', 'photo'})
+
+def _author_display_changed(update_fields):
+    # ورود کاربر فقط last_login را ذخیره می‌کند و نباید کش‌ها را باطل کند
+    return update_fields is None or not AUTHOR_DISPLAY_FIELDS.isdisjoint(update_fields)
+
+@receiver(post_save, sender=CustomUser)
+def bump_author_generation(sender, instance, update_fields=None, **kwargs):
+    if not _author_display_changed(update_fields):
+        return
+    bump_generation('author', instance.pk)
+    # فهرست نظرات هر پستی که کاربر در آن نظر داده نام و تصویر او را دارد
+    post_ids = Comment.objects.filter(author=instance).values_list('post_id', flat=True).distinct()
+    for post_id in post_ids:
+        bump_generation('comments', post_id)
+
+
+# ==============================================
+# کش پست‌های اخیر (sidebar)
+# ==============================================
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_recent_posts_on_change(sender, **kwargs):
+    transaction.on_commit(invalidate_recent_posts)
+
+
+# ==============================================
+# نمایه جستجوی متن کامل
+# ==============================================
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, **kwargs):
+    index_post(instance)
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+@receiver(post_save, sender=CustomUser)
+def update_author_search_index(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    reindex_author(instance)
+
+
+# ==============================================
+# نسخه‌های کوچک‌شده تصویر پست
+# ==============================================
+
+def _post_images_ready(post_id):
+    # تغییر updated_at نسخه کش قطعه پست را عوض می‌کند تا srcset جدید نمایش داده شود
+    try:
+        Post.objects.filter(pk=post_id).update(updated_at=timezone.now())
+        invalidate_recent_posts()
+    finally:
+        connection.close()
+
+@receiver(post_save, sender=Post)
+def schedule_post_image_derivatives(sender, instance, **kwargs):
+    name = instance.photo.name
+    if name and not derivatives_ready(name):
+        post_id = instance.pk
+        transaction.on_commit(lambda: schedule_derivatives(name, on_done=lambda: _post_images_ready(post_id)))
+
+
+# ==============================================
+# کش کارت نویسنده
+# ==============================================
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_author_card_on_change(sender, instance, **kwargs):
+    invalidate_author_card(instance.pk)
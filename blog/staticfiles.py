@@ -0,0 +1,263 @@
+"""
+خط لوله فایل‌های استاتیک: bundle، اثر انگشت محتوا و نسخه‌های فشرده
+
+collectstatic با BundledStaticFilesStorage:
+1. فایل‌های هر bundle در STATIC_BUNDLES را به ترتیب به هم می‌چسباند (CSS
+   کوچک‌سازی می‌شود؛ فایل‌های JS عمدتا از قبل کوچک‌شده‌اند و فقط پشت هم
+   قرار می‌گیرند)،
+2. مثل ManifestStaticFilesStorage نام همه فایل‌ها را با hash محتوا می‌سازد و
+   ارجاع‌های url() را بازنویسی می‌کند (ارجاع به فایل ناموجود دست‌نخورده می‌ماند)،
+3. کنار هر فایل متنی hash‌دار نسخه .gz و در صورت نصب بودن brotli نسخه .br
+   می‌نویسد.
+
+PrecompressedStaticMiddleware فایل‌ها را از STATIC_ROOT با بهترین نسخه فشرده‌ای
+که مرورگر می‌پذیرد برمی‌گرداند؛ فایل‌های hash‌دار با Cache-Control immutable.
+تا وقتی collectstatic اجرا نشده (توسعه و تست) نام فایل‌ها بدون hash می‌ماند و
+قالب‌ها فایل‌های تکی bundle را بارگذاری می‌کنند.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from urllib.parse import urlsplit
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot', '.otf')
+# فایل‌های کوچک‌تر از این فشرده نمی‌شوند؛ سربار هدر از صرفه‌جویی بیشتر است
+COMPRESS_MIN_SIZE = 1024
+# (پسوند فایل، Content-Encoding) به ترتیب ترجیح
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# فایل‌های بدون hash ممکن است بدون تغییر نام عوض شوند
+MUTABLE_MAX_AGE = 60 * 60
+
+# نام فایل با hash دوازده‌رقمی ManifestStaticFilesStorage، مانند style.1a2b3c4d5e6f.css
+_HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+_CSS_AT_RULE = re.compile(r'@(?:charset|import)\b[^;]*;')
+_JS_SOURCE_MAP = re.compile(r'^\s*//[#@] sourceMappingURL=.*$', re.M)
+
+
+def get_bundles():
+    return getattr(settings, 'STATIC_BUNDLES', {})
+
+
+def minify_css(source):
+    """حذف توضیحات و فاصله‌های زائد؛ رشته‌ها دست‌نخورده می‌مانند"""
+    strings = []
+
+    def keep(match):
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return f'\x00{len(strings) - 1}\x00'
+
+    css = _CSS_TOKENS.sub(keep, source)
+    css = re.sub(r'\s+', ' ', css)
+    css = _CSS_SPACE_AROUND.sub(r'\1', css).replace(';}', '}')
+    return re.sub('\x00(\\d+)\x00', lambda match: strings[int(match.group(1))], css).strip()
+
+
+def build_css_bundle(sources):
+    """
+    چسباندن و کوچک‌سازی CSS
+    @import فقط در ابتدای فایل معتبر است، پس از همه اعضا به ابتدای bundle منتقل می‌شود.
+    """
+    imports, bodies = [], []
+    for source in sources:
+        css = minify_css(source)
+        for rule in _CSS_AT_RULE.findall(css):
+            if rule.startswith('@import') and rule not in imports:
+                imports.append(rule)
+        bodies.append(_CSS_AT_RULE.sub('', css))
+    return '@charset "UTF-8";' + ''.join(imports) + '\n'.join(bodies)
+
+
+def build_js_bundle(sources):
+    # source map اعضا با bundle همخوان نیست؛ ; جداکننده از ادغام عبارت آخر یک
+    # فایل با اول فایل بعد جلوگیری می‌کند
+    return '\n;\n'.join(_JS_SOURCE_MAP.sub('', source).strip() for source in sources) + '\n'
+
+
+BUNDLE_BUILDERS = {
+    '.css': build_css_bundle,
+    '.js': build_js_bundle,
+}
+
+
+class BundledStaticFilesStorage(ManifestStaticFilesStorage):
+    # ارجاع‌های شکسته قالب‌های آماده نباید collectstatic را متوقف کنند
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = {**paths, **self.build_bundles()}
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if not dry_run:
+            self.compress(self.hashed_files.values())
+
+    def build_bundles(self):
+        """نوشتن bundleها در STATIC_ROOT؛ خروجی ورودی‌های paths برای hash شدن"""
+        built = {}
+        for name, members in get_bundles().items():
+            extension = os.path.splitext(name)[1]
+            if extension not in BUNDLE_BUILDERS:
+                raise ImproperlyConfigured(f'STATIC_BUNDLES: unsupported bundle type {name!r}')
+            if extension == '.css' and any(os.path.dirname(member) != os.path.dirname(name) for member in members):
+                # url()های نسبی فقط وقتی درست می‌مانند که bundle کنار اعضایش باشد
+                raise ImproperlyConfigured(f'STATIC_BUNDLES: members of {name!r} must be in its directory')
+            sources = []
+            for member in members:
+                with self.open(member) as file:
+                    sources.append(file.read().decode('utf-8'))
+            self._replace(name, BUNDLE_BUILDERS[extension](sources).encode('utf-8'))
+            built[name] = (self, name)
+        return built
+
+    def compress(self, names):
+        for name in names:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            if len(content) < COMPRESS_MIN_SIZE:
+                continue
+            variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(content, quality=11)
+            for suffix, compressed in variants.items():
+                if len(compressed) < len(content) * 0.95:
+                    self._replace(name + suffix, compressed)
+
+    def _replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content))
+
+    def stored_name(self, name):
+        # پیش از اولین collectstatic فایل‌ها با نام اصلی سرو می‌شوند
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def url_converter(self, name, hashed_files, template=None):
+        convert = super().url_converter(name, hashed_files, template)
+
+        def converter(matchobj):
+            try:
+                return convert(matchobj)
+            except ValueError:
+                return matchobj['matched']
+
+        return converter
+
+
+def bundle_built(name):
+    """آیا bundle با collectstatic ساخته و در manifest ثبت شده است؟"""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    return name in getattr(staticfiles_storage, 'hashed_files', {})
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def serve_static(request, name):
+    """پاسخ فایل استاتیک از STATIC_ROOT یا None اگر فایل آنجا نباشد"""
+    root = settings.STATIC_ROOT
+    try:
+        path = safe_join(root, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+
+    immutable = bool(_HASHED_NAME.search(name))
+    stat = os.stat(path)
+    last_modified = int(stat.st_mtime)
+    if not immutable:
+        response = get_conditional_response(request, last_modified=last_modified)
+        if response is not None:
+            # 304 هم زمان اعتبار نسخه کش‌شده را تمدید می‌کند
+            return _cache_headers(response, name, immutable)
+
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml'):
+        content_type += '; charset=utf-8'
+
+    encodings = accepted_encodings(request)
+    served, encoding = path, None
+    for suffix, coding in ENCODINGS:
+        if coding in encodings and os.path.isfile(path + suffix):
+            served, encoding = path + suffix, coding
+            break
+
+    response = FileResponse(open(served, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(last_modified)
+    return _cache_headers(response, name, immutable)
+
+
+def _cache_headers(response, name, immutable):
+    if name.endswith(COMPRESSIBLE_EXTENSIONS):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if immutable:
+        response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+    return response
+
+
+def static_prefix():
+    prefix = urlsplit(settings.STATIC_URL or '').path
+    return '/' + prefix.strip('/') + '/'
+
+
+@sync_and_async_middleware
+def PrecompressedStaticMiddleware(get_response):
+    """سرو فایل‌های STATIC_ROOT پیش از بقیه middlewareها؛ بقیه درخواست‌ها عبور می‌کنند"""
+    prefix = static_prefix()
+
+    def static_name(request):
+        if not settings.STATIC_ROOT or request.method not in ('GET', 'HEAD'):
+            return None
+        if not request.path_info.startswith(prefix):
+            return None
+        return request.path_info[len(prefix):]
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            name = static_name(request)
+            response = await sync_to_async(serve_static)(request, name) if name else None
+            return response if response is not None else await get_response(request)
+    else:
+        def middleware(request):
+            name = static_name(request)
+            response = serve_static(request, name) if name else None
+            return response if response is not None else get_response(request)
+    return middleware
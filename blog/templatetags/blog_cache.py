@@ -0,0 +1,34 @@
+from django import template
+from blog.fragment_cache import get_or_render
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        return get_or_render(self.fragment_name, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    کش یک قطعه از قالب با کلید نسخه‌دار
+    
+    {% fragment_cache post_body post.pk post.updated_at %} ... {% endfragment_cache %}
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(f"'{tokens[0]}' tag requires at least 1 argument.")
+    return FragmentCacheNode(
+        nodelist,
+        tokens[1],
+        [parser.compile_filter(t) for t in tokens[2:]],
+    )
@@ -7,6 +7,9 @@ def pagination_range(page_obj, margin=2):
     """
     فیلتر سفارشی برای ایجاد محدوده صفحات در pagination
     """
+    if getattr(page_obj, 'is_keyset', False):
+        return keyset_pagination_range(page_obj)
+    
     current_page = page_obj.number
     total_pages = page_obj.paginator.num_pages
     
@@ -39,4 +42,41 @@ def pagination_range(page_obj, margin=2):
     if total_pages > 1:
         pages.append(total_pages)
     
-    return pages
\ No newline at end of file
+    return pages
+
+
+def keyset_pagination_range(page_obj):
+    """
+    محدوده صفحات برای صفحه‌بندی keyset
+    فقط صفحه قبل و بعد قابل دسترسی هستند؛ بقیه با ... نمایش داده می‌شوند
+    """
+    current_page = page_obj.number
+    total_pages = page_obj.paginator.num_pages
+    pages = []
+    
+    if page_obj.has_previous():
+        if current_page > 2:
+            pages.append('...')
+        pages.append(current_page - 1)
+    
+    pages.append(current_page)
+    
+    if page_obj.has_next():
+        pages.append(current_page + 1)
+        if total_pages is None or total_pages > current_page + 1:
+            pages.append('...')
+    
+    return pages
+
+@register.filter
+def page_query(page_obj, page_number):
+    """
+    رشته query لینک یک صفحه؛ برای صفحه‌بندی keyset از cursor استفاده می‌شود
+    """
+    if not getattr(page_obj, 'is_keyset', False):
+        return f'page={page_number}'
+    if page_number == page_obj.number + 1 and page_obj.next_cursor:
+        return f'cursor={page_obj.next_cursor}'
+    if page_number == page_obj.number - 1 and page_obj.previous_cursor:
+        return f'cursor={page_obj.previous_cursor}'
+    return ''
@@ -0,0 +1,42 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from blog.images import DERIVATIVE_FORMATS, derivative_name, derivative_widths, derivatives_ready
+
+register = template.Library()
+
+
+def _srcset(name, ext):
+    return ', '.join(
+        f'{default_storage.url(derivative_name(name, width, ext))} {width}w'
+        for width in derivative_widths()
+    )
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', alt='', css_class=''):
+    """
+    تصویر با srcset نسخه‌های WebP و JPEG و بارگذاری تنبل
+    
+    {% responsive_image post.photo sizes="80px" alt=post.title css_class="card-img" %}
+    تا زمانی که نسخه‌ها ساخته نشده‌اند، فایل اصلی نمایش داده می‌شود
+    """
+    if not image:
+        return ''
+    name = image.name
+    if not derivatives_ready(name):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            image.url, alt, css_class
+        )
+
+    widths = derivative_widths()
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, _srcset(name, ext), sizes) for ext, mime in DERIVATIVE_FORMATS if ext != 'jpg')
+    )
+    default_src = default_storage.url(derivative_name(name, widths[len(widths) // 2], 'jpg'))
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        sources, default_src, _srcset(name, 'jpg'), sizes, alt, css_class
+    )
@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from blog.staticfiles import bundle_built, get_bundles
+
+register = template.Library()
+
+TAGS = {
+    '.css': '<link rel="stylesheet" href="{}">',
+    '.js': '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def static_bundle(name):
+    """
+    تگ‌های link/script یک bundle از STATIC_BUNDLES
+
+    {% static_bundle 'assets/css/bundle.css' %}
+    پس از collectstatic یک فایل hash‌دار؛ در DEBUG یا پیش از ساخت، فایل‌های تکی
+    """
+    tag = TAGS[name[name.rfind('.'):]]
+    if not settings.DEBUG and bundle_built(name):
+        return format_html(tag, static(name))
+    return format_html_join('\n    ', tag, ((static(member),) for member in get_bundles()[name]))
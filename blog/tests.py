@@ -1,3 +1,1105 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import json
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from PIL import Image
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from accounts.models import CustomUser
+from config import replicas
+from config.replicas import PrimaryReplicaRouter, ReplicaPinningMiddleware, primary_reads
+from config.sqlite import SQLITE_PRAGMAS, sqlite_database, write_transaction
+from . import authors, events
+from .authors import get_author_card, invalidate_author_card
+from .dataset import generate_dataset
+from .events import EventHub
+from .feed import trim_feeds
+from .fragment_cache import get_generation, get_or_render
+from .images import (
+    derivative_name, derivative_targets, derivatives_ready, generate_derivatives, mark_derivatives_ready,
+    schedule_derivatives,
+)
+from .models import *
+from .moderation import APPROVE, DELETE, HIDE, moderate_comments
+from .pagination import KeysetPaginator, encode_cursor
+from .querybudget import assert_query_budget, collect_queries
+from .reactions import CLEAR, DISLIKE, LIKE, set_reaction
+from .rollups import (
+    ARCHIVE_FIELDS, archive_activities, open_archive, post_activity, recent_post_activity, retention_cutoff,
+    rollup_activities, user_activity,
+)
+from .search import normalize_text, rebuild_index, search_posts
+from .staticfiles import IMMUTABLE_MAX_AGE, MUTABLE_MAX_AGE, PrecompressedStaticMiddleware, bundle_built
+from .templatetags.blog_images import responsive_image
+from .views import GetCommentRepliesView
 
-# Create your tests here.
+
+# thread پس‌زمینه تراکنش تست را نمی‌بیند؛ فعالیت‌ها همان‌جا پس از commit نوشته می‌شوند
+@override_settings(ACTIVITY_FLUSH_MODE='commit')
+class BlogTestCase(TestCase):
+    """داده کوچک مشترک: دو کاربر، یک پست و یک نظر با یک پاسخ"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user('author', 'author@example.com', 'password')
+        cls.reader = CustomUser.objects.create_user('reader', 'reader@example.com', 'password')
+        cls.post = Post.objects.create(
+            title='first post', excerpt='excerpt', body='body', author=cls.author, photo='posts/test.jpg',
+        )
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.reader, body='first comment')
+        cls.reply = Comment.objects.create(post=cls.post, author=cls.author, body='a reply', parent=cls.comment)
+
+    def setUp(self):
+        cache.clear()
+
+    def committed(self):
+        """اجرای callbackهای on_commit (نسل کش، فعالیت‌ها) مانند commit واقعی"""
+        return self.captureOnCommitCallbacks(execute=True)
+
+
+class FragmentCacheTests(BlogTestCase):
+    def get_post_page(self):
+        return self.client.get(reverse('post_detail', args=[self.post.pk])).content.decode()
+
+    def test_new_comment_updates_cached_comment_count(self):
+        self.assertIn('2 Comments', self.get_post_page())
+        with self.committed():
+            Comment.objects.create(post=self.post, author=self.reader, body='second comment')
+        self.assertIn('3 Comments', self.get_post_page())
+
+    def test_author_rename_updates_cached_comments(self):
+        self.assertIn('reader', self.get_post_page())
+        with self.committed():
+            self.reader.username = 'renamed'
+            self.reader.save()
+        self.assertIn('<h6>renamed</h6>', self.get_post_page())
+
+    def test_comment_reactions_keep_comment_generation(self):
+        generation = get_generation('comments', self.post.pk)
+        with self.committed():
+            CommentLike.objects.create(comment=self.comment, user=self.author)
+            CommentDislike.objects.create(comment=self.reply, user=self.reader)
+            set_reaction(self.reply, self.author, LIKE)
+            CommentDislike.objects.filter(comment=self.reply).delete()
+        self.assertEqual(get_generation('comments', self.post.pk), generation)
+
+    def test_login_does_not_bump_author_generation(self):
+        self.get_post_page()
+        with self.committed() as callbacks:
+            self.client.force_login(self.reader)
+        self.assertEqual(callbacks, [])
+
+
+class KeysetPaginationTests(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number in range(12):
+            Post.objects.create(
+                title=f'post {number}', excerpt='excerpt', body='body', author=cls.author, photo='posts/test.jpg',
+            )
+
+    def test_pages_follow_cursor_without_overlap(self):
+        paginator = KeysetPaginator(Post.objects.all(), 5)
+        seen = []
+        page = paginator.get_page()
+        while True:
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            page = paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, list(Post.objects.values_list('pk', flat=True)))
+        previous = paginator.get_page(page.previous_cursor)
+        self.assertEqual(previous.number, page.number - 1)
+        self.assertEqual([post.pk for post in previous], seen[5:10])
+
+    def test_malformed_cursors_fall_back_to_first_page(self):
+        cursors = [
+            'not base64!', encode_cursor([1]), encode_cursor({'v': 1, 'd': 'next', 'n': 2}),
+            encode_cursor({'v': ['not a date', '2024-01-01T00:00:00', 1], 'd': 'next', 'n': 2}),
+            encode_cursor({'v': [None, None, 1], 'd': 'next', 'n': 2}),
+            encode_cursor({'v': ['2024-01-01', '2024-01-01T00:00:00', 1], 'd': 'sideways', 'n': 2}),
+            encode_cursor({'v': ['2024-01-01', '2024-01-01T00:00:00', 1], 'd': 'next', 'n': '2'}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('home'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['post_list'].number, 1)
+
+    def test_feed_ignores_malformed_cursor(self):
+        self.client.force_login(self.reader)
+        for cursor in (encode_cursor([1]), encode_cursor({'v': ['x'], 'd': 'next', 'n': 2})):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('feed'), {'cursor': cursor}).status_code, 200)
+
+
+class CommentRepliesTests(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # reply (از BlogTestCase) و دو پاسخ دیگر، هر کدام با دو پاسخ
+        cls.replies = [cls.reply] + [
+            Comment.objects.create(post=cls.post, author=cls.reader, body=f'reply {n}', parent=cls.comment)
+            for n in range(2)
+        ]
+        for reply in cls.replies:
+            for n in range(2):
+                Comment.objects.create(post=cls.post, author=cls.author, body=f'nested {n}', parent=reply)
+
+    def get_replies(self, **params):
+        response = self.client.get(reverse('get_replies', args=[self.comment.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_direct_replies_are_paged_by_cursor(self):
+        first = self.get_replies(page_size=2)
+        self.assertEqual([reply['id'] for reply in first['replies']], [reply.pk for reply in self.replies[:2]])
+        self.assertTrue(first['has_more'])
+        second = self.get_replies(page_size=2, cursor=first['next_cursor'])
+        self.assertEqual([reply['id'] for reply in second['replies']], [self.replies[2].pk])
+        self.assertFalse(second['has_more'])
+
+    def test_nested_replies_are_capped(self):
+        full = self.get_replies(depth=2)
+        self.assertEqual([len(reply['replies']) for reply in full['replies']], [2, 2, 2])
+        with mock.patch.object(GetCommentRepliesView, 'max_nested', 3):
+            capped = self.get_replies(depth=2)
+        self.assertEqual([len(reply['replies']) for reply in capped['replies']], [2, 1, 0])
+        partial = capped['replies'][1]
+        self.assertTrue(partial['has_more'])
+        rest = self.client.get(partial['replies_url'], {'cursor': partial['cursor']}).json()
+        self.assertEqual(len(rest['replies']), 1)
+
+
+class CommentTreeTests(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # comment > reply > deep > deeper > deepest و یک نظر اصلی دوم
+        cls.deep = Comment.objects.create(post=cls.post, author=cls.reader, body='deep', parent=cls.reply)
+        cls.deeper = Comment.objects.create(post=cls.post, author=cls.author, body='deeper', parent=cls.deep)
+        cls.deepest = Comment.objects.create(post=cls.post, author=cls.reader, body='deepest', parent=cls.deeper)
+        cls.sibling = Comment.objects.create(post=cls.post, author=cls.reader, body='sibling', parent=cls.comment)
+        cls.second = Comment.objects.create(post=cls.post, author=cls.reader, body='second thread')
+
+    def flatten(self, max_depth=None):
+        return flatten_comment_tree(get_comment_tree(self.post, max_depth=max_depth))
+
+    def test_closing_levels_balance_opened_lists(self):
+        flat = self.flatten()
+        self.assertEqual([comment.pk for comment in flat], [
+            self.comment.pk, self.reply.pk, self.deep.pk, self.deeper.pk, self.deepest.pk,
+            self.sibling.pk, self.second.pk,
+        ])
+        self.assertEqual([len(comment.closing_levels) for comment in flat], [0, 0, 0, 0, 3, 1, 0])
+        open_lists = 0
+        for comment in flat:
+            open_lists += bool(comment.children) - len(comment.closing_levels)
+            self.assertGreaterEqual(open_lists, 0)
+            self.assertEqual(open_lists, comment.tree_level + bool(comment.children) - len(comment.closing_levels))
+        self.assertEqual(open_lists, 0)
+
+    def test_cut_off_tree_balances_and_offers_load_replies(self):
+        flat = self.flatten(max_depth=2)
+        self.assertEqual([comment.pk for comment in flat][:3], [self.comment.pk, self.reply.pk, self.deep.pk])
+        self.assertEqual([len(comment.closing_levels) for comment in flat], [0, 0, 1, 1, 0])
+
+        html = render_to_string('comments/comment_tree.html', {'comments': flat, 'post': self.post})
+        self.assertNotIn('deeper', html)
+        buttons = re.findall(r'class="btn btn-link btn-load-replies" data-url="([^"]+)"', html)
+        self.assertEqual(buttons, [reverse('get_replies', args=[self.deep.pk])])
+        # هر نظر داخل comment-item و replies-list همه اجدادش باز می‌شود و در پایان همه بسته‌اند
+        levels = {comment.pk: comment.tree_level for comment in flat}
+        open_divs = 0
+        for tag in re.finditer(r'<div class="comment-item[^"]*" id="comment-(\d+)"|<div\b|</div>', html):
+            if tag.group(1):
+                self.assertEqual(open_divs, 2 * levels.pop(int(tag.group(1))))
+            open_divs += -1 if tag.group().startswith('</') else 1
+            self.assertGreaterEqual(open_divs, 0)
+        self.assertEqual((open_divs, levels), (0, {}))
+
+    @override_settings(COMMENT_TREE_DEPTH=1)
+    def test_post_page_renders_tree_up_to_setting(self):
+        response = self.client.get(reverse('post_detail', args=[self.post.pk]))
+        self.assertContains(response, 'data-url="%s"' % reverse('get_replies', args=[self.reply.pk]))
+        self.assertNotContains(response, 'id="comment-%d"' % self.deep.pk)
+
+
+class ModerationTests(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.nested = Comment.objects.create(post=cls.post, author=cls.reader, body='nested', parent=cls.reply)
+        cls.other = Comment.objects.create(post=cls.post, author=cls.reader, body='other thread')
+        CommentLike.objects.create(comment=cls.nested, user=cls.author)
+        Activity.objects.create(user=cls.reader, activity_type='reply', post=cls.post, comment=cls.nested)
+
+    def assertCounters(self, comment_count, reply_count):
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.post.comment_count, comment_count)
+        self.assertEqual(self.comment.reply_count, reply_count)
+
+    def test_hide_and_approve_whole_subtree(self):
+        with self.committed():
+            self.assertEqual(moderate_comments(HIDE, ids=[self.reply.pk]), 2)
+        self.assertFalse(Comment.objects.filter(pk__in=[self.reply.pk, self.nested.pk], is_active=True).exists())
+        self.assertCounters(comment_count=2, reply_count=0)
+        with self.committed():
+            self.assertEqual(moderate_comments(APPROVE, post_ids=[self.post.pk]), 2)
+        self.assertCounters(comment_count=4, reply_count=1)
+
+    def test_delete_removes_subtree_and_dependents(self):
+        with self.committed():
+            self.assertEqual(moderate_comments(DELETE, ids=[self.comment.pk], batch_size=2), 3)
+        self.assertEqual(list(Comment.objects.values_list('pk', flat=True)), [self.other.pk])
+        self.assertFalse(CommentLike.objects.exists())
+        self.assertFalse(Activity.objects.filter(comment_id=self.nested.pk).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def subscribe(self):
+        hub = events.get_hub()
+        subscription = hub.subscribe(events.post_channel(self.post.pk), asynchronous=False)
+        self.addCleanup(hub.unsubscribe, subscription)
+        return subscription
+
+    def moderated_events(self, subscription):
+        messages, _ = subscription.drain()
+        return [(message['event'], message['data']) for message in messages]
+
+    def test_moderation_publishes_events_after_commit(self):
+        subscription = self.subscribe()
+        with self.committed():
+            moderate_comments(HIDE, ids=[self.reply.pk])
+            self.assertEqual(self.moderated_events(subscription), [])
+        self.assertEqual(self.moderated_events(subscription), [
+            ('comments.moderated', {'action': HIDE, 'ids': [self.nested.pk, self.reply.pk]}),
+        ])
+        with self.committed():
+            moderate_comments(DELETE, ids=[self.comment.pk], batch_size=2)
+        self.assertEqual(self.moderated_events(subscription), [
+            ('comments.moderated', {'action': DELETE, 'ids': [self.nested.pk, self.reply.pk]}),
+            ('comments.moderated', {'action': DELETE, 'ids': [self.comment.pk]}),
+        ])
+
+    def test_admin_action_publishes_events(self):
+        subscription = self.subscribe()
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.committed():
+            response = self.client.post(reverse('admin:blog_comment_changelist'), {
+                'action': 'hide_comments', '_selected_action': [self.other.pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.moderated_events(subscription), [
+            ('comments.moderated', {'action': HIDE, 'ids': [self.other.pk]}),
+        ])
+
+
+class EventHubTests(SimpleTestCase):
+    def test_publish_fans_out_to_channel_subscribers(self):
+        hub = EventHub()
+        first, second = hub.subscribe('post:1', asynchronous=False), hub.subscribe('post:1', asynchronous=False)
+        other = hub.subscribe('post:2', asynchronous=False)
+        hub.publish('post:1', 'comment.created', {'id': 7})
+        for subscription in (first, second):
+            self.assertEqual(subscription.wait(0), ([{'event': 'comment.created', 'data': {'id': 7}, 'id': 1}], 0))
+        self.assertEqual(other.drain(), ([], 0))
+        self.assertEqual(hub.subscriber_count('post:1'), 2)
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        self.assertEqual(hub.subscriber_count(), 1)
+
+    def test_slow_subscriber_gets_resync(self):
+        hub = EventHub(queue_size=2)
+        with mock.patch('blog.events.get_hub', return_value=hub):
+            stream = events.stream('post:1')
+            self.assertEqual(next(stream), f'retry: {events.RETRY_MILLISECONDS}\n\n')
+            for number in range(5):
+                hub.publish('post:1', 'reactions', {'number': number})
+            chunks = [next(stream) for _ in range(3)]
+            stream.close()
+        self.assertEqual(chunks, [
+            events.format_event('resync', {'dropped': 3}),
+            events.format_event('reactions', {'number': 3}, 4),
+            events.format_event('reactions', {'number': 4}, 5),
+        ])
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    @override_settings(EVENTS_HEARTBEAT=0.01)
+    def test_idle_stream_sends_pings(self):
+        hub = EventHub()
+        with mock.patch('blog.events.get_hub', return_value=hub):
+            stream = events.stream('post:1')
+            next(stream)
+            self.assertEqual([next(stream), next(stream)], [': ping\n\n', ': ping\n\n'])
+            stream.close()
+
+    def test_async_stream_pings_and_delivers(self):
+        hub = EventHub()
+
+        async def read():
+            stream = events.astream('post:1')
+            chunks = [await anext(stream)]
+            with override_settings(EVENTS_HEARTBEAT=0.01):
+                chunks.append(await anext(stream))
+            hub.publish('post:1', 'comment.updated', {'id': 1})
+            chunks.append(await anext(stream))
+            await stream.aclose()
+            return chunks
+
+        with mock.patch('blog.events.get_hub', return_value=hub):
+            chunks = asyncio.run(read())
+        self.assertEqual(chunks[1:], [': ping\n\n', events.format_event('comment.updated', {'id': 1}, 1)])
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    def test_sqlite_backend_delivers_between_hubs(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / 'events.sqlite3'
+        # دو hub با یک فایل مشترک نقش دو worker را دارند
+        publisher, receiver = (
+            EventHub(backend='blog.events.SQLiteBackend', path=path, poll_interval=0.01) for _ in range(2)
+        )
+        for hub in (publisher, receiver):
+            self.addCleanup(hub.backend.close)
+        subscription = receiver.subscribe('post:1', asynchronous=False)
+
+        deadline = time.monotonic() + 5
+        messages = []
+        while not messages and time.monotonic() < deadline:
+            # thread گیرنده فقط رویدادهای پس از شروع خود را می‌بیند
+            publisher.publish('post:1', 'comment.created', {'id': 3})
+            messages, _ = subscription.wait(0.2)
+        self.assertTrue(messages)
+        self.assertEqual((messages[0]['event'], messages[0]['data']), ('comment.created', {'id': 3}))
+        self.assertIsInstance(messages[0]['id'], int)
+
+
+class QueryBudgetTests(BlogTestCase):
+    """
+    تعداد کوئری مسیرهای اصلی در محدوده QUERY_BUDGETS (بدون کش گرم)
+    callbackهای on_commit در TestCase اجرا نمی‌شوند، همان‌طور که در حالت
+    background نوشتن فعالیت‌ها بیرون از درخواست است.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reader)
+
+    def test_home(self):
+        self.assertEqual(assert_query_budget(self.client, 'home').status_code, 200)
+
+    def test_post_detail(self):
+        self.assertEqual(assert_query_budget(self.client, 'post_detail', self.post.pk).status_code, 200)
+
+    def test_get_replies(self):
+        response = assert_query_budget(self.client, 'get_replies', self.comment.pk, data={'depth': 3})
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_comment(self):
+        response = assert_query_budget(
+            self.client, 'add_comment', self.post.pk, method='post',
+            data={'body': 'budget', 'parent_id': self.comment.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_add_top_level_comment(self):
+        response = assert_query_budget(self.client, 'add_comment', self.post.pk, method='post', data={'body': 'budget'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_comment(self):
+        response = assert_query_budget(
+            self.client, 'update_comment', self.comment.pk, method='post', data={'body': 'edited'},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_comment(self):
+        response = assert_query_budget(self.client, 'delete_comment', self.comment.pk, method='post')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Comment.objects.filter(pk__in=[self.comment.pk, self.reply.pk]).exists())
+
+    def test_toggle_like(self):
+        response = assert_query_budget(self.client, 'toggle_like', self.comment.pk, method='post', data={'action': 'like'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_toggle_post_reaction(self):
+        PostLike.objects.create(post=self.post, user=self.reader)
+        response = assert_query_budget(
+            self.client, 'toggle_post_reaction', self.post.pk, method='post', data={'action': 'like'},
+        )
+        self.assertEqual(response.json()['user_action'], None)
+
+    def test_over_budget_fails_with_query_list(self):
+        with self.assertRaisesMessage(AssertionError, 'exceed budget of 0'):
+            assert_query_budget(self.client, 'home', budget=0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        token = replicas._request_state.set(replicas._RequestState(pinned=False))
+        self.addCleanup(replicas._request_state.reset, token)
+
+    def test_reads_go_to_replica_outside_primary_reads(self):
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        with primary_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2', 'replica3'])
+    def test_request_reads_stay_on_one_replica(self):
+        def view(request):
+            aliases = {self.router.db_for_read(model) for model in (Post, Comment, CustomUser) for _ in range(10)}
+            return HttpResponse(','.join(aliases))
+
+        middleware = ReplicaPinningMiddleware(view)
+        for replica in ('replica2', 'replica3'):
+            with mock.patch('config.replicas.random.choice', side_effect=[replica, 'replica1', 'replica1']):
+                self.assertEqual(middleware(RequestFactory().get('/')).content.decode(), replica)
+
+    def test_fragment_miss_renders_from_primary(self):
+        render = lambda: self.router.db_for_read(Comment)
+        self.assertEqual(get_or_render('test_fragment', [1], render), 'default')
+
+
+class SQLiteConnectionTests(TransactionTestCase):
+    def test_pragmas_applied_on_connect(self):
+        expected = {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'temp_store': 2,
+            'mmap_size': SQLITE_PRAGMAS['mmap_size'], 'cache_size': SQLITE_PRAGMAS['cache_size'],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({DEFAULT_DB_ALIAS: sqlite_database(Path(directory) / 'pragmas.sqlite3')})
+            database = handler[DEFAULT_DB_ALIAS]
+            try:
+                with database.cursor() as cursor:
+                    for pragma, value in expected.items():
+                        cursor.execute(f'PRAGMA {pragma}')
+                        self.assertEqual(cursor.fetchone()[0], value, pragma)
+            finally:
+                database.close()
+
+    def begin_statements(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            with block:
+                Post.objects.exists()
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def test_only_write_transactions_begin_immediate(self):
+        self.assertEqual(self.begin_statements(write_transaction()), ['BEGIN IMMEDIATE'])
+        # atomic فقط‌خواندنی (admin، primary_reads) قفل نوشتن نمی‌گیرد
+        self.assertEqual(self.begin_statements(transaction.atomic()), ['BEGIN'])
+        self.assertEqual(self.begin_statements(write_transaction()), ['BEGIN IMMEDIATE'])
+
+
+class ConditionalGetTests(BlogTestCase):
+    def get_post_page(self, **headers):
+        return self.client.get(reverse('post_detail', args=[self.post.pk]), headers=headers)
+
+    def test_unchanged_post_returns_304(self):
+        response = self.get_post_page()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_post_page(if_none_match=response['ETag']).status_code, 304)
+        self.assertEqual(self.get_post_page(if_modified_since=response['Last-Modified']).status_code, 304)
+
+    def test_reaction_updates_last_activity(self):
+        etag = self.get_post_page()['ETag']
+        with self.committed():
+            PostLike.objects.create(post=self.post, user=self.reader)
+        self.post.refresh_from_db()
+        self.assertGreaterEqual(self.post.last_activity_at, self.reply.created_at)
+        self.assertEqual(self.get_post_page(if_none_match=etag).status_code, 200)
+
+    def test_new_post_in_sidebar_changes_etag(self):
+        etag = self.get_post_page()['ETag']
+        with self.committed():
+            Post.objects.create(title='newer post', excerpt='excerpt', body='body', author=self.author, photo='posts/test.jpg')
+        response = self.get_post_page(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'newer post')
+
+
+class MediaServingTests(SimpleTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        (self.root / 'posts').mkdir()
+        (self.root / 'posts' / 'photo.jpg').write_bytes(self.content)
+        settings = override_settings(MEDIA_ROOT=str(self.root), MEDIA_SENDFILE_BACKEND=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get(self, **headers):
+        return self.client.get(reverse('media', args=['posts/photo.jpg']), headers=headers)
+
+    def assertRange(self, header, start, end):
+        response = self.get(range=header)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[start:end + 1])
+        self.assertEqual(response['Content-Length'], str(end - start + 1))
+
+    def test_open_and_suffix_ranges(self):
+        size = len(self.content)
+        self.assertRange('bytes=0-', 0, size - 1)
+        self.assertRange('bytes=100-', 100, size - 1)
+        self.assertRange('bytes=-10', size - 10, size - 1)
+        # بیشتر از اندازه فایل یعنی کل فایل
+        self.assertRange(f'bytes=-{size * 2}', 0, size - 1)
+        self.assertRange(f'bytes=10-{size * 2}', 10, size - 1)
+
+    def test_unsatisfiable_range_returns_416(self):
+        for header in (f'bytes={len(self.content)}-', 'bytes=-0', 'bytes=20-10'):
+            response = self.get(range=header)
+            self.assertEqual(response.status_code, 416, header)
+            self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_malformed_range_returns_whole_file(self):
+        response = self.get(range='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_if_range_mismatch_returns_whole_file(self):
+        first = self.get()
+        self.assertEqual(self.get(range='bytes=0-9', if_range=first['ETag']).status_code, 206)
+        self.assertEqual(self.get(range='bytes=0-9', if_range=first['Last-Modified']).status_code, 206)
+        for validator in ('"stale"', f'W/{first["ETag"]}', 'Thu, 01 Jan 1970 00:00:00 GMT'):
+            response = self.get(range='bytes=0-9', if_range=validator)
+            self.assertEqual(response.status_code, 200, validator)
+            self.assertNotIn('Content-Range', response)
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_conditional_get_returns_304(self):
+        etag = self.get()['ETag']
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_x_accel_redirect_offload(self):
+        response = self.get(range='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/posts/photo.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-sendfile')
+    def test_x_sendfile_offload(self):
+        response = self.get()
+        self.assertEqual(response['X-Sendfile'], str(self.root / 'posts' / 'photo.jpg'))
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_escaping_paths_return_404(self):
+        self.assertEqual(self.client.get(reverse('media', args=['posts/missing.jpg'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('media', args=['posts'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('media', args=['../config/settings.py'])).status_code, 404)
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=(40, 80))
+class ImageDerivativeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        settings = override_settings(MEDIA_ROOT=str(self.root))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        (self.root / 'posts').mkdir()
+        exif = Image.Exif()
+        exif[0x010F] = 'camera'
+        Image.new('RGB', (60, 30), 'red').save(self.root / 'posts' / 'photo.jpg', exif=exif)
+        self.photo = Post(photo='posts/photo.jpg').photo
+
+    def generate(self):
+        return generate_derivatives(str(self.root / 'posts' / 'photo.jpg'), derivative_targets(self.photo.name))
+
+    def test_derivatives_are_resized_without_upscaling_or_exif(self):
+        self.assertEqual(self.generate(), 4)
+        for width, expected in ((40, (40, 20)), (80, (60, 30))):
+            for ext, image_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with Image.open(self.root / derivative_name(self.photo.name, width, ext)) as image:
+                    self.assertEqual((image.format, image.size), (image_format, expected))
+                    self.assertNotIn('exif', image.info)
+        self.assertEqual(list(self.root.glob('**/*.tmp')), [])
+
+    def test_srcset_falls_back_to_original_until_ready(self):
+        self.assertEqual(
+            responsive_image(self.photo, alt='photo'),
+            '<img src="/media/posts/photo.jpg" alt="photo" class="" loading="lazy" decoding="async">',
+        )
+        self.generate()
+        mark_derivatives_ready(self.photo.name)
+        html = responsive_image(self.photo, sizes='50vw')
+        self.assertIn('<source type="image/webp" srcset="/media/derivatives/posts/photo_40w.webp 40w, '
+                      '/media/derivatives/posts/photo_80w.webp 80w" sizes="50vw">', html)
+        self.assertIn('<img src="/media/derivatives/posts/photo_80w.jpg" srcset="/media/derivatives/posts/photo_40w.jpg 40w', html)
+
+    def test_readiness_is_cached(self):
+        with mock.patch.object(default_storage, 'exists', return_value=False) as exists:
+            for _ in range(3):
+                self.assertFalse(derivatives_ready(self.photo.name))
+        self.assertEqual(exists.call_count, 1)
+        with mock.patch.object(default_storage, 'exists', return_value=True) as exists:
+            cache.clear()
+            for _ in range(3):
+                self.assertTrue(derivatives_ready(self.photo.name))
+        self.assertEqual(exists.call_count, 1)
+
+    def schedule(self, on_done):
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        with mock.patch('blog.images.get_executor', return_value=executor):
+            future = schedule_derivatives(self.photo.name, on_done=on_done)
+            executor.shutdown(wait=True)
+        return future
+
+    def test_scheduled_derivatives_mark_ready(self):
+        self.assertFalse(derivatives_ready(self.photo.name))
+        done = []
+        self.schedule(lambda: done.append(True))
+        self.assertEqual(done, [True])
+        self.assertTrue(derivatives_ready(self.photo.name))
+
+    def test_failed_generation_is_logged(self):
+        (self.root / 'posts' / 'photo.jpg').write_bytes(b'not an image')
+        done = []
+        with self.assertLogs('blog.images', 'ERROR') as logs:
+            self.schedule(lambda: done.append(True))
+        self.assertIn('generating derivatives for posts/photo.jpg failed', logs.output[0])
+        self.assertEqual(done, [])
+        self.assertFalse(derivatives_ready(self.photo.name))
+
+
+class StaticFilesTests(SimpleTestCase):
+    css = '.card {\n    /* پس‌زمینه */\n    background: url("../img/dot.png");\n}\n' + ''.join(
+        f'.item-{number} {{ margin : {number}px ; }}\n' for number in range(200)
+    )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source, self.root = Path(directory.name) / 'source', Path(directory.name) / 'static_root'
+        files = {
+            'css/card.css': self.css,
+            'css/extra.css': '@import url("https://example.com/font.css");\n.extra { color: red; }',
+            'img/dot.png': 'png',
+            'js/one.js': 'var one = 1\n//# sourceMappingURL=one.js.map',
+            'js/two.js': 'var two = 2;',
+        }
+        for name, content in files.items():
+            (source / name).parent.mkdir(parents=True, exist_ok=True)
+            (source / name).write_text(content, encoding='utf-8')
+        settings = override_settings(
+            STATIC_ROOT=str(self.root), STATICFILES_DIRS=[str(source)],
+            STATIC_BUNDLES={'css/site.css': ['css/card.css', 'css/extra.css'], 'js/site.js': ['js/one.js', 'js/two.js']},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    def hashed(self, name):
+        return staticfiles_storage.stored_name(name)
+
+    def test_collectstatic_builds_hashed_compressed_bundles(self):
+        self.assertTrue(bundle_built('css/site.css'))
+        css = (self.root / self.hashed('css/site.css')).read_text(encoding='utf-8')
+        self.assertTrue(css.startswith('@charset "UTF-8";@import url("https://example.com/font.css");.card{'))
+        self.assertIn(f'url("../{self.hashed("img/dot.png")}")', css)
+        self.assertNotIn('پس‌زمینه', css)
+        self.assertIn('}.item-7{margin : 7px}.item-8{', css)
+        with gzip.open(self.root / (self.hashed('css/site.css') + '.gz')) as compressed:
+            self.assertEqual(compressed.read().decode('utf-8'), css)
+
+        js = (self.root / self.hashed('js/site.js')).read_text(encoding='utf-8')
+        self.assertEqual(js, 'var one = 1\n;\nvar two = 2;\n')
+        # فایل‌های کوچک فشرده نمی‌شوند
+        self.assertFalse((self.root / (self.hashed('js/site.js') + '.gz')).exists())
+
+    def get(self, name, **headers):
+        return self.client.get(f'/static/{name}', headers=headers)
+
+    def test_hashed_files_are_immutable_and_precompressed(self):
+        name = self.hashed('css/site.css')
+        response = self.get(name, accept_encoding='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), (self.root / name).read_bytes())
+
+        plain = self.get(name, accept_encoding='gzip;q=0')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(b''.join(plain.streaming_content), (self.root / name).read_bytes())
+
+    def test_unhashed_files_revalidate_with_cache_headers(self):
+        response = self.get('css/card.css')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={MUTABLE_MAX_AGE}')
+        not_modified = self.get('css/card.css', if_modified_since=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['Cache-Control'], f'public, max-age={MUTABLE_MAX_AGE}')
+        self.assertEqual(not_modified['Vary'], 'Accept-Encoding')
+
+    def test_unknown_paths_fall_through(self):
+        self.assertEqual(self.get('css/missing.css').status_code, 404)
+        self.assertEqual(self.get('../source/css/card.css').status_code, 404)
+        self.assertEqual(self.client.post(f'/static/{self.hashed("css/site.css")}').status_code, 404)
+
+    def test_async_middleware_serves_static(self):
+        async def fallback(request):
+            return HttpResponse(status=404)
+
+        middleware = PrecompressedStaticMiddleware(fallback)
+        request = RequestFactory().get(f'/static/{self.hashed("js/site.js")}')
+        response = asyncio.run(middleware(request))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(asyncio.run(middleware(RequestFactory().get('/static/js/missing.js'))).status_code, 404)
+        response.close()
+
+
+class SearchTests(BlogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # ي و ك عربی و نیم‌فاصله در متن اصلی
+        cls.persian = Post.objects.create(
+            title='كتاب‌هاي جنگو', excerpt='excerpt', author=cls.author, photo='posts/test.jpg',
+            body=' '.join(['مقدمه'] * 30 + ['كتاب‌هاي', 'خوب'] + ['پایان'] * 30),
+        )
+
+    def test_results_highlight_original_text(self):
+        [result] = search_posts('کتابهای')
+        self.assertEqual(result.pk, self.persian.pk)
+        self.assertEqual(result.search_title, '<mark>كتاب‌هاي</mark> جنگو')
+        self.assertIn('<mark>كتاب‌هاي</mark> خوب', result.search_snippet)
+        self.assertTrue(result.search_snippet.startswith('…'))
+        self.assertTrue(result.search_snippet.endswith('…'))
+
+    def test_author_rename_updates_index(self):
+        self.assertEqual(search_posts('renamed'), [])
+        self.author.username = 'renamed'
+        self.author.save()
+        self.assertEqual({post.pk for post in search_posts('renamed')}, {self.post.pk, self.persian.pk})
+
+    def test_failed_rebuild_keeps_previous_index(self):
+        def failing(text):
+            if text == self.persian.body:
+                raise RuntimeError
+            return normalize_text(text)
+
+        with mock.patch('blog.search.normalize_text', side_effect=failing), self.assertRaises(RuntimeError):
+            rebuild_index(batch_size=1)
+        self.assertEqual([post.pk for post in search_posts('کتابهای')], [self.persian.pk])
+        self.assertEqual(rebuild_index(batch_size=1), Post.objects.count())
+        self.assertEqual([post.pk for post in search_posts('کتابهای')], [self.persian.pk])
+
+
+class AuthorCardTests(BlogTestCase):
+    def test_cached_card_expires_after_ttl(self):
+        invalidate_author_card(self.reader.pk)
+        self.assertEqual(get_author_card(self.reader.pk)['username'], 'reader')
+        # تغییر در پردازه‌ای دیگر: سیگنال این پردازه اجرا نمی‌شود
+        CustomUser.objects.filter(pk=self.reader.pk).update(username='renamed')
+        self.assertEqual(get_author_card(self.reader.pk)['username'], 'reader')
+        later = time.monotonic() + authors.AUTHOR_CARD_TTL + 1
+        with mock.patch('blog.authors.time.monotonic', return_value=later):
+            self.assertEqual(get_author_card(self.reader.pk)['username'], 'renamed')
+
+
+class CounterTests(BlogTestCase):
+    def assertCounts(self, obj, **expected):
+        obj.refresh_from_db()
+        self.assertEqual({field: getattr(obj, field) for field in expected}, expected)
+
+    def test_reactions_update_counters(self):
+        like = PostLike.objects.create(post=self.post, user=self.reader)
+        PostDislike.objects.create(post=self.post, user=self.author)
+        CommentLike.objects.create(comment=self.comment, user=self.author)
+        self.assertCounts(self.post, like_count=1, dislike_count=1)
+        self.assertCounts(self.comment, like_count=1)
+        like.delete()
+        self.assertCounts(self.post, like_count=0, dislike_count=1)
+
+    def test_comment_activation_updates_counters(self):
+        self.assertCounts(self.post, comment_count=2)
+        self.assertCounts(self.comment, reply_count=1)
+        self.reply.is_active = False
+        self.reply.save()
+        self.assertCounts(self.post, comment_count=1)
+        self.assertCounts(self.comment, reply_count=0)
+
+    def test_subtree_delete_updates_counters(self):
+        Comment.objects.create(post=self.post, author=self.reader, body='nested', parent=self.reply)
+        self.reply.delete()
+        self.assertCounts(self.post, comment_count=1)
+        self.assertCounts(self.comment, reply_count=0)
+
+    def make_thread(self, post, size):
+        parent = None
+        for _ in range(size):
+            parent = Comment.objects.create(post=post, author=self.reader, body='thread', parent=parent)
+            CommentLike.objects.create(comment=parent, user=self.author)
+        PostLike.objects.create(post=post, user=self.reader)
+        return parent
+
+    def count_delete_queries(self, obj):
+        with collect_queries() as stats:
+            obj.delete()
+        return stats.count
+
+    def test_cascade_delete_queries_do_not_grow_with_rows(self):
+        small, large = (
+            Post.objects.create(title=title, excerpt='e', body='b', author=self.author, photo='posts/test.jpg')
+            for title in ('small', 'large')
+        )
+        self.make_thread(small, 2)
+        self.make_thread(large, 8)
+        self.assertEqual(self.count_delete_queries(small), self.count_delete_queries(large))
+
+    def test_comment_subtree_delete_queries_do_not_grow_with_rows(self):
+        roots = []
+        for size in (2, 8):
+            root = Comment.objects.create(post=self.post, author=self.reader, body='root')
+            # collector هر سطح درخت را با یک کوئری جمع می‌کند؛ عمق ثابت، تعداد متفاوت
+            for _ in range(size):
+                reply = Comment.objects.create(post=self.post, author=self.reader, body='reply', parent=root)
+                CommentLike.objects.create(comment=reply, user=self.author)
+            roots.append(root)
+        small, large = (self.count_delete_queries(root) for root in roots)
+        self.assertEqual(small, large)
+        self.assertCounts(self.post, comment_count=2)
+
+    def test_queryset_delete_updates_counters_once_per_post(self):
+        for _ in range(5):
+            Comment.objects.create(post=self.post, author=self.reader, body='reply', parent=self.reply)
+        with collect_queries() as stats:
+            Comment.objects.filter(pk__in=[self.reply.pk]).delete()
+        updates = [sql for sql in stats.queries if sql.startswith('UPDATE')]
+        # شمارش دوباره پست و کم کردن reply_count والد باقی‌مانده
+        self.assertEqual(len(updates), 2)
+        self.assertCounts(self.post, comment_count=1)
+        self.assertCounts(self.comment, reply_count=0)
+
+
+class ReactionTests(BlogTestCase):
+    def react(self, target, action, user=None):
+        with self.committed():
+            return set_reaction(target, user or self.reader, action)
+
+    def assertReaction(self, result, likes, dislikes, user_action):
+        self.assertEqual(result, {'likes_count': likes, 'dislikes_count': dislikes, 'user_action': user_action})
+
+    def test_like_switch_and_clear(self):
+        for target, like_model, dislike_model in (
+            (self.post, PostLike, PostDislike), (self.comment, CommentLike, CommentDislike),
+        ):
+            with self.subTest(target=type(target).__name__):
+                self.assertReaction(self.react(target, LIKE), 1, 0, LIKE)
+                self.assertReaction(self.react(target, LIKE, self.author), 2, 0, LIKE)
+                self.assertReaction(self.react(target, DISLIKE), 1, 1, DISLIKE)
+                self.assertFalse(like_model.objects.filter(user=self.reader).exists())
+                self.assertTrue(dislike_model.objects.filter(user=self.reader).exists())
+                self.assertReaction(self.react(target, CLEAR), 1, 0, None)
+                self.assertReaction(self.react(target, CLEAR), 1, 0, None)
+                target.refresh_from_db()
+                self.assertEqual((target.like_count, target.dislike_count), (1, 0))
+
+    def test_repeated_reaction_toggles_off(self):
+        self.assertReaction(self.react(self.post, DISLIKE), 0, 1, DISLIKE)
+        self.assertReaction(self.react(self.post, DISLIKE), 0, 0, None)
+        self.assertFalse(PostDislike.objects.exists())
+
+    def test_existing_row_from_concurrent_click_does_not_raise(self):
+        # کلیک هم‌زمان دیگری ردیف را زودتر درج کرده است
+        PostLike.objects.create(post=self.post, user=self.reader)
+        self.assertReaction(self.react(self.post, LIKE), 0, 0, None)
+
+    def test_new_reaction_records_activity(self):
+        self.react(self.comment, LIKE)
+        self.react(self.comment, LIKE)
+        self.react(self.post, DISLIKE)
+        activities = Activity.objects.order_by('pk').values_list('activity_type', 'post_id', 'comment_id')
+        self.assertEqual(list(activities), [
+            ('comment_like', self.post.pk, self.comment.pk), ('post_dislike', self.post.pk, None),
+        ])
+
+    def test_reaction_updates_last_activity(self):
+        self.react(self.post, LIKE)
+        self.post.refresh_from_db()
+        self.assertIsNotNone(self.post.last_activity_at)
+
+    def test_view_returns_counts(self):
+        self.client.force_login(self.reader)
+        url = reverse('toggle_post_reaction', args=[self.post.pk])
+        self.assertEqual(self.client.post(url, {'action': 'like'}).json()['likes_count'], 1)
+        self.assertEqual(self.client.post(url, {'action': 'sideways'}).status_code, 400)
+
+
+class FeedTests(BlogTestCase):
+    def feed(self, user):
+        return list(FeedEntry.objects.filter(recipient=user).values_list('activity__activity_type', flat=True))
+
+    def test_fan_out_recipients(self):
+        other = CustomUser.objects.create_user('other', 'other@example.com', 'password')
+        with self.committed():
+            Comment.objects.create(post=self.post, author=other, body='reply', parent=self.comment)
+            set_reaction(self.reply, self.reader, LIKE)
+            # واکنش نویسنده به پست خودش به صندوق کسی نمی‌رود
+            set_reaction(self.post, self.author, LIKE)
+        self.assertEqual(self.feed(self.author), ['comment_like', 'reply'])
+        self.assertEqual(self.feed(self.reader), ['reply'])
+        self.assertEqual(self.feed(other), [])
+
+    def make_entries(self, user, count):
+        activities = Activity.objects.bulk_create(
+            Activity(user=self.reader, activity_type='post_like', post=self.post) for _ in range(count)
+        )
+        FeedEntry.objects.bulk_create(FeedEntry(recipient=user, activity=activity) for activity in activities)
+        return [activity.pk for activity in activities]
+
+    def test_trim_keeps_newest_entries_of_overfull_feeds(self):
+        newest = self.make_entries(self.author, 5)[-3:]
+        kept = self.make_entries(self.reader, 3)
+        with self.settings(FEED_MAX_ENTRIES=3):
+            self.assertEqual(trim_feeds(), 1)
+            # ردیف‌های جدید پس از نوشتن کوتاه نمی‌شوند، فقط با اجرای دوره‌ای
+            with self.committed():
+                PostLike.objects.create(post=self.post, user=self.reader)
+            self.assertEqual(FeedEntry.objects.filter(recipient=self.author).count(), 4)
+            call_command('trim_feeds', stdout=StringIO())
+        latest = Activity.objects.latest('pk').pk
+        self.assertEqual(self.activity_ids(self.author), [*newest[1:], latest])
+        self.assertEqual(self.activity_ids(self.reader), kept)
+
+    def activity_ids(self, user):
+        return list(FeedEntry.objects.filter(recipient=user).order_by('id').values_list('activity_id', flat=True))
+
+
+class ActivityBufferTests(BlogTestCase):
+    def activity_types(self):
+        return list(Activity.objects.filter(post=self.post).order_by('pk').values_list('activity_type', flat=True))
+
+    def test_activities_written_in_one_batch_after_commit(self):
+        with self.committed():
+            with transaction.atomic():
+                Comment.objects.create(post=self.post, author=self.reader, body='one')
+                PostLike.objects.create(post=self.post, user=self.reader)
+                self.assertEqual(self.activity_types(), [])
+        self.assertEqual(self.activity_types(), ['comment', 'post_like'])
+
+    def test_rolled_back_savepoint_discards_its_activities(self):
+        with self.committed():
+            with transaction.atomic():
+                Comment.objects.create(post=self.post, author=self.reader, body='kept')
+                try:
+                    with transaction.atomic():
+                        PostLike.objects.create(post=self.post, user=self.reader)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+        self.assertEqual(self.activity_types(), ['comment'])
+
+    def test_rolled_back_transaction_records_nothing(self):
+        with self.committed() as callbacks:
+            try:
+                with transaction.atomic():
+                    Comment.objects.create(post=self.post, author=self.reader, body='lost')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.activity_types(), [])
+
+
+class RollupTests(BlogTestCase):
+    def add_activities(self, *ages):
+        """یک فعالیت لایک پست برای هر سن (timedelta) نسبت به حالا"""
+        now = timezone.now()
+        activities = Activity.objects.bulk_create(
+            Activity(user=self.reader, activity_type='post_like', post=self.post) for _ in ages
+        )
+        for activity, age in zip(activities, ages):
+            Activity.objects.filter(pk=activity.pk).update(created_at=now - age)
+        return [activity.pk for activity in activities]
+
+    def test_archive_round_trips_and_keeps_rows_inside_window(self):
+        cutoff = retention_cutoff(10)
+        old = self.add_activities(datetime.timedelta(days=40), datetime.timedelta(days=11))
+        kept = self.add_activities(datetime.timedelta(days=9), datetime.timedelta(hours=1))
+        Activity.objects.filter(pk=kept[0]).update(created_at=cutoff)
+        expected = list(Activity.objects.filter(pk__in=old).order_by('pk').values(*ARCHIVE_FIELDS))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open_archive(Path(directory)) as archive:
+                self.assertEqual(archive_activities(cutoff, archive=archive, batch_size=1), 2)
+            with gzip.open(archive.name, 'rt', encoding='utf-8') as archived:
+                rows = [json.loads(line) for line in archived]
+
+        for row in rows:
+            row['created_at'] = datetime.datetime.fromisoformat(row['created_at'])
+        self.assertEqual(rows, expected)
+        self.assertEqual(sorted(Activity.objects.values_list('pk', flat=True)), kept)
+
+    def test_analytics_read_rollups_after_archive(self):
+        self.add_activities(datetime.timedelta(days=3), datetime.timedelta(days=3), datetime.timedelta(days=60))
+        rollup_activities(retention_cutoff(1))
+        archive_activities(retention_cutoff(1))
+        self.assertFalse(Activity.objects.exists())
+
+        self.assertEqual(post_activity(self.post.pk), {'post_like': 2})
+        self.assertEqual(post_activity(self.post.pk, days=90), {'post_like': 3})
+        self.assertEqual(user_activity(self.reader.pk), {'post_like': 2})
+        self.assertEqual(user_activity(self.author.pk), {})
+        [post] = Post.objects.annotate(recent_activity=recent_post_activity()).filter(pk=self.post.pk)
+        self.assertEqual(post.recent_activity, 2)
+
+    def test_admin_shows_rollup_activity(self):
+        self.add_activities(datetime.timedelta(days=2))
+        rollup_activities(retention_cutoff())
+        admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        changelist = self.client.get(reverse('admin:blog_post_changelist') + '?o=-8').context['cl']
+        self.assertEqual(changelist.get_ordering_field_columns(), {8: 'desc'})
+        self.assertEqual(changelist.result_list[0].recent_activity, 1)
+        self.assertContains(self.client.get(reverse('admin:blog_post_change', args=[self.post.pk])), 'لایک پست: 1')
+        self.assertContains(self.client.get(reverse('admin:accounts_customuser_change', args=[self.reader.pk])), 'لایک پست: 1')
+
+
+class DatasetTests(TestCase):
+    def test_generated_rows_keep_their_timestamps(self):
+        with CaptureQueriesContext(connection) as queries:
+            totals = generate_dataset(users=5, posts=3, comments_per_post=5, likes_per_post=3, likes_per_comment=1, days=30)
+        # زمان‌ها در همان INSERT نوشته می‌شوند، نه با UPDATE بعدی
+        self.assertFalse([query['sql'] for query in queries if query['sql'].startswith('UPDATE')])
+        self.assertEqual(totals['posts'], 3)
+        for post in Post.objects.all():
+            self.assertEqual(post.updated_at, post.created_at)
+            self.assertLess(post.created_at, timezone.now() - datetime.timedelta(seconds=1))
+        activity_times = list(Activity.objects.order_by('pk').values_list('created_at', flat=True))
+        self.assertEqual(activity_times, sorted(activity_times))
+        self.assertGreater(len(set(activity_times)), 1)
@@ -4,12 +4,17 @@ from .views import *
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('post/new/', PostNewView.as_view(), name='post_new'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('feed/', FeedView.as_view(), name='feed'),
     path('post/<int:pk>',PostDetailView.as_view(), name='post_detail'),
     path('post/update/<int:pk>',PostUpdateView.as_view(), name='update'),
     path('post/delete/<int:pk>',PostDeleteView.as_view(), name='delete'),
+    path('post/<int:post_id>/react/',TogglePostReactionView.as_view(), name='toggle_post_reaction'),
+    path('post/<int:post_id>/events/',PostEventStreamView.as_view(), name='post_events'),
     path('post/<int:post_id>/comment/add/',AddCommentView.as_view(), name='add_comment'),
     path('comment/<int:comment_id>/edit/',UpdateCommentView.as_view(), name='update_comment'),
     path('comment/<int:comment_id>/delete/',DeleteCommentView.as_view(), name='delete_comment'),
     path('comment/<int:comment_id>/replies/',GetCommentRepliesView.as_view(), name='get_replies'),
     path('comment/<int:comment_id>/like/',ToggleCommentLikeView.as_view(), name='toggle_like'),
+    path('cache/stats/',FragmentCacheStatsView.as_view(), name='fragment_cache_stats'),
 ]
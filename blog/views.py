@@ -1,17 +1,32 @@
 from django.views.generic import View, CreateView, DetailView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from django.core.paginator import Paginator
-from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse, reverse_lazy
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.views.generic.edit import FormMixin
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import AccessMixin, LoginRequiredMixin
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.db import DEFAULT_DB_ALIAS
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.functional import SimpleLazyObject
 import json
+from itertools import chain
+from asgiref.sync import sync_to_async
+from config.sqlite import write_transaction
 from .models import *
 from .forms import *
+from . import events
+from .authors import aget_author_cards, build_author_card, get_author_card
+from .conditional import not_modified, post_list_validators, post_validators, set_validators
+from .feed import get_feed_paginator
+from .fragment_cache import get_generation, fragment_cache_stats
+from .moderation import DELETE as MODERATION_DELETE, moderate_comments
+from .pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+from .reactions import ACTIONS as REACTION_ACTIONS, set_reaction
+from .search import search_posts
 
 
 
@@ -19,19 +34,70 @@ class HomeView(View):
     # model = Post
     template_name = 'home.html'
     paginate_by = 1
+    # مدت کش تعداد تقریبی پست‌ها برای نمایش شماره صفحات (ثانیه)
+    count_ttl = 60
     
     def get(self, request):
-        posts = Post.objects.all()
-        paginator = Paginator(posts, self.paginate_by)
+        posts = Post.objects.select_related('author').defer('body')
+        paginator = KeysetPaginator(posts, self.paginate_by, count_ttl=self.count_ttl)
         
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        cursor = request.GET.get('cursor')
+        page_obj = paginator.get_page(cursor)
+        
+        # شماره صفحات هم بخشی از صفحه است
+        etag, last_modified = post_list_validators(request, page_obj, extra=(paginator.count,))
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
         
         context = {
             'post_list':page_obj
         }
         
-        return render(request,self.template_name,context)
+        return set_validators(render(request,self.template_name,context), etag, last_modified)
+        
+
+class SearchView(View):
+    """جستجوی متن کامل پست‌ها"""
+    template_name = 'search.html'
+    paginate_by = 10
+    
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        
+        results = []
+        if query:
+            # یک نتیجه اضافه برای تشخیص وجود صفحه بعد
+            results = search_posts(
+                query,
+                limit=self.paginate_by + 1,
+                offset=(page - 1) * self.paginate_by
+            )
+        
+        context = {
+            'query': query,
+            'results': results[:self.paginate_by],
+            'page': page,
+            'has_next': len(results) > self.paginate_by,
+        }
+        
+        return render(request, self.template_name, context)
+        
+        
+class FeedView(LoginRequiredMixin, View):
+    """فعالیت‌های دیگران روی پست‌ها و نظرات کاربر"""
+    template_name = 'feed.html'
+    paginate_by = 20
+    
+    def get(self, request):
+        paginator = get_feed_paginator(request.user, self.paginate_by)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+        
+        return render(request, self.template_name, {'entries': page_obj})
         
         
 class PostDetailView(DetailView):
@@ -39,11 +105,39 @@ class PostDetailView(DetailView):
     template_name = 'single_post.html'
     context_object_name = 'post'
     
+    def get_queryset(self):
+        return Post.objects.select_related('author')
+    
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        # پیش از خواندن نظرات و رندر قالب
+        etag, last_modified = post_validators(request, self.object)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        context = self.get_context_data(object=self.object)
+        return set_validators(self.render_to_response(context), etag, last_modified)
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.filter(parent=None, is_active=True)
+        # درخت نظرات فقط در صورت miss شدن کش قطعه بارگذاری می‌شود
+        context['comments'] = SimpleLazyObject(
+            lambda: flatten_comment_tree(
+                get_comment_tree(self.object, max_depth=getattr(settings, 'COMMENT_TREE_DEPTH', None))
+            )
+        )
+        # قطعه‌های پست و نویسنده در صورت miss با نسخه primary پست رندر می‌شوند
+        context['primary_post'] = SimpleLazyObject(self.get_primary_object)
+        context['comment_generation'] = get_generation('comments', self.object.pk)
+        context['author_generation'] = get_generation('author', self.object.author_id)
         return context
     
+    def get_primary_object(self):
+        """پست خوانده‌شده از primary؛ همان self.object اگر از primary خوانده شده باشد"""
+        if self.object._state.db == DEFAULT_DB_ALIAS:
+            return self.object
+        return Post.objects.using(DEFAULT_DB_ALIAS).select_related('author').get(pk=self.object.pk)
+    
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         
@@ -64,11 +158,13 @@ class PostDetailView(DetailView):
         
         # ایجاد نظر جدید (نظر اصلی، نه پاسخ)
         try:
-            comment = Comment.objects.create(
-                post=self.object,
-                author=request.user,
-                body=body
-            )
+            with write_transaction():
+                comment = Comment.objects.create(
+                    post=self.object,
+                    author=request.user,
+                    body=body
+                )
+            events.publish(self.object.pk, 'comment.created', comment_data(comment, get_author_card(comment.author_id)))
             
             return JsonResponse({
                 'success': True,
@@ -83,6 +179,7 @@ class PostDetailView(DetailView):
             }, status=500)
 
  
+@method_decorator(write_transaction(), name='post')
 class PostNewView(CreateView):
     model = Post
     template_name = 'post_new.html'
@@ -95,6 +192,7 @@ class PostNewView(CreateView):
         messages.success(self.request, 'پست با موفقیت ایجاد شد.')
         return super().form_valid(form)
     
+@method_decorator(write_transaction(), name='post')
 class PostUpdateView(UpdateView):
     model = Post
     template_name = 'post_update.html'
@@ -111,6 +209,7 @@ class PostUpdateView(UpdateView):
             return redirect('post_detail', pk=obj.pk)
         return super().dispatch(request, *args, **kwargs)
     
+@method_decorator(write_transaction(), name='post')
 class PostDeleteView(DeleteView):
     model = Post
     template_name = 'post_delete.html'
@@ -132,14 +231,39 @@ class PostDeleteView(DeleteView):
 # ویوهای مربوط به نظرات (Comments)
 # ==============================================
 
-class AddCommentView(LoginRequiredMixin, View):
+def in_transaction(func):
+    """
+    اجرای یک نوشتن همگام و سیگنال‌هایش در یک تراکنش از داخل ویو async
+    در SQLite تراکنش با BEGIN IMMEDIATE شروع می‌شود (config/sqlite.py)
+    """
+    return sync_to_async(write_transaction()(func))
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    """معادل LoginRequiredMixin برای ویوهای async؛ کاربر با request.auser() خوانده می‌شود"""
+    
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        # تا دسترسی‌های بعدی به request.user در حلقه رویداد کوئری نزنند
+        request.user = user
+        if not user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+class AddCommentView(AsyncLoginRequiredMixin, View):
     """ویو برای افزودن نظر جدید"""
     
-    def post(self, request, post_id):
-        post = get_object_or_404(Post, id=post_id)
+    async def post(self, request, post_id):
+        parent_id = request.POST.get('parent_id')
+        if parent_id:
+            # والد باید در همین پست باشد؛ وجود پست هم با همین کوئری بررسی می‌شود
+            parent_comment = await aget_object_or_404(
+                Comment.objects.only('id', 'post_id', 'path', 'depth'), id=parent_id, post_id=post_id
+            )
+        else:
+            parent_comment = None
+            await aget_object_or_404(Post.objects.only('id'), id=post_id)
         
         body = request.POST.get('body', '').strip()
-        parent_id = request.POST.get('parent_id')
         
         if not body:
             return JsonResponse({
@@ -149,27 +273,20 @@ class AddCommentView(LoginRequiredMixin, View):
             
         try:
             # ایجاد نظر جدید
-            if parent_id:
-                parent_comment = get_object_or_404(Comment, id=parent_id, post=post)
-                comment = Comment.objects.create(
-                    post=post,
-                    author=request.user,
-                    body=body,
-                    parent=parent_comment
-                )
-            else:
-                comment = Comment.objects.create(
-                    post=post,
-                    author=request.user,
-                    body=body
-                )
+            comment = await in_transaction(Comment.objects.create)(
+                post_id=post_id,
+                author=request.user,
+                body=body,
+                parent=parent_comment
+            )
             
             # آماده کردن پاسخ
             response_data = {
                 'success': True,
                 'message': 'نظر شما با موفقیت ثبت شد.',
-                'comment': self.get_comment_data(comment)
+                'comment': await self.get_comment_data(comment)
             }
+            events.publish(post_id, 'comment.created', response_data['comment'])
             
             return JsonResponse(response_data)
             
@@ -179,46 +296,37 @@ class AddCommentView(LoginRequiredMixin, View):
                 'error': str(e)
             }, status=500)
     
-    def get_comment_data(self, comment):
+    async def get_comment_data(self, comment):
         """تبدیل کامنت به دیکشنری برای پاسخ JSON"""
-        # آدرس آواتار پیش‌فرض
-        default_avatar = '/static/assets/img/comment/comment_1.png'
-        avatar_url = default_avatar
-        
-        # تلاش برای دریافت آواتار کاربر
-        try:
-            if hasattr(comment.author, 'photo') and comment.author.photo:
-                avatar_url = comment.author.photo.url
-        except:
-            pass
-        
-        return {
-            'id': comment.id,
-            'body': comment.body,
-            'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'author': {
-                'id': comment.author.id,
-                'username': comment.author.username,
-                'avatar': avatar_url
-            },
-            'parent_id': comment.parent.id if comment.parent else None
-        }
+        # نویسنده همان کاربر درخواست است که از قبل بارگذاری شده
+        return comment_data(comment, build_author_card(comment.author))
 
-class UpdateCommentView(LoginRequiredMixin, View):
+def comment_data(comment, author):
+    """داده JSON یک کامنت، مشترک بین پاسخ ویوها و رویدادهای زنده"""
+    return {
+        'id': comment.id,
+        'body': comment.body,
+        'created_at': comment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'author': author,
+        'parent_id': comment.parent_id
+    }
+
+class UpdateCommentView(AsyncLoginRequiredMixin, View):
     """ویو برای ویرایش نظر"""
     
-    def post(self, request, comment_id):
-        comment = get_object_or_404(Comment, id=comment_id)
+    async def post(self, request, comment_id):
+        comment = await aget_object_or_404(Comment, id=comment_id)
         
         # بررسی مالکیت
-        if comment.author != request.user:
+        if comment.author_id != request.user.pk:
             return JsonResponse({
                 'success': False,
                 'error': 'شما مجاز به ویرایش این نظر نیستید'
             }, status=403)
         
         try:
-            data = json.loads(request.body) if request.body else request.POST
+            # بدنه JSON یا فرم معمولی
+            data = json.loads(request.body) if request.content_type == 'application/json' else request.POST
             body = data.get('body', '').strip()
             
             if not body:
@@ -228,7 +336,8 @@ class UpdateCommentView(LoginRequiredMixin, View):
                 }, status=400)
             
             comment.body = body
-            comment.save()
+            await in_transaction(comment.save)(update_fields=['body'])
+            events.publish(comment.post_id, 'comment.updated', {'id': comment.id, 'body': comment.body})
             
             return JsonResponse({
                 'success': True,
@@ -245,23 +354,25 @@ class UpdateCommentView(LoginRequiredMixin, View):
                 'error': str(e)
             }, status=500)
 
-class DeleteCommentView(LoginRequiredMixin, View):
+class DeleteCommentView(AsyncLoginRequiredMixin, View):
     """ویو برای حذف نظر"""
     
-    def post(self, request, comment_id):
-        comment = get_object_or_404(Comment, id=comment_id)
+    async def post(self, request, comment_id):
+        comment = await aget_object_or_404(Comment, id=comment_id)
         
         # بررسی مالکیت
-        if comment.author != request.user and not request.user.is_staff:
+        if comment.author_id != request.user.pk and not request.user.is_staff:
             return JsonResponse({
                 'success': False,
                 'error': 'شما مجاز به حذف این نظر نیستید'
             }, status=403)
         
         try:
-            post_id = comment.post.id
+            post_id = comment.post_id
             comment_id = comment.id
-            comment.delete()
+            # حذف مجموعه‌ای کل زیرشاخه به جای collector یک‌به‌یک ORM؛ رویداد comments.moderated
+            # را خود moderate_comments منتشر می‌کند
+            await sync_to_async(moderate_comments)(MODERATION_DELETE, ids=[comment.pk])
             
             return JsonResponse({
                 'success': True,
@@ -277,73 +388,195 @@ class DeleteCommentView(LoginRequiredMixin, View):
             }, status=500)
 
 class GetCommentRepliesView(View):
-    """دریافت پاسخ‌های یک کامنت"""
+    """
+    دریافت پاسخ‌های یک کامنت به صورت صفحه‌بندی cursor
+    
+    پارامترها: cursor (ادامه از صفحه قبل)، page_size و depth (تعداد سطح‌های
+    پاسخ که همراه هر صفحه برگردانده می‌شود). هر گره has_more و در صورت نیاز
+    cursor دارد تا ادامه آن شاخه جداگانه بارگذاری شود.
+    """
+    page_size = 10
+    max_page_size = 50
+    depth = 1
+    max_depth = 5
+    # سقف کل نوادگانی که همراه یک صفحه (depth > 1) خوانده می‌شوند
+    max_nested = 100
     
-    def get(self, request, comment_id):
-        comment = get_object_or_404(Comment, id=comment_id)
-        replies = comment.replies.all().order_by('created_at')
+    async def get(self, request, comment_id):
+        comment = await aget_object_or_404(Comment, id=comment_id)
         
-        replies_data = []
-        for reply in replies:
-            replies_data.append({
-                'id': reply.id,
-                'body': reply.body,
-                'created_at': reply.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'author': {
-                    'id': reply.author.id,
-                    'username': reply.author.username,
-                    'avatar': self.get_avatar_url(reply.author)
-                }
-            })
+        try:
+            page_size = min(int(request.GET.get('page_size', self.page_size)), self.max_page_size)
+            depth = min(int(request.GET.get('depth', self.depth)), self.max_depth)
+            after = self.decode_after(request.GET.get('cursor'), comment)
+        except (ValueError, InvalidCursor):
+            return JsonResponse({
+                'success': False,
+                'error': 'پارامترهای صفحه‌بندی نامعتبر است'
+            }, status=400)
+        if page_size < 1 or depth < 1:
+            return JsonResponse({
+                'success': False,
+                'error': 'پارامترهای صفحه‌بندی نامعتبر است'
+            }, status=400)
+        
+        # پاسخ‌های مستقیم بعد از cursor؛ مرتب‌سازی path همان ترتیب ثبت است
+        children = Comment.objects.filter(
+            **subtree_lookups(comment.path, include_self=False), depth=comment.depth + 1, is_active=True
+        ).order_by('path')
+        if after:
+            children = children.filter(path__gt=after)
+        replies = [reply async for reply in children[:page_size + 1]]
+        has_more = len(replies) > page_size
+        replies = replies[:page_size]
+        
+        nested = []
+        if replies and depth > 1:
+            # نوادگان پاسخ‌های این صفحه در یک بازه پیوسته path قرار دارند
+            # (':' بعد از ارقام می‌آید، پس همه ادامه‌های مسیر آخر را پوشش می‌دهد).
+            # حداکثر max_nested نواده به ترتیب path؛ شاخه‌های ناقص has_more و
+            # cursor می‌گیرند و ادامه‌شان جداگانه بارگذاری می‌شود
+            nested = [
+                reply async for reply in Comment.objects.filter(
+                    path__gte=replies[0].path,
+                    path__lt=replies[-1].path + ':',
+                    depth__gt=comment.depth + 1,
+                    depth__lte=comment.depth + depth,
+                    is_active=True,
+                ).order_by('path')[:self.max_nested]
+            ]
+        
+        # کارت همه نویسنده‌ها با یک کوئری
+        authors = await aget_author_cards(
+            {reply.author_id for reply in replies} | {reply.author_id for reply in nested} | {comment.author_id}
+        )
+        replies_data = self.build_tree(replies, nested, authors, page_size)
         
         return JsonResponse({
             'success': True,
             'comment': {
                 'id': comment.id,
                 'body': comment.body,
-                'author': comment.author.username,
+                'author': authors[comment.author_id]['username'],
                 'created_at': comment.created_at.isoformat(),
             },
-            # 'replies': replies_data,
-            # 'count': replies.count()
+            'replies': replies_data,
+            'count': len(replies_data),
+            'has_more': has_more,
+            'next_cursor': encode_cursor({'path': replies[-1].path}) if has_more else None
         })
     
-    def get_avatar_url(self, user):
-        """دریافت آدرس آواتار کاربر"""
-        default_avatar = '/static/assets/img/comment/comment_1.png'
-        try:
-            if hasattr(user, 'profile') and user.profile.photo:
-                return user.profile.photo.url
-        except:
-            pass
-        return default_avatar
+    def decode_after(self, cursor, comment):
+        """مسیر آخرین پاسخ صفحه قبل؛ cursor باید متعلق به همین شاخه باشد"""
+        if not cursor:
+            return None
+        after = decode_cursor(cursor)
+        if not isinstance(after, dict) or not isinstance(after.get('path'), str):
+            raise InvalidCursor(cursor)
+        if not after['path'].startswith(comment.path):
+            raise InvalidCursor(cursor)
+        return after['path']
+    
+    def build_tree(self, replies, nested, authors, page_size):
+        """ساخت درخت JSON؛ از هر گره حداکثر page_size فرزند برگردانده می‌شود"""
+        nodes = {}
+        roots = []
+        root_ids = {reply.pk for reply in replies}
+        for reply in chain(replies, nested):
+            node = comment_data(reply, authors.get(reply.author_id))
+            node['depth'] = reply.depth
+            node['reply_count'] = reply.reply_count
+            node['replies'] = []
+            node['path'] = reply.path
+            if reply.pk in root_ids:
+                roots.append(node)
+            else:
+                parent = nodes.get(reply.parent_id)
+                if parent is None or len(parent['replies']) >= page_size:
+                    # والد غیرفعال یا فراتر از سقف همین صفحه
+                    continue
+                parent['replies'].append(node)
+            nodes[reply.pk] = node
+        
+        for node in nodes.values():
+            loaded = node['replies']
+            node['has_more'] = node['reply_count'] > len(loaded)
+            # ادامه شاخه از بعد از آخرین فرزند بارگذاری‌شده
+            node['cursor'] = encode_cursor({'path': loaded[-1]['path']}) if loaded and node['has_more'] else None
+            node['replies_url'] = reverse('get_replies', args=[node['id']]) if node['has_more'] else None
+        for node in nodes.values():
+            del node['path']
+        return roots
 
-class ToggleCommentLikeView(LoginRequiredMixin, View):
+class ToggleCommentLikeView(AsyncLoginRequiredMixin, View):
     """لایک/دیسلایک کامنت"""
     
-    def post(self, request, comment_id):
-        comment = get_object_or_404(Comment, id=comment_id)
-        action = request.POST.get('action', 'like')  # like or dislike
-        
-        # ایجاد یا به‌روزرسانی لایک
-        like, created = CommentLike.objects.get_or_create(
-            comment=comment,
-            user=request.user,
-            defaults={'is_like': action == 'like'}
-        )
-        
-        if not created:
-            # اگر از قبل وجود داشت، مقدار را تغییر می‌دهیم
-            like.is_like = action == 'like'
-            like.save()
+    async def post(self, request, comment_id):
+        comment = await aget_object_or_404(Comment.objects.only('id', 'post_id'), id=comment_id)
+        return await reaction_response(comment, request)
+
+class TogglePostReactionView(AsyncLoginRequiredMixin, View):
+    """لایک/دیسلایک پست"""
+    
+    async def post(self, request, post_id):
+        post = await aget_object_or_404(Post.objects.only('id'), id=post_id)
+        return await reaction_response(post, request)
+
+async def reaction_response(target, request):
+    """اعمال واکنش ارسال‌شده (like، dislike یا clear) و پاسخ JSON با شمارنده‌های جدید"""
+    action = request.POST.get('action', 'like')
+    if action not in REACTION_ACTIONS:
+        return JsonResponse({
+            'success': False,
+            'error': 'عملیات نامعتبر است'
+        }, status=400)
+    
+    # set_reaction تراکنش و cursor همگام لازم دارد که ORM async هنوز ندارد
+    result = await sync_to_async(set_reaction)(target, request.user, action)
+    
+    # وضعیت واکنش خود کاربر (user_action) شخصی است و پخش نمی‌شود
+    is_post = isinstance(target, Post)
+    events.publish(target.pk if is_post else target.post_id, 'reactions', {
+        'target': 'post' if is_post else 'comment',
+        'id': target.pk,
+        'likes_count': result['likes_count'],
+        'dislikes_count': result['dislikes_count'],
+    })
+    
+    return JsonResponse({
+        'success': True,
+        **result
+    })
+
+class PostEventStreamView(View):
+    """جریان Server-Sent Events نظرات و واکنش‌های یک پست"""
+    
+    async def get(self, request, post_id):
+        post = await aget_object_or_404(Post.objects.only('id'), id=post_id)
+        channel = events.post_channel(post.pk)
+        # زیر ASGI جریان در حلقه رویداد اجرا می‌شود؛ زیر WSGI هر اتصال یک thread دارد
+        if isinstance(request, ASGIRequest):
+            content = events.astream(channel)
+        else:
+            content = events.stream(channel)
         
-        # تعداد لایک‌ها و دیسلایک‌ها
-        likes_count = comment.likes.filter(is_like=True).count()
-        dislikes_count = comment.likes.filter(is_like=False).count()
+        response = StreamingHttpResponse(content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # جلوگیری از بافر شدن جریان در nginx
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class FragmentCacheStatsView(View):
+    """آمار hit و miss کش قطعه‌های قالب (فقط برای کارمندان)"""
+    
+    def get(self, request):
+        if not request.user.is_staff:
+            return JsonResponse({
+                'success': False,
+                'error': 'شما مجاز به مشاهده این اطلاعات نیستید'
+            }, status=403)
         
         return JsonResponse({
             'success': True,
-            'likes_count': likes_count,
-            'dislikes_count': dislikes_count,
-            'user_action': 'like' if like.is_like else 'dislike'
-        })
\ No newline at end of file
+            'stats': fragment_cache_stats()
+        })
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Django زیر ASGI اتصال پایدار را بین درخواست‌ها دوباره استفاده نمی‌کند (config/sqlite.py)
+os.environ.setdefault('BLOG_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,165 @@
+"""
+سرو فایل‌های MEDIA_ROOT (عکس پست‌ها، نسخه‌های کوچک‌شده و آواتارها)
+
+- ETag (از زمان تغییر و اندازه فایل) و Last-Modified با پاسخ 304 برای
+  If-None-Match و If-Modified-Since
+- درخواست Range تک‌بازه‌ای (206 / 416) و If-Range
+- با MEDIA_SENDFILE_BACKEND ارسال فایل به پراکسی جلویی سپرده می‌شود و فقط
+  هدرها از Python می‌گذرند:
+    'x-accel-redirect': nginx، با یک location از نوع internal روی
+        MEDIA_ACCEL_REDIRECT_PREFIX که به MEDIA_ROOT اشاره می‌کند
+    'x-sendfile': Apache (mod_xsendfile) و lighttpd، با مسیر مطلق فایل
+- بدون پراکسی، فایل (یا بازه خواسته‌شده) از طریق wsgi.file_wrapper سرو
+  می‌شود؛ سرورهایی مانند gunicorn و uWSGI آن را با os.sendfile و بدون کپی
+  در فضای کاربر ارسال می‌کنند.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+X_ACCEL_REDIRECT = 'x-accel-redirect'
+X_SENDFILE = 'x-sendfile'
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    بخشی از یک فایل باز به شکل شیء فایل برای FileResponse
+    fileno و موقعیت فعلی فایل به wsgi.file_wrapper اجازه sendfile همان بازه را می‌دهد.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) شامل هر دو سر برای Range تک‌بازه‌ای، None برای نادیده گرفتن
+    (هدر نحوی نامعتبر یا چندبازه‌ای؛ کل فایل ارسال می‌شود) و ValueError برای
+    بازه خارج از فایل (416)
+    """
+    match = _RANGE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    if size == 0:
+        raise ValueError(header)
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # n بایت آخر
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError(header)
+    return start, end
+
+
+def range_allowed(request, etag, last_modified):
+    """If-Range: بازه فقط وقتی ارسال می‌شود که نسخه کلاینت هنوز معتبر باشد"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # مقایسه قوی؛ ETag ضعیف هرگز تطبیق نمی‌کند
+        return etag in parse_etags(if_range) and not if_range.startswith('W/')
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+        if backend:
+            response = _offload(backend, full_path, path, content_type)
+        else:
+            response = _file_response(request, full_path, stat.st_size, content_type, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60 * 24))
+    return response
+
+
+def _offload(backend, full_path, path, content_type):
+    # پراکسی Range و بدنه را خودش مدیریت می‌کند
+    response = HttpResponse(content_type=content_type)
+    if backend == X_ACCEL_REDIRECT:
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(path.replace(os.sep, '/'))
+    elif backend == X_SENDFILE:
+        response['X-Sendfile'] = full_path
+    else:
+        raise ValueError(f'unknown MEDIA_SENDFILE_BACKEND {backend!r}')
+    return response
+
+
+def _file_response(request, full_path, size, content_type, etag, last_modified):
+    start, end = 0, size - 1
+    status = 200
+    header = request.headers.get('Range')
+    if header and range_allowed(request, etag, last_modified):
+        try:
+            requested = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            (start, end), status = requested, 206
+
+    length = max(end - start + 1, 0)
+    response = FileResponse(FileRange(open(full_path, 'rb'), start, length), content_type=content_type, status=status)
+    response['Content-Length'] = str(length)
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
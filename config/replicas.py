@@ -0,0 +1,118 @@
+"""
+مسیریابی خواندن به replicaها با تضمین read-your-writes
+
+- خواندن‌های ORM داخل یک درخواست به یکی از DATABASE_REPLICAS می‌روند و همه
+  نوشتن‌ها به default. replica یک بار برای هر درخواست انتخاب می‌شود تا همه
+  خواندن‌های یک صفحه از یک نسخه با یک مقدار تاخیر باشند.
+- داخل تراکنش روی default (مثلا موتور واکنش)، خارج از
+  درخواست (دستورهای مدیریتی و threadهای پس‌زمینه) و بعد از اولین نوشتن در همان
+  درخواست، خواندن هم از default انجام می‌شود.
+- پس از نوشتن، یک کوکی کاربر را برای REPLICA_PIN_SECONDS ثانیه به default
+  سنجاق می‌کند تا تغییر خودش را فورا ببیند، حتی اگر replicaها عقب باشند.
+- داخل primary_reads() (مثلا رندر قطعه‌ای که در کش ذخیره می‌شود) خواندن از
+  default است تا داده عقب‌مانده replica زیر کلید نسل جدید کش نشود.
+
+برای آزمایش محلی چند فایل SQLite نقش replica را دارند و با دستور
+sync_replicas از روی default به‌روز می‌شوند.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'primary_pin'
+# جدول‌هایی که همیشه از primary خوانده می‌شوند (نشست تازه‌ساخته نباید گم شود)
+PRIMARY_APPS = ('sessions',)
+
+_request_state = ContextVar('replica_request_state', default=None)
+_primary_reads = ContextVar('replica_primary_reads', default=False)
+
+
+class _RequestState:
+    # یک شیء تغییرپذیر تا نوشتن در threadهای sync_to_async هم دیده شود
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+    def choose_replica(self, replicas):
+        if self.replica not in replicas:
+            self.replica = random.choice(replicas)
+        return self.replica
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+@contextmanager
+def primary_reads():
+    """خواندن همه کوئری‌های داخل بلوک از default"""
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replicas = replica_aliases()
+        if state is None or state.pinned or state.wrote or not replicas or _primary_reads.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.choose_replica(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # همه پایگاه‌ها کپی یک داده‌اند
+        pool = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+@sync_and_async_middleware
+def ReplicaPinningMiddleware(get_response):
+    """وضعیت مسیریابی هر درخواست و کوکی سنجاق به primary پس از نوشتن"""
+
+    def start(request):
+        return _request_state.set(_RequestState(pinned=PIN_COOKIE in request.COOKIES))
+
+    def finish(response, token):
+        state = _request_state.get()
+        _request_state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start(request)
+            return finish(await get_response(request), token)
+    else:
+        def middleware(request):
+            token = start(request)
+            return finish(get_response(request), token)
+    return middleware
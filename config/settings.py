@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 
+from .sqlite import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -56,6 +58,9 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.staticfiles.PrecompressedStaticMiddleware',
+    'blog.querybudget.QueryBudgetMiddleware',
+    'config.replicas.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,8 +75,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR.joinpath("templates")],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # هر قالب یک بار خوانده و کامپایل می‌شود؛ در حالت DEBUG با تغییر فایل
+            # قالب، autoreloader کش را خالی می‌کند
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -90,13 +102,25 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# WAL، busy timeout، pragmaها و اتصال پایدار زیر WSGI (config/sqlite.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(BASE_DIR / 'db.sqlite3'),
 }
 
+# replicaهای فقط‌خواندنی؛ برای آزمایش محلی BLOG_REPLICAS=n فایل‌های SQLite جایگزین
+# می‌سازد که با «manage.py sync_replicas» از روی default به‌روز می‌شوند.
+# در تست‌ها replicaها آینه default هستند.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('BLOG_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = sqlite_database(
+        BASE_DIR / f'db.replica{number}.sqlite3', TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['config.replicas.PrimaryReplicaRouter']
+# مدت سنجاق شدن کاربر به primary پس از هر نوشتن (ثانیه)
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -134,6 +158,59 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR.joinpath("static")]
+# خروجی collectstatic: فایل‌های hash‌دار، bundleها و نسخه‌های .gz/.br (blog/staticfiles.py)
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'blog.staticfiles.BundledStaticFilesStorage',
+    },
+}
+
+# bundle -> فایل‌های عضو به ترتیب بارگذاری؛ در قالب با {% static_bundle %}
+STATIC_BUNDLES = {
+    'assets/css/bundle.css': [
+        'assets/css/bootstrap.min.css',
+        'assets/css/owl.carousel.min.css',
+        'assets/css/ticker-style.css',
+        'assets/css/flaticon.css',
+        'assets/css/slicknav.css',
+        'assets/css/animate.min.css',
+        'assets/css/magnific-popup.css',
+        'assets/css/fontawesome-all.min.css',
+        'assets/css/themify-icons.css',
+        'assets/css/slick.css',
+        'assets/css/nice-select.css',
+        'assets/css/style.css',
+        'assets/css/comments.css',
+    ],
+    'assets/js/bundle.js': [
+        'assets/js/comments.js',
+        'assets/js/vendor/modernizr-3.5.0.min.js',
+        'assets/js/vendor/jquery-1.12.4.min.js',
+        'assets/js/popper.min.js',
+        'assets/js/bootstrap.min.js',
+        'assets/js/jquery.slicknav.min.js',
+        'assets/js/owl.carousel.min.js',
+        'assets/js/slick.min.js',
+        'assets/js/wow.min.js',
+        'assets/js/animated.headline.js',
+        'assets/js/jquery.scrollUp.min.js',
+        'assets/js/jquery.nice-select.min.js',
+        'assets/js/jquery.sticky.js',
+        'assets/js/jquery.magnific-popup.js',
+        'assets/js/contact.js',
+        'assets/js/jquery.form.js',
+        'assets/js/jquery.validate.min.js',
+        'assets/js/mail-script.js',
+        'assets/js/jquery.ajaxchimp.min.js',
+        'assets/js/plugins.js',
+        'assets/js/main.js',
+    ],
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -149,3 +226,96 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 ############# Media Folder settings ###########
 MEDIA_ROOT = os.path.join(BASE_DIR.joinpath("media"))
 MEDIA_URL = '/media/'
+# ثانیه؛ فایل‌ها با ETag دوباره اعتبارسنجی می‌شوند
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+# ارسال فایل‌های media توسط پراکسی جلویی (config/media.py):
+# None: سرو از Python (sendfile از طریق wsgi.file_wrapper)
+# 'x-accel-redirect': nginx با location داخلی MEDIA_ACCEL_REDIRECT_PREFIX
+# 'x-sendfile': Apache mod_xsendfile / lighttpd
+MEDIA_SENDFILE_BACKEND = os.environ.get('BLOG_MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+############# Activity logging ################
+# 'commit': نوشتن دسته‌ای پس از commit تراکنش، هنوز در چرخه درخواست
+# 'background': سپردن نوشتن و پخش در فید به thread پس‌زمینه، خارج از چرخه درخواست؛
+# فعالیت‌های صف در صورت کشته شدن پردازه از دست می‌روند
+ACTIVITY_FLUSH_MODE = 'background'
+
+############# Cache ###########################
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# کلید قطعه‌ها نسخه‌دار است، پس زمان انقضای طولانی خطر داده کهنه ندارد
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+############# Image derivatives ###############
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1024, 1600)
+IMAGE_DERIVATIVE_WORKERS = 2
+# مدت کش نتیجه «هنوز ساخته نشده» برای هر تصویر (ثانیه)
+IMAGE_DERIVATIVE_MISSING_TIMEOUT = 60
+
+############# Live events (SSE) ###############
+# 'blog.events.LocalBackend': فقط همین پردازه
+# 'blog.events.SQLiteBackend': فایل SQLite مشترک بین چند worker روی یک ماشین
+EVENTS_BACKEND = 'blog.events.LocalBackend'
+EVENTS_BACKEND_OPTIONS = {}
+# حداکثر رویدادهای در انتظار هر کلاینت؛ بیش از این قدیمی‌ترها دور ریخته می‌شوند
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT = 15
+
+############# Comments ########################
+# عمیق‌ترین سطح نظر که همراه صفحه پست رندر می‌شود؛ سطح‌های پایین‌تر با API پاسخ‌ها بارگذاری می‌شوند
+COMMENT_TREE_DEPTH = 3
+
+############# Activity feed ###################
+# حداکثر ردیف‌های صندوق فید هر کاربر؛ ردیف‌های قدیمی‌تر با اجرای دوره‌ای trim_feeds حذف می‌شوند
+FEED_MAX_ENTRIES = 500
+
+############# Activity retention ##############
+# ردیف‌های خام Activity قدیمی‌تر از این بازه با rollup_activity بایگانی و حذف می‌شوند
+ACTIVITY_RETENTION_DAYS = 90
+ACTIVITY_ARCHIVE_DIR = BASE_DIR / 'archive'
+# بازه آمار فعالیت (روز) که از خلاصه‌های روزانه خوانده می‌شود
+ACTIVITY_ANALYTICS_DAYS = 30
+
+############# Query budget ####################
+# حداکثر کوئری SQL هر درخواست به تفکیک نام URL؛ عبور از آن در لاگ هشدار داده می‌شود.
+# هر بودجه تعداد طراحی‌شده مسیر با کش سرد است، نه شمارش فعلی به اضافه حاشیه؛ هر
+# کوئری اضافه تست QueryBudgetTests را می‌شکند. درخواست‌های کاربر واردشده با
+# سشن و کاربر شروع می‌شوند (دو کوئری)؛ دستورهای تراکنش شمرده نمی‌شوند.
+QUERY_BUDGETS = {
+    # پست‌های صفحه، تعداد پست‌ها، پست‌های اخیر sidebar
+    'home': 5,
+    # FTS، پست‌های نتیجه، پست‌های اخیر
+    'search': 5,
+    # ردیف‌های فید با فعالیت‌ها، پست‌های اخیر
+    'feed': 4,
+    # پست، پست‌های اخیر، درخت نظرات
+    'post_detail': 5,
+    # نظر، یک صفحه پاسخ، پاسخ‌های تودرتو، کارت نویسنده‌ها
+    'get_replies': 4,
+    'post_events': 3,
+    'post_new': 2,
+    # پست در dispatch و get_object، پست‌های اخیر
+    'update': 5,
+    'delete': 5,
+    # والد (یا پست)، INSERT، مسیر، شمارنده پست، شمارنده والد؛
+    # فعالیت و فید در thread پس‌زمینه (ACTIVITY_FLUSH_MODE) نوشته می‌شوند
+    'add_comment': 7,
+    # نظر، UPDATE
+    'update_comment': 4,
+    # نظر، ریشه‌ها، زیرشاخه، collector (نظرات، پاسخ‌ها، واکنش‌ها، فعالیت‌ها)،
+    # حذف فید، نظرات و فعالیت‌ها، شمارش دوباره پست و شمارنده والد
+    'delete_comment': 15,
+    # هدف، حذف واکنش مخالف، INSERT ... ON CONFLICT، حذف در toggle، UPDATE ... RETURNING
+    'toggle_post_reaction': 7,
+    'toggle_like': 7,
+}
+
+############# Conditional GET #################
+# بخشی از ETag صفحه پست و صفحه اصلی؛ با هر استقرار تغییر کند تا قالب‌های جدید
+# به جای پاسخ 304 برای نسخه قدیمی ارسال شوند
+PAGE_ETAG_VERSION = os.environ.get('BLOG_RELEASE', '')
@@ -0,0 +1,80 @@
+"""
+تنظیمات اتصال SQLite برای اجرای هم‌زمان (WAL، busy timeout و pragmaها)
+
+sqlite_database() یک ورودی DATABASES می‌سازد که:
+- با init_command روی هر اتصال جدید pragmaهای SQLITE_PRAGMAS را اجرا می‌کند
+- اتصال‌ها را با بررسی سلامت بین درخواست‌ها نگه می‌دارد؛ زیر ASGI هر درخواست
+  اتصال تازه دارد و Django اتصال پایدار را دوباره استفاده نمی‌کند، پس
+  config/asgi.py مقدار BLOG_CONN_MAX_AGE را صفر می‌کند
+
+تراکنش‌های معمولی (admin، primary_reads و هر atomic فقط‌خواندنی) DEFERRED هستند
+و قفل نوشتن نمی‌گیرند. مسیرهای نوشتن با write_transaction() با BEGIN IMMEDIATE
+شروع می‌شوند تا قفل نوشتن از ابتدا گرفته شود و ارتقای قفل خواندن به نوشتن (پس
+از commit نویسنده‌ای دیگر) به خطای «database is locked» نرسد. atomic معمولی که
+بعد از خواندن می‌نویسد (مثلا فرم‌های admin) این خطر را دارد؛ این مسیرها کم‌ترافیک‌اند.
+"""
+import os
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+SQLITE_PRAGMAS = {
+    # خواننده‌ها نویسنده را متوقف نمی‌کنند و برعکس
+    'journal_mode': 'WAL',
+    # در حالت WAL امن است؛ fsync فقط هنگام checkpoint
+    'synchronous': 'NORMAL',
+    # میلی‌ثانیه؛ منتظر آزاد شدن قفل به جای خطای فوری
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+    # 128 مگابایت نگاشت حافظه و 64 مگابایت کش صفحه (مقدار منفی یعنی کیلوبایت)
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+}
+
+# ثانیه؛ مدت نگهداری اتصال بین درخواست‌ها (WSGI)
+SQLITE_CONN_MAX_AGE = int(os.environ.get('BLOG_CONN_MAX_AGE', 600))
+
+
+def pragma_statements(pragmas=None):
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def sqlite_database(name, pragmas=None, conn_max_age=SQLITE_CONN_MAX_AGE, **extra):
+    """ورودی DATABASES برای یک فایل SQLite با تنظیمات هم‌زمانی"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': pragma_statements(pragmas),
+            # busy timeout ماژول sqlite3 (ثانیه)، هم‌راستا با pragma
+            'timeout': pragmas.get('busy_timeout', 5000) / 1000,
+        },
+        **extra,
+    }
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    atomic() برای مسیرهای نوشتن؛ در SQLite تراکنش بیرونی با BEGIN IMMEDIATE شروع می‌شود
+    داخل تراکنشی که از قبل باز است فقط یک savepoint است. مانند atomic به شکل decorator هم کار می‌کند.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    # transaction_mode هنگام اتصال از OPTIONS خوانده می‌شود، پس اتصال پیش از تغییر آن باز می‌شود
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN اجرا شده است؛ تراکنش‌های بعدی همین اتصال حالت عادی دارند
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from .media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,4 +26,7 @@ urlpatterns = [
     path('accounts/', include('accounts.url')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# با MEDIA_SENDFILE_BACKEND بدنه فایل را پراکسی جلویی ارسال می‌کند
+urlpatterns += [
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
+]
@@ -29,6 +29,15 @@ class CommentSystem {
         
         // راه‌اندازی دکمه‌های انصراف
         this.setupCancelButtons();
+        
+        // راه‌اندازی دکمه‌های لایک و دیسلایک
+        this.setupReactionButtons();
+        
+        // دریافت زنده نظرات و واکنش‌ها
+        this.setupLiveEvents();
+        
+        // بارگذاری تدریجی پاسخ‌های عمیق
+        this.setupLoadReplies();
     }
     
     // دریافت CSRF Token
@@ -255,6 +264,185 @@ class CommentSystem {
         });
     }
     
+    // راه‌اندازی دکمه‌های لایک و دیسلایک
+    setupReactionButtons() {
+        document.addEventListener('click', async (e) => {
+            const button = e.target.closest('.btn-reaction');
+            if (!button) {
+                return;
+            }
+            e.preventDefault();
+            
+            const formData = new FormData();
+            formData.append('action', button.getAttribute('data-action'));
+            
+            try {
+                const response = await fetch(button.getAttribute('data-url'), {
+                    method: 'POST',
+                    body: formData,
+                    headers: {
+                        'X-CSRFToken': this.csrfToken,
+                        'X-Requested-With': 'XMLHttpRequest'
+                    }
+                });
+                
+                if (response.redirected || response.status === 403) {
+                    this.showAlert('برای ثبت واکنش باید وارد شوید', 'error');
+                    return;
+                }
+                
+                const data = await response.json();
+                if (data.success) {
+                    const container = button.parentElement;
+                    container.querySelector('.like-count').textContent = data.likes_count;
+                    container.querySelector('.dislike-count').textContent = data.dislikes_count;
+                } else {
+                    this.showAlert(data.error || 'خطا در ثبت واکنش', 'error');
+                }
+            } catch (error) {
+                console.error('Error:', error);
+                this.showAlert('خطا در ارتباط با سرور', 'error');
+            }
+        });
+    }
+    
+    // بارگذاری صفحه بعدی پاسخ‌های یک نظر از API
+    setupLoadReplies() {
+        document.addEventListener('click', async (e) => {
+            const button = e.target.closest('.btn-load-replies');
+            if (!button) {
+                return;
+            }
+            e.preventDefault();
+            
+            const url = new URL(button.getAttribute('data-url'), window.location.origin);
+            const cursor = button.getAttribute('data-cursor');
+            if (cursor) {
+                url.searchParams.set('cursor', cursor);
+            }
+            
+            button.disabled = true;
+            try {
+                const response = await fetch(url, {
+                    headers: {'X-Requested-With': 'XMLHttpRequest'}
+                });
+                const data = await response.json();
+                if (!data.success) {
+                    this.showAlert(data.error || 'خطا در دریافت پاسخ‌ها', 'error');
+                    return;
+                }
+                
+                const list = button.previousElementSibling;
+                data.replies.forEach(reply => list.appendChild(this.renderReply(reply)));
+                
+                if (data.has_more) {
+                    button.setAttribute('data-cursor', data.next_cursor);
+                    button.innerHTML = '<i class="fa fa-comments"></i> پاسخ‌های بیشتر';
+                } else {
+                    button.remove();
+                }
+            } catch (error) {
+                console.error('Error:', error);
+                this.showAlert('خطا در ارتباط با سرور', 'error');
+            } finally {
+                button.disabled = false;
+            }
+        });
+    }
+    
+    // ساخت عنصر یک پاسخ بارگذاری‌شده (متن‌ها با textContent درج می‌شوند)
+    renderReply(reply) {
+        const item = document.createElement('div');
+        item.className = `comment-item level-${reply.depth}`;
+        item.id = `comment-${reply.id}`;
+        item.innerHTML = `
+            <div class="comment-header">
+                <div class="comment-author">
+                    <div class="thumb"><img alt=""></div>
+                    <div class="author-info">
+                        <h6></h6>
+                        <span class="comment-date"></span>
+                    </div>
+                </div>
+            </div>
+            <div class="comment-body"><p></p></div>
+            <div class="replies-list"></div>
+        `;
+        item.querySelector('.thumb img').src = reply.author.avatar;
+        item.querySelector('.thumb img').alt = reply.author.username;
+        item.querySelector('.author-info h6').textContent = reply.author.username;
+        item.querySelector('.comment-date').textContent = reply.created_at;
+        item.querySelector('.comment-body p').textContent = reply.body;
+        
+        const list = item.querySelector('.replies-list');
+        reply.replies.forEach(child => list.appendChild(this.renderReply(child)));
+        
+        if (reply.has_more) {
+            const button = document.createElement('button');
+            button.className = 'btn btn-link btn-load-replies';
+            button.setAttribute('data-url', reply.replies_url);
+            if (reply.cursor) {
+                button.setAttribute('data-cursor', reply.cursor);
+            }
+            button.innerHTML = '<i class="fa fa-comments"></i> نمایش پاسخ‌ها';
+            item.appendChild(button);
+        }
+        return item;
+    }
+    
+    // اتصال به جریان SSE پست؛ EventSource در صورت قطع شدن خودش دوباره وصل می‌شود
+    setupLiveEvents() {
+        const section = document.querySelector('.comments-section[data-events-url]');
+        if (!section || !window.EventSource) {
+            return;
+        }
+        
+        const source = new EventSource(section.getAttribute('data-events-url'));
+        
+        source.addEventListener('comment.created', (e) => {
+            const comment = JSON.parse(e.data);
+            if (!document.getElementById(`comment-${comment.id}`)) {
+                this.showAlert(`نظر جدید از ${comment.author.username}؛ برای دیدن آن صفحه را تازه کنید`, 'success');
+            }
+        });
+        
+        source.addEventListener('comment.updated', (e) => {
+            const comment = JSON.parse(e.data);
+            const body = document.querySelector(`#comment-${comment.id} > .comment-body p`);
+            if (body) {
+                body.textContent = comment.body;
+            }
+        });
+        
+        // حذف، مخفی کردن یا تایید نظرات (از جمله عملیات مدیریتی) به صورت دسته‌ای
+        source.addEventListener('comments.moderated', (e) => {
+            const data = JSON.parse(e.data);
+            if (data.action === 'approve') {
+                this.showAlert('نظرات تازه‌ای تایید شد؛ برای دیدن آن‌ها صفحه را تازه کنید', 'success');
+                return;
+            }
+            data.ids.forEach(id => {
+                const element = document.getElementById(`comment-${id}`);
+                if (element) {
+                    element.remove();
+                }
+            });
+        });
+        
+        source.addEventListener('reactions', (e) => {
+            const data = JSON.parse(e.data);
+            const container = document.querySelector(`[data-reactions="${data.target}-${data.id}"]`);
+            if (container) {
+                container.querySelector('.like-count').textContent = data.likes_count;
+                container.querySelector('.dislike-count').textContent = data.dislikes_count;
+            }
+        });
+        
+        source.addEventListener('resync', () => {
+            console.warn('برخی رویدادهای زنده از دست رفت');
+        });
+    }
+    
     // نمایش پیام
     showAlert(message, type) {
         // حذف آلرت‌های قبلی